@@ -4,11 +4,10 @@ import re
 import tempfile
 import os
 import pandas as pd
-import pdfplumber
-import fitz  # PyMuPDF
-import camelot
-from pypdf import PdfReader
 from io import BytesIO
+import PageStream
+import PdfProbe
+from PolicyForms import clean_description, parse_line_into_columns, parse_policy_forms_for_lob
 
 ##############################################################################
 # CUSTOM CSS (Teal header row with white text, black body text, centered header)
@@ -42,38 +41,6 @@ def make_table_cells_editable(html_str: str) -> str:
     replace = r'<td contenteditable="true"\2'
     return re.sub(pattern, replace, html_str, flags=re.IGNORECASE)
 
-##############################################################################
-# HELPER: CLEAN UNWANTED TEXT FROM POLICY FORM DESCRIPTION
-##############################################################################
-def clean_description(description: str) -> str:
-    """
-    Removes extra text from the 'Description' if it contains certain stop phrases.
-    We cut off everything from that phrase onward.
-
-    Add or remove stop phrases as needed to handle any unwanted text.
-    """
-    stop_phrases = [
-        "your payment includes",
-        "page 1 of 1",
-        "commercial automobile ca pn 83 36 tx 07 19 notice",
-        "texas motor vehicle crime prevention authority fee",
-        "notice -",
-        "authority fee · auto burglary,",
-        "auto burglary, theft and fraud prevention;",
-        "by law, we send this fee to the motor vehicle crime prevention authority",
-        "criminal justice efforts;",
-        "ca pn 83 36 tx 07 19",
-        "commercial automobile · ·",
-        "trauma care and emergency medical services for victims of accidents due to traffic offenses."
-    ]
-    desc_lower = description.lower()
-    for phrase in stop_phrases:
-        idx = desc_lower.find(phrase)
-        if idx != -1:
-            # Cut off everything from that phrase onward
-            return description[:idx].strip()
-    return description
-
 ##############################################################################
 # EXTRACTION FUNCTIONS
 ##############################################################################
@@ -87,12 +54,9 @@ def format_currency(value_str):
         return value_str
 
 def extract_table1_pypdf(pdf_data):
+    from pypdf import PdfReader
     reader = PdfReader(io.BytesIO(pdf_data))
-    full_text = ""
-    for page in reader.pages:
-        text = page.extract_text() or ""
-        full_text += text + "\n"
-    lines = full_text.splitlines()
+    lines = "".join((page.extract_text() or "") + "\n" for page in reader.pages).splitlines()
     start_index = None
     for i, line in enumerate(lines):
         if "commercial auto coverages premium" in line.lower():
@@ -119,12 +83,20 @@ def extract_table1_pypdf(pdf_data):
         coverage_rows.append(total_quote_row)
     return coverage_rows
 
-def extract_text_pymupdf(pdf_data):
+def extract_page_texts_pymupdf(pdf_data):
+    import fitz  # PyMuPDF
     doc = fitz.open(stream=pdf_data, filetype="pdf")
+    try:
+        return [page.get_text() for page in doc]
+    finally:
+        doc.close()
+
+def extract_text_pymupdf(pdf_data, raw_pages=None):
+    if raw_pages is None:
+        raw_pages = extract_page_texts_pymupdf(pdf_data)
     text_lines = []
-    for page in doc:
-        text_lines.extend(page.get_text().splitlines())
-    doc.close()
+    for text in raw_pages:
+        text_lines.extend(text.splitlines())
     return text_lines
 
 
@@ -289,11 +261,7 @@ def extract_premium_details_pypdf(pdf_data):
             return f"${digits_str}"
         return "N"
     reader = PdfReader(io.BytesIO(pdf_data))
-    full_text = ""
-    for page in reader.pages:
-        txt = page.extract_text() or ""
-        full_text += txt + "\n"
-    lines = full_text.splitlines()
+    lines = "".join((page.extract_text() or "") + "\n" for page in reader.pages).splitlines()
     premiums_indices = [i for i, line in enumerate(lines) if "PREMIUMS" in line.upper()]
     results = {}
     def merge_lines(raw_lines):
@@ -345,15 +313,8 @@ def extract_premium_details_pypdf(pdf_data):
     return results
 
 def extract_premium_pdfplumber_for_table4(pdf_data):
-    import pdfplumber
-    from io import BytesIO
     import re
-    text = ""
-    with pdfplumber.open(BytesIO(pdf_data)) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            text += page_text + "\n"
-    lines = text.splitlines()
+    lines = "".join(t + "\n" for t in PageStream.read_page_texts(pdf_data)).splitlines()
     start_idx = None
     for i, line in enumerate(lines):
         if "PREMIUMS" in line.upper():
@@ -396,11 +357,10 @@ def extract_premium_pdfplumber_for_table4(pdf_data):
     return result
 
 def extract_deductibles_pypdf(pdf_data):
+    from pypdf import PdfReader
     reader = PdfReader(io.BytesIO(pdf_data))
-    full_text = ""
-    for page in reader.pages:
-        full_text += page.extract_text() or "" + "\n"
-    lines = full_text.splitlines()
+    # Pages run together unless a page is empty, as the original `text or "" + "\n"` did
+    lines = "".join(page.extract_text() or "\n" for page in reader.pages).splitlines()
     start_idx = None
     for i, line in enumerate(lines):
         if "Premium Deductibles".lower() in line.lower():
@@ -445,12 +405,8 @@ def find_vin_in_text(text: str) -> str:
         return cleaned
     return ""
 
-def extract_state_territory_from_pymupdf(pdf_data):
-    doc = fitz.open(stream=pdf_data, filetype="pdf")
-    text_lines = []
-    for page in doc:
-        text_lines.extend(page.get_text().splitlines())
-    doc.close()
+def extract_state_territory_from_pymupdf(pdf_data, raw_pages=None):
+    text_lines = extract_text_pymupdf(pdf_data, raw_pages)
     tokens = []
     for line in text_lines:
         tokens.extend(line.split())
@@ -471,9 +427,23 @@ def extract_state_territory_from_pymupdf(pdf_data):
                 results.append((state, territory))
     return results
 
-def merge_classification_and_territory(veh_df, tables, pdf_data):
+def merge_classification_and_territory(veh_df, tables, pdf_data, territory_pairs=None):
+    """
+    Fill State and Territory per vehicle. The "XX Terr NNN" pairs in the
+    PyMuPDF text win; the classification tables and a pdfminer pass only
+    run when there are fewer pairs than vehicles.
+    """
     import re
     from pdfminer.high_level import extract_text as pdfminer_extract_text
+    new_pairs = territory_pairs
+    if new_pairs is None:
+        new_pairs = extract_state_territory_from_pymupdf(pdf_data)
+    if new_pairs and len(new_pairs) >= len(veh_df):
+        for idx, (state, territory) in enumerate(new_pairs):
+            if idx < len(veh_df):
+                veh_df.at[idx, "State"] = state
+                veh_df.at[idx, "Territory"] = territory
+        return veh_df
     classification_rows = []
 
     for t in tables:
@@ -535,7 +505,6 @@ def merge_classification_and_territory(veh_df, tables, pdf_data):
             mask_no_terr = (veh_df["Territory"] == "")
             veh_df.loc[mask_no_state, "State"] = veh_df.loc[mask_no_state, "State"].replace("", fallback_state)
             veh_df.loc[mask_no_terr, "Territory"] = veh_df.loc[mask_no_terr, "Territory"].replace("", fallback_terr)
-    new_pairs = extract_state_territory_from_pymupdf(pdf_data)
     if new_pairs:
         for idx, (state, territory) in enumerate(new_pairs):
             if idx < len(veh_df):
@@ -544,8 +513,8 @@ def merge_classification_and_territory(veh_df, tables, pdf_data):
 
     return veh_df
 
-def fallback_extract_1_5_dynamic_with_value(pdf_data):
-    lines = extract_text_pymupdf(pdf_data)
+def fallback_extract_1_5_dynamic_with_value(pdf_data, raw_pages=None):
+    lines = extract_text_pymupdf(pdf_data, raw_pages)
     schedule_indices = []
     for i, line in enumerate(lines):
         if "schedule of covered autos you own" in line.lower():
@@ -736,15 +705,20 @@ def extract_premium_camelot(pdf_data):
                 premium_map[veh_no] = format_premium_with_commas(final_prem)
     return premium_map
 
-def extract_table3_camelot(pdf_data):
-    import re
+def read_camelot_tables(pdf_data):
+    import camelot
     import tempfile, os
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
         tmp.write(pdf_data)
         tmp.flush()
         tmp_name = tmp.name
-    tables = camelot.read_pdf(tmp_name, flavor='stream', pages='all')
-    os.remove(tmp_name)
+    try:
+        return camelot.read_pdf(tmp_name, flavor='stream', pages='all')
+    finally:
+        os.remove(tmp_name)
+
+def extract_vehicles_camelot(tables):
+    import re
     all_vehicles = []
     for t in tables:
         df = t.df.copy()
@@ -824,12 +798,33 @@ def extract_table3_camelot(pdf_data):
         veh_df.reset_index(drop=True, inplace=True)
         if "Value" not in veh_df.columns:
             veh_df["Value"] = ""
-    fallback_df = fallback_extract_1_5_dynamic_with_value(pdf_data)
-    if not fallback_df.empty:
-        combined = pd.concat([veh_df, fallback_df], ignore_index=True)
-        combined.drop_duplicates(subset=["Veh No."], keep="last", inplace=True)
-        combined.reset_index(drop=True, inplace=True)
-        veh_df = combined
+    return veh_df
+
+def extract_table3_camelot(pdf_data, raw_pages=None, fingerprint=None):
+    """
+    Vehicle schedule with state and territory. The PdfProbe fingerprint picks
+    the parser: the PyMuPDF text parser for the line-per-cell layout, camelot
+    otherwise; the other one only runs when the first finds no vehicles.
+    raw_pages (PyMuPDF text per page) and fingerprint skip the probe.
+    """
+    import re
+    if raw_pages is None:
+        raw_pages = extract_page_texts_pymupdf(pdf_data)
+    if fingerprint is None:
+        fingerprint = PdfProbe.fingerprint(raw_pages)
+    tables = None
+    if fingerprint["layouts"].get("auto_schedule") == "line_per_cell":
+        veh_df = fallback_extract_1_5_dynamic_with_value(pdf_data, raw_pages)
+        if veh_df.empty:
+            tables = read_camelot_tables(pdf_data)
+            veh_df = extract_vehicles_camelot(tables)
+    else:
+        tables = read_camelot_tables(pdf_data)
+        veh_df = extract_vehicles_camelot(tables)
+        if veh_df.empty:
+            veh_df = fallback_extract_1_5_dynamic_with_value(pdf_data, raw_pages)
+    if "Value" not in veh_df.columns:
+        veh_df["Value"] = ""
     try:
         veh_df["Veh No."] = veh_df["Veh No."].astype(int)
         veh_df.sort_values(by="Veh No.", inplace=True)
@@ -842,23 +837,18 @@ def extract_table3_camelot(pdf_data):
         veh_df["State"] = ""
     if "Territory" not in veh_df.columns:
         veh_df["Territory"] = ""
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(pdf_data)
-        tmp.flush()
-        tmp_name = tmp.name
-    tables_for_merge = camelot.read_pdf(tmp_name, flavor='stream', pages='all')
-    os.remove(tmp_name)
-    veh_df = merge_classification_and_territory(veh_df, tables_for_merge, pdf_data)
+    # Territory pairs printed in the text settle every vehicle on their own;
+    # the classification tables are only read when they do not
+    territory_pairs = extract_state_territory_from_pymupdf(pdf_data, raw_pages)
+    if tables is None and len(territory_pairs) < len(veh_df):
+        tables = read_camelot_tables(pdf_data)
+    veh_df = merge_classification_and_territory(veh_df, tables or [], pdf_data, territory_pairs)
     def extract_premium_pypdf_for_table3(pdf_bytes):
         from pypdf import PdfReader
         import io
         import re
         reader = PdfReader(io.BytesIO(pdf_bytes))
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text() or ""
-            text += page_text + "\n"
-        lines = text.splitlines()
+        lines = "".join((page.extract_text() or "") + "\n" for page in reader.pages).splitlines()
         start_idx = None
         for i, line in enumerate(lines):
             if "PHYSICAL DAMAGE COVERAGE" in line.upper():
@@ -957,25 +947,23 @@ def extract_loss_payees(pdf_data):
         payees.append({"Veh No.": "None", "Loss Payee": "None"})
     return payees
 
+def _stripped_pdfplumber_lines(pdf_data):
+    """Every stripped text line of the PDF, or the lines read before a parse error."""
+    lines = []
+    try:
+        for _, text in PageStream.iter_page_texts(pdf_data):
+            lines.extend(ln.strip() for ln in text.splitlines())
+    except PageStream.MemoryBudgetExceeded:
+        raise
+    except Exception:
+        pass
+    return lines
+
 def extract_cost_of_hire_used_pdfplumber(pdf_data):
-    import tempfile
     import re
     coverage_data = {"Primary Coverage": {"State": "-", "Premium": "-"},
                      "Excess Coverage":  {"State": "-", "Premium": "-"}}
-    lines = []
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(pdf_data)
-        tmp.flush()
-        tmp_name = tmp.name
-    try:
-        with pdfplumber.open(tmp_name) as plumber_pdf:
-            for page in plumber_pdf.pages:
-                text = page.extract_text() or ""
-                for ln in text.splitlines():
-                    lines.append(ln.strip())
-    except:
-        pass
-    os.remove(tmp_name)
+    lines = _stripped_pdfplumber_lines(pdf_data)
     start_idx = None
     for i in range(len(lines)-1):
         if ("liability coverage - cost of hire rating basis for autos used in your motor carrier operations" in lines[i].lower() and
@@ -1017,23 +1005,10 @@ def extract_cost_of_hire_used_pdfplumber(pdf_data):
     return pd.DataFrame(rows, columns=["Coverage","State","Premium"])
 
 def extract_cost_of_hire_not_used_pdfplumber(pdf_data):
-    import tempfile, re
+    import re
     coverage_data = {"Primary Coverage": {"State": "-", "Premium": "-"},
                      "Excess Coverage":  {"State": "-", "Premium": "-"}}
-    lines = []
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(pdf_data)
-        tmp.flush()
-        tmp_name = tmp.name
-    try:
-        with pdfplumber.open(tmp_name) as plumber_pdf:
-            for page in plumber_pdf.pages:
-                text = page.extract_text() or ""
-                for ln in text.splitlines():
-                    lines.append(ln.strip())
-    except:
-        pass
-    os.remove(tmp_name)
+    lines = _stripped_pdfplumber_lines(pdf_data)
     for_not_used = "liability coverage - cost of hire rating basis for autos not used in your motor carrier operations"
     other_line = "(other than mobile or farm equipment)"
     start_idx = None
@@ -1508,14 +1483,13 @@ def extract_location_coverages_pymupdf(pdf_data):
 ##############################################################################
 def extract_text_pdfplumber_custom(pdf_bytes: bytes) -> str:
     try:
-        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-            extracted_text = "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
-        return extracted_text
+        return PageStream.read_text(pdf_bytes, skip_empty=True)
     except Exception as e:
         st.error(f"Error with pdfplumber: {e}")
         return ""
 
 def extract_text_pymupdf_custom(pdf_bytes: bytes) -> str:
+    import fitz  # PyMuPDF
     try:
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
         extracted_text = "\n".join(page.get_text() for page in doc)
@@ -1525,80 +1499,13 @@ def extract_text_pymupdf_custom(pdf_bytes: bytes) -> str:
         st.error(f"Error with PyMuPDF: {e}")
         return ""
 
-def parse_line_into_columns(line: str) -> list:
-    tokens = line.split()
-    number_parts = []
-    edition = ""
-    description_parts = []
-    edition_pattern = re.compile(r"^\d{2}-\d{4}$")
-    found_edition = False
-
-    for token in tokens:
-        if not found_edition and edition_pattern.match(token):
-            edition = token
-            found_edition = True
-        else:
-            if not found_edition:
-                number_parts.append(token)
-            else:
-                description_parts.append(token)
-
-    number = " ".join(number_parts).strip()
-    description = " ".join(description_parts).strip()
-    return [number, edition, description]
-
-
-
 
 def parse_policy_forms(text: str) -> dict:
     """
     Extract Policy Forms sections for all coverage_titles, parsing table rows until
     narrative markers appear or duplicate rows indicate we've looped. Returns a dict of section name -> rows.
     """
-    import re
-    lines = text.splitlines()
-    sections = {}
-    coverage_titles = ["Commercial Auto Coverage Part", "Commercial Auto"]
-    # Narrative markers to stop parsing rows
-    narrative_markers = ["policy number:", "applicant", "effective date:", "commercial automobile cl pn", "all commercial inland marine coverages"]
-    # Pattern for a new table row: code + space + edition (dd-yyyy)
-    row_pattern = re.compile(r'^[A-Z0-9 ]+\s\d{2}-\d{4}\b')
-
-    for title in coverage_titles:
-        # Find the title line
-        idx = next((i for i, l in enumerate(lines) if l.strip() == title), None)
-        if idx is None:
-            continue
-        # Find header row with Number, Edition, Description
-        header_idx = next((j for j in range(idx+1, len(lines))
-                           if all(k in lines[j].lower() for k in ["number", "edition", "description"])), None)
-        if header_idx is None:
-            continue
-        rows = []
-        seen = set()
-        # Parse rows after header
-        for line in lines[header_idx + 1:]:
-            txt = line.strip()
-            low = txt.lower()
-            # Stop if narrative markers are encountered
-            if any(marker in low for marker in narrative_markers):
-                break
-            # If line matches a new row
-            if row_pattern.match(txt):
-                num, edt, desc = parse_line_into_columns(txt)
-                # Break on duplicated row tuple
-                if (num, edt) in seen:
-                    break
-                seen.add((num, edt))
-                rows.append([num, edt, clean_description(desc)])
-            else:
-                # Continuation of previous description
-                if rows and txt:
-                    prev_desc = rows[-1][2]
-                    rows[-1][2] = clean_description(prev_desc + " " + txt)
-        if rows:
-            sections[title] = rows
-    return sections
+    return parse_policy_forms_for_lob(text, "Auto")
 ##############################################################################
 # MAIN FUNCTION
 ##############################################################################
@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import statistics
+
+import TextBackends
+
+############################################
+# Text-backend auto-tuner over a golden-output corpus
+#
+# Corpus layout (one directory per labeled packet):
+#   golden/<case>/<packet>.pdf
+#   golden/<case>/expected.json   {"pdf": "<packet>.pdf", "sections": {section: expected output}}
+#
+# Every section parser runs on every case under every backend. The fastest
+# backend that reproduces the expected output on all cases wins and is
+# written to text_backends.json, which TextBackends loads at startup.
+# Only the sections in SECTION_RUNNERS are tuned; the others depend on
+# pdfplumber layout (see TextBackends).
+#
+# Run with: python BackendTuner.py [--corpus golden] [--label] [--repeat 3]
+#   --label writes expected.json for unlabeled cases from the current
+#   backends; review those files before tuning against them.
+############################################
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+def _normalize(value):
+    """Turn parser output (DataFrames, dicts, tuples) into comparable JSON values."""
+    import pandas as pd
+
+    if isinstance(value, pd.DataFrame):
+        return [{str(k): _normalize(v) for k, v in row.items()} for row in value.fillna("").to_dict("records")]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    return str(value)
+
+def _run_policy(pdf_bytes):
+    import Policy
+    return Policy.extract_policy_information(pdf_bytes)
+
+def _run_property(pdf_bytes):
+    import Property
+    data = Property.parse_property_pdf(pdf_bytes, forms_sections={})
+    return {k: v for k, v in data.items() if k != "forms_sections"}
+
+def _run_forms(pdf_bytes):
+    import PolicyForms
+    return PolicyForms.parse_all_policy_forms(PolicyForms.extract_forms_text(pdf_bytes))
+
+def _run_wc(pdf_bytes):
+    import WC
+    text = WC.get_pdf_text(pdf_bytes)
+    lines = text.splitlines()
+    return {
+        "workers_comp": WC.extract_workers_comp_table(lines),
+        "state_segments": WC.extract_state_segments(lines),
+        "policy_forms": WC.parse_policy_forms(text),
+    }
+
+# Section -> parser run whose output is scored; keys match TextBackends.DEFAULT_BACKENDS
+SECTION_RUNNERS = {
+    "Policy Information": _run_policy,
+    "Property": _run_property,
+    "Policy Forms": _run_forms,
+    "Workers Compensation": _run_wc,
+}
+
+def load_corpus(corpus_dir):
+    """[(case name, case dir, manifest)] for every case directory holding a PDF."""
+    cases = []
+    for name in sorted(os.listdir(corpus_dir)):
+        case_dir = os.path.join(corpus_dir, name)
+        if not os.path.isdir(case_dir):
+            continue
+        manifest_path = os.path.join(case_dir, "expected.json")
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        if "pdf" not in manifest:
+            pdfs = sorted(p for p in os.listdir(case_dir) if p.lower().endswith(".pdf"))
+            if not pdfs:
+                continue
+            manifest["pdf"] = pdfs[0]
+        cases.append((name, case_dir, manifest))
+    return cases
+
+def run_section(section, pdf_bytes, backend, repeat=1):
+    """(normalized output or None, median seconds, error or None) of one section under one backend."""
+    times = []
+    output = None
+    try:
+        with TextBackends.override(section, backend):
+            for _ in range(repeat):
+                started = time.perf_counter()
+                output = _normalize(SECTION_RUNNERS[section](pdf_bytes))
+                times.append(time.perf_counter() - started)
+    except Exception as e:
+        return None, None, f"{e.__class__.__name__}: {e}"
+    return output, statistics.median(times), None
+
+def accuracy(output, expected) -> float:
+    """Share of the expected tables/fields the output reproduces exactly."""
+    if output is None:
+        return 0.0
+    if not isinstance(expected, dict) or not isinstance(output, dict):
+        return 1.0 if output == expected else 0.0
+    if not expected:
+        return 1.0 if not output else 0.0
+    return sum(1 for k, v in expected.items() if output.get(k) == v) / len(expected)
+
+def label(cases):
+    """Write expected.json for unlabeled cases from the currently configured backends."""
+    for name, case_dir, manifest in cases:
+        if manifest.get("sections"):
+            continue
+        with open(os.path.join(case_dir, manifest["pdf"]), "rb") as f:
+            pdf_bytes = f.read()
+        sections = {}
+        for section in SECTION_RUNNERS:
+            output, _, error = run_section(section, pdf_bytes, TextBackends.backend_for(section))
+            if error is None and output:
+                sections[section] = output
+        manifest["sections"] = sections
+        with open(os.path.join(case_dir, "expected.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"labeled {name}: {', '.join(sections) or 'no sections'} (review before tuning)")
+
+def tune(cases, backends=TextBackends.BACKENDS, repeat=3, min_accuracy=1.0):
+    """
+    Score every section under every backend over the labeled cases.
+    Returns ({section: chosen backend}, {section: {backend: score}}).
+    """
+    scores = {}
+    for section in SECTION_RUNNERS:
+        labeled = [(name, case_dir, manifest) for name, case_dir, manifest in cases
+                   if section in manifest.get("sections", {})]
+        if not labeled:
+            continue
+        scores[section] = {}
+        for backend in backends:
+            accuracies, seconds, errors = [], [], []
+            for name, case_dir, manifest in labeled:
+                with open(os.path.join(case_dir, manifest["pdf"]), "rb") as f:
+                    pdf_bytes = f.read()
+                output, elapsed, error = run_section(section, pdf_bytes, backend, repeat)
+                accuracies.append(accuracy(output, manifest["sections"][section]))
+                if elapsed is not None:
+                    seconds.append(elapsed)
+                if error:
+                    errors.append(f"{name}: {error}")
+            scores[section][backend] = {
+                "accuracy": round(min(accuracies), 4),
+                "mean_accuracy": round(statistics.mean(accuracies), 4),
+                "seconds": round(sum(seconds), 4) if len(seconds) == len(labeled) else None,
+                "errors": errors,
+            }
+
+    chosen = {}
+    for section, by_backend in scores.items():
+        correct = [
+            (score["seconds"], backend) for backend, score in by_backend.items()
+            if score["accuracy"] >= min_accuracy and score["seconds"] is not None
+        ]
+        # No backend reproduces every case: keep what the section used before
+        chosen[section] = min(correct)[1] if correct else TextBackends.DEFAULT_BACKENDS[section]
+    return chosen, scores
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick the fastest correct text backend per section")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--output", default=TextBackends.CONFIG_PATH)
+    parser.add_argument("--backends", nargs="+", default=list(TextBackends.BACKENDS), choices=TextBackends.BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-accuracy", type=float, default=1.0)
+    parser.add_argument("--label", action="store_true", help="write expected.json for unlabeled cases")
+    parser.add_argument("--dry-run", action="store_true", help="print the scores without writing the config")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.corpus):
+        sys.exit(f"Corpus directory not found: {args.corpus}")
+    cases = load_corpus(args.corpus)
+    if args.label:
+        label(cases)
+        return
+
+    chosen, scores = tune(cases, args.backends, args.repeat, args.min_accuracy)
+    if not scores:
+        sys.exit("No labeled cases; run with --label first and review the expected.json files.")
+    print(f"{'section':<24}{'backend':<12}{'accuracy':>9}{'seconds':>10}")
+    for section, by_backend in scores.items():
+        for backend, score in by_backend.items():
+            mark = "  <- chosen" if chosen[section] == backend else ""
+            seconds = f"{score['seconds']:.3f}" if score["seconds"] is not None else "error"
+            print(f"{section:<24}{backend:<12}{score['accuracy']:>9.2f}{seconds:>10}{mark}")
+
+    if args.dry_run:
+        return
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "corpus": os.path.abspath(args.corpus),
+            "cases": len(cases),
+            "min_accuracy": args.min_accuracy,
+            "backends": chosen,
+            "scores": scores,
+        }, f, indent=2)
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import io
+import os
+import re
+import csv
+import time
+import zipfile
+import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import JobQueue
+import Deadlines
+import PdfProbe
+import Preview
+
+############################################
+# Batch mode: many accounts in one upload
+############################################
+# Uploaded PDFs (and PDFs inside uploaded .zip folders) are grouped into
+# accounts by named insured or quote number; each account's proposal is
+# generated on its own thread through JobQueue, and every finished proposal
+# goes into one zip together with a status sheet.
+PDF_EXTENSIONS = (".pdf",)
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+# Worker threads per batch; JobQueue still decides how many extract at once
+BATCH_WORKERS = max(1, int(os.environ.get("PROPOSAL_BATCH_WORKERS", JobQueue.WORKERS)))
+
+QUOTE_RE = re.compile(r"Quote\s+No\.?:?\s*([A-Z0-9][A-Z0-9\-]{3,})", re.IGNORECASE)
+# Dropped when comparing insured names
+NAME_SUFFIXES = {"INC", "LLC", "LLP", "LP", "LTD", "CO", "CORP", "CORPORATION", "COMPANY", "THE"}
+
+def expand_uploads(files) -> list:
+    """[(file name, bytes)] of the uploaded PDFs and Excel files, including those inside .zip uploads."""
+    out = []
+    for f in files:
+        name = os.path.basename(getattr(f, "name", "upload"))
+        data = f.getvalue() if hasattr(f, "getvalue") else f.read()
+        if not name.lower().endswith(".zip"):
+            out.append((name, data))
+            continue
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for info in archive.infolist():
+                member = os.path.basename(info.filename)
+                if info.is_dir() or not member or member.startswith(".") or "__MACOSX" in info.filename:
+                    continue
+                if member.lower().endswith(PDF_EXTENSIONS + EXCEL_EXTENSIONS):
+                    out.append((member, archive.read(info)))
+    return out
+
+def normalize_name(name: str) -> str:
+    words = re.sub(r"[^A-Z0-9 ]+", " ", (name or "").upper()).split()
+    return " ".join(w for w in words if w not in NAME_SUFFIXES)
+
+def _head_text(pdf_bytes, pages=2) -> str:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        return "\n".join(doc[i].get_text("text") for i in range(min(pages, len(doc))))
+    finally:
+        doc.close()
+
+def _insured_and_quote(text):
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    insured = ""
+    for i, line in enumerate(lines):
+        if "Named Insured Name and Address" in line and i + 1 < len(lines):
+            insured = lines[i + 1]
+            break
+    match = QUOTE_RE.search(text)
+    return insured, match.group(1).upper() if match else ""
+
+def identify(name, data) -> dict:
+    """Kind (main/wc/excel), probe, insured and quote number of one uploaded file."""
+    item = {"file": name, "data": data, "kind": "excel", "probe": None, "insured": "", "quote": "", "error": ""}
+    if name.lower().endswith(EXCEL_EXTENSIONS):
+        return item
+    try:
+        probe = PdfProbe.probe_pdf(data)
+        item["kind"] = "wc" if name.lower().startswith("wca") else probe["kind"]
+        item["probe"] = probe
+        head = "\n".join(probe["page_texts"][:2]) if probe["page_texts"] else _head_text(data)
+        item["insured"], item["quote"] = _insured_and_quote(head)
+    except Exception as e:
+        item["kind"] = "wc" if name.lower().startswith("wca") else "main"
+        item["error"] = f"could not read PDF: {e}"
+    return item
+
+def group_accounts(items) -> list:
+    """
+    Accounts from identified files. PDFs sharing a quote number or a named
+    insured belong together; Excel files join the account whose insured or
+    quote number appears in their file name.
+    """
+    parent = {}
+
+    def find(key):
+        while parent.setdefault(key, key) != key:
+            key = parent[key]
+        return key
+
+    pdfs = [item for item in items if item["kind"] != "excel"]
+    for item in pdfs:
+        keys = [k for k in (f"Q:{item['quote']}" if item["quote"] else "",
+                            f"N:{normalize_name(item['insured'])}" if normalize_name(item["insured"]) else "") if k]
+        item["_key"] = keys[0] if keys else f"F:{item['file']}"
+        for key in keys[1:]:
+            parent[find(key)] = find(item["_key"])
+
+    accounts = {}
+    for item in pdfs:
+        account = accounts.setdefault(find(item["_key"]), {
+            "account": "", "files": [], "main": [], "wc": [], "excel": None, "error": "",
+        })
+        account["files"].append(item["file"])
+        account["main" if item["kind"] == "main" else "wc"].append(item)
+        if not account["account"]:
+            account["account"] = item["insured"] or item["quote"] or os.path.splitext(item["file"])[0]
+        if item["error"]:
+            account["error"] = f"{item['file']}: {item['error']}"
+
+    accounts = list(accounts.values())
+    for item in items:
+        if item["kind"] != "excel":
+            continue
+        stem = normalize_name(os.path.splitext(item["file"])[0])
+        match = next((a for a in accounts if any(
+            (p["quote"] and p["quote"] in stem.replace(" ", "")) or
+            (normalize_name(p["insured"]) and normalize_name(p["insured"]) in stem)
+            for p in a["main"] + a["wc"]
+        )), None)
+        if match is None:
+            accounts.append({"account": os.path.splitext(item["file"])[0], "files": [item["file"]], "main": [],
+                             "wc": [], "excel": item, "error": "no PDF matched this Excel file"})
+        else:
+            match["files"].append(item["file"])
+            match["excel"] = item
+    for account in accounts:
+        for kind in ("main", "wc"):
+            if len(account[kind]) > 1 and not account["error"]:
+                account["error"] = f"{len(account[kind])} {kind} packets; upload one per account"
+    return accounts
+
+def run_account(account, underwriter="", on_start=None):
+    """
+    Generate one account's proposal on this thread once JobQueue gives it a
+    slot; returns (docx bytes, skipped sections). Each run is timed and
+    sent to Telemetry like a single-account run.
+    """
+    import ProposalPipeline
+    import BookOfBusiness
+    import Profiling
+
+    main = account["main"][0] if account["main"] else None
+    wc = account["wc"][0] if account["wc"] else None
+    pages = sum(item["probe"]["page_count"] if item["probe"] else 1 for item in (main, wc) if item)
+    ticket = None
+    Preview.mute()  # previews belong to the script thread
+    try:
+        ticket = JobQueue.acquire(pages)
+        if on_start is not None:
+            on_start()
+        Deadlines.start_run()
+        Profiling.start_run(True, trace_memory=False, underwriter=underwriter, files=account["files"], batch=True)
+        try:
+            word_io, shape, result = ProposalPipeline.generate_proposal(
+                main["data"] if main else None, wc["data"] if wc else None,
+                io.BytesIO(account["excel"]["data"]) if account["excel"] else None,
+                main_probe=main["probe"] if main and main["probe"] and main["probe"]["kind"] == "main" else None,
+                underwriter=underwriter,
+            )
+        finally:
+            run_record = Profiling.finish_run(write=False)
+        ProposalPipeline.record_telemetry(
+            run_record, main["data"] if main else None, wc["data"] if wc else None, shape, underwriter,
+            page_count=main["probe"]["page_count"] if main and main["probe"] else None,
+        )
+        BookOfBusiness.record(result)
+        return word_io.getvalue(), Deadlines.skipped_sections()
+    finally:
+        JobQueue.release(ticket)
+
+def run_batch(accounts, underwriter="", on_update=None, workers=None) -> list:
+    """
+    Run every account that has a PDF and no grouping error, BATCH_WORKERS at
+    a time. Returns one status row per account (plus its "_docx" bytes);
+    on_update(rows) is called about once a second while the batch runs.
+    """
+    rows = [{
+        "Account": a["account"],
+        "Files": ", ".join(a["files"]),
+        "Status": "failed" if a["error"] or not (a["main"] or a["wc"]) else "queued",
+        "Seconds": None,
+        "Notes": a["error"] or ("" if a["main"] or a["wc"] else "no PDF"),
+        "_docx": None,
+    } for a in accounts]
+    started = {}
+
+    def run(i):
+        def on_start():
+            started[i] = time.perf_counter()
+            rows[i]["Status"] = "running"
+        return run_account(accounts[i], underwriter, on_start)
+
+    with ThreadPoolExecutor(max_workers=workers or BATCH_WORKERS, thread_name_prefix="proposal-batch") as pool:
+        pending = {pool.submit(run, i): i for i, row in enumerate(rows) if row["Status"] == "queued"}
+        while pending:
+            done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                row = rows[i]
+                try:
+                    row["_docx"], skipped = future.result()
+                    row["Status"] = "done"
+                    row["Notes"] = "; ".join(f"{s} skipped ({r})" for s, r in skipped.items())
+                except Exception as e:
+                    row["Status"] = "failed"
+                    row["Notes"] = f"{e.__class__.__name__}: {e}"
+                if i in started:
+                    row["Seconds"] = round(time.perf_counter() - started[i], 1)
+            for i in pending.values():
+                if i in started:
+                    rows[i]["Seconds"] = round(time.perf_counter() - started[i], 1)
+            if on_update is not None:
+                on_update(rows)
+    return rows
+
+def _safe_filename(name) -> str:
+    return re.sub(r"[^\w\-. ]+", "", name).strip(" .") or "proposal"
+
+def build_zip(rows) -> bytes:
+    """One .docx per finished account plus batch_status.csv."""
+    buffer = io.BytesIO()
+    used = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for row in rows:
+            if not row["_docx"]:
+                continue
+            base = _safe_filename(row["Account"])
+            name, n = f"{base}.docx", 2
+            while name in used:
+                name, n = f"{base} ({n}).docx", n + 1
+            used.add(name)
+            archive.writestr(name, row["_docx"])
+        status = io.StringIO()
+        writer = csv.DictWriter(status, fieldnames=["Account", "Files", "Status", "Seconds", "Notes"], extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+        archive.writestr("batch_status.csv", status.getvalue())
+    return buffer.getvalue()
+
+def render(uploaded_files, underwriter=""):
+    """Streamlit batch page: grouping, live status table and the zip download."""
+    import pandas as pd
+    import streamlit as st
+
+    with st.spinner("Reading uploads..."):
+        items = [identify(name, data) for name, data in expand_uploads(uploaded_files)]
+        accounts = group_accounts(items)
+    if not accounts:
+        st.error("No PDF files found in the upload.")
+        return
+    st.subheader(f"Batch: {len(accounts)} accounts")
+    table_slot = st.empty()
+
+    def show(rows):
+        table_slot.dataframe(
+            pd.DataFrame(rows)[["Account", "Files", "Status", "Seconds", "Notes"]],
+            use_container_width=True, hide_index=True,
+        )
+
+    rows = run_batch(accounts, underwriter, on_update=show)
+    show(rows)
+    done = sum(1 for row in rows if row["Status"] == "done")
+    st.write(f"{done} of {len(rows)} proposals generated.")
+    st.download_button(
+        label="Download all proposals (.zip)",
+        data=build_zip(rows),
+        file_name=f"proposals_{datetime.date.today():%Y%m%d}.zip",
+        mime="application/zip",
+    )
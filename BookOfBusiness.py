@@ -0,0 +1,433 @@
+import os
+import re
+import sys
+import glob
+import json
+import hashlib
+import argparse
+import datetime
+
+import ProposalResult
+
+############################################
+# Columnar book-of-business store of extracted proposals
+############################################
+# Every finished proposal's ProposalResult is appended to a set of local
+# Parquet datasets, one per kind of row (coverages, vehicles, locations,
+# forms, GL and WC classifications), hive-partitioned by month and
+# underwriter:
+#   book_of_business/<dataset>/month=2026-10/underwriter=Smith/<proposal_id>-0.parquet
+# A proposal is identified by its rating company and quote (or policy)
+# number, so a revised or re-uploaded quote replaces the earlier rows in
+# whichever month and underwriter partition they were stored.
+#
+# Query with load()/premium_by(), or from the command line:
+#   python BookOfBusiness.py auto-by-state [--since 2026-01] [--underwriter Smith]
+#   python BookOfBusiness.py gl-by-class
+#   python BookOfBusiness.py backfill proposal_results/
+############################################
+BOOK_DIR = os.environ.get(
+    "PROPOSAL_BOOK_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "book_of_business")
+)
+# Partition value for proposals run without an underwriter template
+NO_UNDERWRITER = "Unassigned"
+
+_PROPOSAL_COLUMNS = ["proposal_id", "created", "named_insured", "rating_company", "policy_no"]
+_PARTITION_COLUMNS = ["month", "underwriter"]
+
+# Dataset -> its own columns; premium/amount columns are float64, the rest strings
+DATASETS = {
+    "coverages": ["section", "table", "coverage", "state", "location", "limit", "deductible",
+                  "premium_text", "premium"],
+    "vehicles": ["veh_no", "year", "model", "vin", "state", "territory", "value", "premium_text", "premium"],
+    "locations": ["section", "location", "address", "city_state_zip", "territory"],
+    "forms": ["section", "title", "number", "edition", "description"],
+    "gl_classes": ["state", "location", "code", "classification", "premium_basis", "basis_type",
+                   "prem_ops_premium", "prod_comp_ops_premium", "premium"],
+    "wc_classes": ["state", "loc", "st", "code", "classification", "payroll", "rate", "premium_text", "premium"],
+}
+_FLOAT_COLUMNS = {"premium", "prem_ops_premium", "prod_comp_ops_premium"}
+
+# (section, table) pairs whose rows are premiums by coverage
+COVERAGE_TABLES = [
+    ("Policy Information", "Coverages"),
+    ("Property", "Coverages"),
+    ("Property", "Location Coverages"),
+    ("Property", "Policy Level Endorsements"),
+    ("Property", "Other Coverages"),
+    ("General Liability", "Coverages"),
+    ("General Liability", "Additional Coverages"),
+    ("Employment", "Coverage"),
+    ("Auto", "Coverages Premium"),
+    ("Auto", "Cost of Hire (Used)"),
+    ("Auto", "Cost of Hire (NOT Used)"),
+    ("Auto", "Non-Ownership Liability"),
+    ("Auto", "Additional Coverages"),
+    ("Auto", "Vehicle Coverages"),
+    ("Auto", "Location Coverages"),
+    ("Inland Marine", "Coverage"),
+    ("Umbrella", "CoveragePremium"),
+    ("Workers Compensation", "Additional Premium"),
+]
+
+def parse_amount(value):
+    """'$1,234.00' -> 1234.0; blanks, 'Included' and other text -> None."""
+    text = str(value or "").strip()
+    negative = text.startswith("(") and text.endswith(")")
+    text = re.sub(r"[\s$,()]", "", text)
+    if not re.fullmatch(r"-?\d+(?:\.\d+)?", text):
+        return None
+    amount = float(text)
+    return -amount if negative else amount
+
+def _pick(columns, *candidates):
+    """First column whose name matches one of the candidates (case-insensitive), or None."""
+    lowered = {c.strip().lower(): c for c in columns}
+    for candidate in candidates:
+        if candidate.lower() in lowered:
+            return lowered[candidate.lower()]
+    return None
+
+def _premium_column(columns):
+    exact = _pick(columns, "Premium", "Estimated Total Premium", "Estimated Annual Premium")
+    if exact:
+        return exact
+    return next((c for c in columns if "premium" in c.lower()), None)
+
+def _get(row, column):
+    return str(row.get(column, "") or "").strip() if column else ""
+
+def _quote_fields(result) -> dict:
+    policy = result.sections.get("Policy Information")
+    wc = result.sections.get("Workers Compensation")
+    return {**(wc.fields if wc else {}), **(policy.fields if policy else {})}
+
+def _normalize_key(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().upper()
+
+def proposal_id(result) -> str:
+    """
+    Hash of the rating company and quote (or policy) number, the same for
+    every revision and re-upload of a quote. Without a number it falls back
+    to result.meta["proposal_id"], then to a hash of the extracted sections.
+    """
+    fields = _quote_fields(result)
+    number = _normalize_key(fields.get("Quote No.") or fields.get("Policy No."))
+    if number:
+        key = f"{_normalize_key(fields.get('Rating Company'))}|{number}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    if result.meta.get("proposal_id"):
+        return str(result.meta["proposal_id"])
+    sections = json.dumps(result.to_dict()["sections"], sort_keys=True)
+    return hashlib.sha256(sections.encode("utf-8")).hexdigest()[:32]
+
+def _proposal_fields(result) -> dict:
+    fields = _quote_fields(result)
+    created = str(result.meta.get("created") or datetime.datetime.now().isoformat(timespec="seconds"))
+    return {
+        "proposal_id": proposal_id(result),
+        "created": created,
+        "named_insured": str(fields.get("Named Insured", "")),
+        "rating_company": str(fields.get("Rating Company", "")),
+        "policy_no": str(fields.get("Policy No.", "") or fields.get("Quote No.", "")),
+        "month": created[:7],
+        "underwriter": str(result.meta.get("underwriter") or NO_UNDERWRITER),
+    }
+
+def coverage_rows(result) -> list:
+    rows = []
+    for section, name in COVERAGE_TABLES:
+        table = result.table(section, name)
+        if table is None or table.empty:
+            continue
+        columns = table.columns
+        premium_col = _premium_column(columns)
+        if premium_col is None:
+            continue
+        coverage_col = _pick(columns, "Coverage", "Coverages", "General Liability Coverages", "Coverage Part",
+                             "Description", "Type", "Named Insured's Business")
+        state_col = _pick(columns, "State", "ST")
+        location_col = _pick(columns, "Location", "Loc/Bld", "Location No./Building No.", "Veh#")
+        limit_col = _pick(columns, "Limit", "Limits", "Aggregate Limit")
+        deductible_col = _pick(columns, "Deductible", "Ded")
+        for record in table.records():
+            coverage = _get(record, coverage_col) or section
+            if coverage.lower().startswith("total"):  # totals would count the premium twice
+                continue
+            premium_text = _get(record, premium_col)
+            rows.append({
+                "section": section,
+                "table": name,
+                "coverage": coverage,
+                "state": _get(record, state_col),
+                "location": _get(record, location_col),
+                "limit": _get(record, limit_col),
+                "deductible": _get(record, deductible_col),
+                "premium_text": premium_text,
+                "premium": parse_amount(premium_text),
+            })
+    return rows
+
+def vehicle_rows(result) -> list:
+    table = result.table("Auto", "Schedule of Covered Autos")
+    if table is None:
+        return []
+    rows = []
+    for record in table.records():
+        premium_text = _get(record, "Premium")
+        rows.append({
+            "veh_no": _get(record, "Veh No."),
+            "year": _get(record, "Year"),
+            "model": _get(record, "Model"),
+            "vin": _get(record, "VIN Number"),
+            "state": _get(record, _pick(record, "State", "ST")),
+            "territory": _get(record, "Territory"),
+            "value": _get(record, "Value"),
+            "premium_text": premium_text,
+            "premium": parse_amount(premium_text),
+        })
+    return rows
+
+def location_rows(result) -> list:
+    rows = []
+    gl = result.table("General Liability", "Locations")
+    for record in (gl.records() if gl is not None else []):
+        rows.append({
+            "section": "General Liability",
+            "location": _get(record, "Location No."),
+            "address": _get(record, "Street Address"),
+            "city_state_zip": _get(record, "City, State and Zip Code"),
+            "territory": _get(record, "Territory"),
+        })
+    prop = result.table("Property", "Location Coverages")
+    seen = set()
+    for record in (prop.records() if prop is not None else []):
+        key = (_get(record, "Loc/Bld"), _get(record, "Address"))
+        if key in seen or not any(key):
+            continue
+        seen.add(key)
+        rows.append({"section": "Property", "location": key[0], "address": key[1],
+                     "city_state_zip": "", "territory": ""})
+    return rows
+
+def form_rows(result) -> list:
+    rows = []
+    for section, sec in result.sections.items():
+        for title, table in sec.forms.items():
+            for number, edition, description, *_ in (tuple(r) + ("", "", "") for r in table.rows):
+                rows.append({"section": section, "title": title, "number": str(number),
+                             "edition": str(edition), "description": str(description)})
+    return rows
+
+def gl_class_rows(result) -> list:
+    sec = result.sections.get("General Liability")
+    rows = []
+    for name, table in (sec.tables.items() if sec else ()):
+        if not name.startswith("Classification & Premium"):
+            continue
+        for record in table.records():
+            prem_ops = parse_amount(record.get("Prem/Ops Premium"))
+            prod_comp = parse_amount(record.get("Prod/Comp Ops Premium"))
+            rows.append({
+                "state": _get(record, "State"),
+                "location": _get(record, "Location"),
+                "code": _get(record, "Code No.").replace(",", "").replace("$", ""),
+                "classification": _get(record, "Classification"),
+                "premium_basis": _get(record, "Premium Basis"),
+                "basis_type": _get(record, "Basis Type"),
+                "prem_ops_premium": prem_ops,
+                "prod_comp_ops_premium": prod_comp,
+                "premium": None if prem_ops is None and prod_comp is None else (prem_ops or 0.0) + (prod_comp or 0.0),
+            })
+    return rows
+
+def wc_class_rows(result) -> list:
+    sec = result.sections.get("Workers Compensation")
+    rows = []
+    for name, table in (sec.tables.items() if sec else ()):
+        if not name.startswith("Schedule of Operations - "):
+            continue
+        for record in table.records():
+            premium_text = _get(record, "Estimated Annual Premium")
+            rows.append({
+                "state": name[len("Schedule of Operations - "):],
+                "loc": _get(record, "Loc"),
+                "st": _get(record, "ST"),
+                "code": _get(record, "Code No."),
+                "classification": _get(record, "Classification"),
+                "payroll": _get(record, "Premium Basis Total Estimated Annual Remuneration"),
+                "rate": _get(record, "Rate Per $100 of Remuneration"),
+                "premium_text": premium_text,
+                "premium": parse_amount(premium_text),
+            })
+    return rows
+
+ROW_BUILDERS = {
+    "coverages": coverage_rows,
+    "vehicles": vehicle_rows,
+    "locations": location_rows,
+    "forms": form_rows,
+    "gl_classes": gl_class_rows,
+    "wc_classes": wc_class_rows,
+}
+
+def schema(dataset):
+    import pyarrow as pa
+
+    return pa.schema([
+        (c, pa.float64() if c in _FLOAT_COLUMNS else pa.string())
+        for c in _PROPOSAL_COLUMNS + DATASETS[dataset] + _PARTITION_COLUMNS
+    ])
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([(c, pa.string()) for c in _PARTITION_COLUMNS]), flavor="hive")
+
+def remove_proposal(pid, dataset_dir) -> int:
+    """Delete a proposal's files from every partition of one dataset; returns how many."""
+    paths = glob.glob(os.path.join(glob.escape(dataset_dir), "*", "*", f"{glob.escape(pid)}-*.parquet"))
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+def append(result, book_dir=None) -> dict:
+    """
+    Write one proposal's rows to every dataset, replacing the rows of any
+    earlier revision. Returns {dataset: rows written}.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    base = _proposal_fields(result)
+    written = {}
+    for dataset, build in ROW_BUILDERS.items():
+        rows = [{**base, **row} for row in build(result)]
+        remove_proposal(base["proposal_id"], os.path.join(book_dir or BOOK_DIR, dataset))
+        if not rows:
+            continue
+        ds.write_dataset(
+            pa.Table.from_pylist(rows, schema=schema(dataset)),
+            os.path.join(book_dir or BOOK_DIR, dataset),
+            format="parquet",
+            partitioning=_partitioning(),
+            basename_template=f"{base['proposal_id']}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        written[dataset] = len(rows)
+    return written
+
+def record(result, book_dir=None):
+    """append() for the app and job service: errors are printed, never raised."""
+    try:
+        return append(result, book_dir)
+    except Exception as e:
+        print(f"BookOfBusiness: could not store proposal: {e.__class__.__name__}: {e}", file=sys.stderr)
+        return None
+
+def _filter(since=None, until=None, underwriters=None, sections=None):
+    import pyarrow.dataset as ds
+
+    expr = None
+    for part in (
+        ds.field("month") >= since[:7] if since else None,
+        ds.field("month") <= until[:7] if until else None,
+        ds.field("underwriter").isin(list(underwriters)) if underwriters else None,
+        ds.field("section").isin(list(sections)) if sections else None,
+    ):
+        if part is not None:
+            expr = part if expr is None else expr & part
+    return expr
+
+def load_table(dataset, columns=None, since=None, until=None, underwriters=None, sections=None, book_dir=None):
+    """
+    Rows of one dataset as a pyarrow Table. since/until are "YYYY-MM" months
+    (inclusive); month and underwriter filters only open the matching partitions.
+    """
+    import pyarrow.dataset as ds
+
+    path = os.path.join(book_dir or BOOK_DIR, dataset)
+    if not os.path.isdir(path):
+        return schema(dataset).empty_table().select(columns or schema(dataset).names)
+    data = ds.dataset(path, format="parquet", schema=schema(dataset), partitioning=_partitioning())
+    return data.to_table(columns=columns, filter=_filter(since, until, underwriters, sections))
+
+def load(dataset, **kwargs):
+    """load_table() as a DataFrame."""
+    return load_table(dataset, **kwargs).to_pandas()
+
+def premium_by(dataset, by, value="premium", **kwargs):
+    """Total, count and proposal count of value grouped by the by column(s), largest first."""
+    by = [by] if isinstance(by, str) else list(by)
+    table = load_table(dataset, columns=by + [value, "proposal_id"], **kwargs)
+    grouped = table.group_by(by).aggregate([
+        (value, "sum"), (value, "count"), ("proposal_id", "count_distinct"),
+    ])
+    df = grouped.to_pandas().rename(columns={
+        f"{value}_sum": "total_premium", f"{value}_count": "rows", "proposal_id_count_distinct": "proposals",
+    })
+    return df.sort_values("total_premium", ascending=False, ignore_index=True)
+
+def auto_premium_by_state(**kwargs):
+    """Scheduled auto premium (per vehicle) by garaging state."""
+    return premium_by("vehicles", "state", **kwargs)
+
+def gl_premium_by_class_code(**kwargs):
+    """GL premises/ops plus products/completed ops premium by class code."""
+    return premium_by("gl_classes", ["code", "classification"], **kwargs)
+
+def wc_premium_by_class_code(**kwargs):
+    return premium_by("wc_classes", ["code", "classification"], **kwargs)
+
+def premium_by_coverage(**kwargs):
+    return premium_by("coverages", ["section", "coverage"], **kwargs)
+
+def backfill(paths, book_dir=None) -> int:
+    """Append stored ProposalResult JSON files (e.g. the job service's *.result.json)."""
+    count = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            result = ProposalResult.ProposalResult.from_json(f.read())
+        if not result.meta.get("proposal_id"):
+            result.meta["proposal_id"] = os.path.basename(path).split(".")[0]
+        append(result, book_dir)
+        count += 1
+    return count
+
+QUERIES = {
+    "auto-by-state": auto_premium_by_state,
+    "gl-by-class": gl_premium_by_class_code,
+    "wc-by-class": wc_premium_by_class_code,
+    "by-coverage": premium_by_coverage,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the book of business built from extracted proposals")
+    parser.add_argument("command", choices=list(QUERIES) + ["backfill"])
+    parser.add_argument("paths", nargs="*", help="backfill: result JSON files or directories holding them")
+    parser.add_argument("--book-dir", default=BOOK_DIR)
+    parser.add_argument("--since", help="first month, YYYY-MM")
+    parser.add_argument("--until", help="last month, YYYY-MM")
+    parser.add_argument("--underwriter", action="append", help="repeat for several")
+    parser.add_argument("--top", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        files = []
+        for path in args.paths:
+            files.extend(sorted(glob.glob(os.path.join(path, "*.result.json"))) if os.path.isdir(path) else [path])
+        print(f"Appended {backfill(files, args.book_dir)} proposals to {args.book_dir}")
+        return
+
+    import pandas as pd
+
+    df = QUERIES[args.command](book_dir=args.book_dir, since=args.since, until=args.until,
+                               underwriters=args.underwriter)
+    if df.empty:
+        sys.exit(f"No proposals stored in {args.book_dir} for this selection.")
+    with pd.option_context("display.max_rows", args.top, "display.width", 160):
+        print(df.head(args.top).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import pickle
+import tempfile
+import functools
+import threading
+import importlib
+import inspect
+import traceback
+import multiprocessing
+
+import PageStream
+import Profiling
+
+############################################
+# Per-section deadlines with worker-process isolation
+############################################
+# Seconds each proposal section may spend extracting, summed over its calls.
+# Override with PROPOSAL_SECTION_DEADLINES='{"Auto": 300}' and turn isolation
+# off (run extractors inline, no deadline) with PROPOSAL_ISOLATE=0.
+SECTION_DEADLINES = {
+    "Policy Information": 60,
+    "Property": 120,
+    "General Liability": 90,
+    "Employment": 60,
+    "Auto": 180,
+    "Inland Marine": 90,
+    "Umbrella": 60,
+    "Workers Compensation": 120,
+}
+DEFAULT_DEADLINE = 120
+SECTION_DEADLINES.update(json.loads(os.environ.get("PROPOSAL_SECTION_DEADLINES", "{}") or "{}"))
+
+# Idle worker processes kept for reuse across runs
+MAX_IDLE_WORKERS = max(1, int(os.environ.get("PROPOSAL_WORKERS", (os.cpu_count() or 2) // 2)))
+# Libraries a new worker imports before its first call, so their import
+# time is not charged to a section's deadline (missing ones are skipped)
+WARM_IMPORTS = ("pdfplumber", "fitz", "pandas", "camelot", "cv2")
+# Seconds a worker may take to import a section's module and load its PDFs
+WARMUP_SECONDS = float(os.environ.get("PROPOSAL_WARMUP_SECONDS", 120))
+# PDFs a worker keeps loaded (a run has at most the main and WC packets)
+WORKER_DOCUMENTS = 4
+
+_idle_workers = []
+_idle_lock = threading.Lock()
+# Spent seconds and skipped sections of the run on the current script thread
+_run = threading.local()
+# True inside a worker process, where extractors always run inline
+_in_worker = False
+# PDFs this worker has loaded, by spill path
+_worker_documents = {}
+
+class _Document:
+    """
+    Stands in for a PDF argument sent to a worker. The PDF (with any page
+    text a PrefetchedPdf carries) is written once per run to path, and each
+    worker loads it once, before the deadline clock starts.
+    """
+    def __init__(self, path):
+        self.path = path
+
+def isolation_enabled() -> bool:
+    if _in_worker:
+        return False
+    return os.environ.get("PROPOSAL_ISOLATE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+def section_deadline(section: str) -> float:
+    return float(SECTION_DEADLINES.get(section, DEFAULT_DEADLINE))
+
+def start_run():
+    """Reset the per-section budgets for a new proposal run."""
+    release_documents()
+    _run.spent = {}
+    _run.skipped = {}
+    _run.documents = {}
+
+def release_documents():
+    """Delete the PDFs the current run wrote for its workers."""
+    for _, path in getattr(_run, "documents", {}).values():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    _run.documents = {}
+
+def _spill(value):
+    """A _Document for PDF bytes, written on first use in this run; other values as they are."""
+    if not isinstance(value, (bytes, bytearray)):
+        return value
+    documents = _run.documents
+    entry = documents.get(id(value))
+    if entry is None:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdfpickle") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Keeping the object keeps its id from being reused within the run
+        entry = documents[id(value)] = (value, f.name)
+    return _Document(entry[1])
+
+def _load_document(path):
+    document = _worker_documents.get(path)
+    if document is None:
+        with open(path, "rb") as f:
+            document = pickle.load(f)
+        while len(_worker_documents) >= WORKER_DOCUMENTS:
+            _worker_documents.pop(next(iter(_worker_documents)))
+        _worker_documents[path] = document
+    return document
+
+def _resolve(value):
+    return _load_document(value.path) if isinstance(value, _Document) else value
+
+def _warm_up():
+    for name in WARM_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+def skipped_sections() -> dict:
+    """{section: reason} for every section cancelled in the current run."""
+    return dict(getattr(_run, "skipped", {}))
+
+def _worker_main(conn):
+    """
+    Worker process loop until told to stop. A ("prepare", module, paths)
+    request imports the module and loads the spilled PDFs; a ("call",
+    module, function, args, kwargs, options) request runs the function.
+    Each call reply ends with the worker's resident memory in MB and what
+    Profiling measured for the call (or None).
+    """
+    global _in_worker
+    _in_worker = True
+    PageStream.dedicate_process()
+    _warm_up()
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        if request[0] == "prepare":
+            _, module_name, paths = request
+            try:
+                importlib.import_module(module_name)
+                for path in paths:
+                    _load_document(path)
+                conn.send(("ready",))
+            except Exception as e:
+                conn.send(("error", RuntimeError(f"{module_name}: {e}"), traceback.format_exc()))
+            continue
+        _, module_name, func_name, args, kwargs, options = request
+        usage = None
+        try:
+            # Skip any profiling/isolation wrappers the module picked up
+            func = inspect.unwrap(getattr(importlib.import_module(module_name), func_name))
+            args = tuple(_resolve(a) for a in args)
+            kwargs = {k: _resolve(v) for k, v in kwargs.items()}
+            result, usage = Profiling.measure_call(func, args, kwargs, options)
+            reply = ("ok", result)
+        except Exception as e:
+            reply = ("error", e, traceback.format_exc())
+        rss = PageStream.current_rss_mb()
+        try:
+            conn.send(reply + (rss, usage))
+        except Exception as e:
+            # Result or exception could not be pickled
+            conn.send(("error", RuntimeError(f"{module_name}.{func_name}: {e}"), traceback.format_exc(), rss, usage))
+
+def _start_worker():
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+    process.start()
+    child_conn.close()
+    return {"process": process, "conn": parent_conn}
+
+def _checkout_worker():
+    with _idle_lock:
+        while _idle_workers:
+            worker = _idle_workers.pop()
+            if worker["process"].is_alive():
+                return worker
+    return _start_worker()
+
+def _over_memory_budget(rss):
+    return rss is not None and PageStream.MEMORY_BUDGET_MB > 0 and rss > PageStream.MEMORY_BUDGET_MB
+
+def _release_worker(worker, rss=None):
+    # A worker that grew past the memory budget is replaced rather than reused
+    if _over_memory_budget(rss):
+        _stop_worker(worker)
+        return
+    with _idle_lock:
+        if len(_idle_workers) < MAX_IDLE_WORKERS and worker["process"].is_alive():
+            _idle_workers.append(worker)
+            return
+    _stop_worker(worker)
+
+def _stop_worker(worker, kill=False):
+    process = worker["process"]
+    try:
+        if kill:
+            process.terminate()
+        else:
+            worker["conn"].send(None)
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+    except (OSError, ValueError):
+        pass
+    finally:
+        worker["conn"].close()
+
+def shutdown():
+    """Stop every idle worker process."""
+    with _idle_lock:
+        workers, _idle_workers[:] = list(_idle_workers), []
+    for worker in workers:
+        _stop_worker(worker)
+
+def _prepare(worker, module_name, args, kwargs):
+    """
+    Have the worker import module_name and load the run's PDFs among the
+    arguments, outside the deadline. Returns the arguments with each PDF
+    replaced by its _Document, or None when the worker failed to get ready
+    (it is stopped then).
+    """
+    args = tuple(_spill(a) for a in args)
+    kwargs = {k: _spill(v) for k, v in kwargs.items()}
+    paths = [v.path for v in (*args, *kwargs.values()) if isinstance(v, _Document)]
+    try:
+        worker["conn"].send(("prepare", module_name, paths))
+        if worker["conn"].poll(WARMUP_SECONDS) and worker["conn"].recv()[0] == "ready":
+            return args, kwargs
+    except (EOFError, OSError):
+        pass
+    _stop_worker(worker, kill=True)
+    return None
+
+def _mark_skipped(section, reason):
+    if not hasattr(_run, "skipped"):
+        start_run()
+    _run.skipped.setdefault(section, reason)
+
+def run_with_deadline(section, module_name, func_name, args=(), kwargs=None, default=None):
+    """
+    Run module_name.func_name(*args, **kwargs) in a worker process within what
+    is left of the section's deadline. The worker imports the module and
+    loads the PDF arguments (see _Document) before the clock starts. When the deadline passes, or the worker
+    dies, the worker is killed, the section is marked skipped and default()
+    is returned; later calls for a skipped section return default() at once.
+    The same happens when the function runs past PageStream.MEMORY_BUDGET_MB
+    (enforced in the worker, whose memory is this extraction's alone).
+    Other exceptions raised by the function are re-raised here.
+    """
+    if not hasattr(_run, "spent"):
+        start_run()
+    if section in _run.skipped:
+        return default() if callable(default) else default
+    remaining = section_deadline(section) - _run.spent.get(section, 0.0)
+    if remaining <= 0:
+        _mark_skipped(section, f"did not finish within {section_deadline(section):.0f} seconds")
+        return default() if callable(default) else default
+
+    worker = _checkout_worker()
+    prepared = _prepare(worker, module_name, args, kwargs or {})
+    if prepared is None:
+        _mark_skipped(section, "extraction worker could not start")
+        return default() if callable(default) else default
+    args, kwargs = prepared
+    started = time.perf_counter()
+    reply = None
+    try:
+        worker["conn"].send(("call", module_name, func_name, args, kwargs, Profiling.worker_options()))
+        if not worker["conn"].poll(remaining):
+            _stop_worker(worker, kill=True)
+            worker = None
+            _mark_skipped(section, f"did not finish within {section_deadline(section):.0f} seconds")
+            return default() if callable(default) else default
+        reply = worker["conn"].recv()
+    except (EOFError, OSError) as e:
+        _stop_worker(worker, kill=True)
+        worker = None
+        _mark_skipped(section, f"extraction worker stopped unexpectedly ({e.__class__.__name__})")
+        return default() if callable(default) else default
+    finally:
+        _run.spent[section] = _run.spent.get(section, 0.0) + (time.perf_counter() - started)
+        if worker is not None:
+            _release_worker(worker, reply[-2] if reply else None)
+        if reply:
+            # CPU time and memory peak of the call itself, measured in the worker
+            Profiling.add_worker_usage(reply[-1])
+
+    if reply[0] == "ok":
+        return reply[1]
+    if isinstance(reply[1], MemoryError):
+        _mark_skipped(section, f"exceeded the {PageStream.MEMORY_BUDGET_MB:.0f} MB memory budget")
+        return default() if callable(default) else default
+    raise reply[1]
+
+def isolate(module, section, defaults):
+    """
+    Replace each function named in defaults ({name: default value or factory})
+    on module with one that runs in a worker process under the section deadline.
+    """
+    if module is None:
+        return
+    for name, default in defaults.items():
+        func = getattr(module, name)
+        if getattr(func, "_isolated", False):
+            continue
+
+        def wrapper(*args, _name=name, _func=func, _default=default, **kwargs):
+            if not isolation_enabled():
+                try:
+                    return _func(*args, **kwargs)
+                except PageStream.MemoryBudgetExceeded:
+                    _mark_skipped(section, f"exceeded the {PageStream.MEMORY_BUDGET_MB:.0f} MB memory budget")
+                    return _default() if callable(_default) else _default
+            return run_with_deadline(section, module.__name__, _name, args, kwargs, _default)
+
+        wrapper = functools.wraps(func)(wrapper)
+        wrapper._isolated = True
+        setattr(module, name, wrapper)
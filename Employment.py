@@ -1,8 +1,9 @@
 import streamlit as st
 import re
-import os
-import tempfile
-from pdfminer.high_level import extract_text
+from io import BytesIO
+from PdfProbe import ERP_HEADING_RE
+
+QUOTE_PROPOSAL_RE = re.compile(r"QUOTE\s+PROPOSAL", re.IGNORECASE)
 
 def merge_header_lines(lines):
     """
@@ -126,6 +127,48 @@ def parse_erp_quote_proposal(raw_text):
 
     return results
 
+def find_erp_pages(pdf_bytes, max_pages=3, raw_pages=None):
+    """
+    Probe the PDF with PyMuPDF and return the 0-based page numbers of the
+    Employment-Related Practices Liability quote proposal: the heading page
+    plus following pages up to where the next quote proposal starts, at
+    most max_pages in total. Returns [] when the heading is absent.
+    raw_pages (PyMuPDF text per page) skips opening the PDF again.
+    """
+    if raw_pages is None:
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            raw_pages = [page.get_text("text") for page in doc]
+        finally:
+            doc.close()
+
+    pages = []
+    for number, text in enumerate(raw_pages):
+        if not pages:
+            if ERP_HEADING_RE.search(text):
+                pages.append(number)
+            continue
+        pages.append(number)
+        if len(pages) >= max_pages:
+            break
+        if QUOTE_PROPOSAL_RE.search(text) and not ERP_HEADING_RE.search(text):
+            break
+    return pages
+
+def extract_erp_quote_proposal(pdf_bytes, raw_pages=None):
+    """
+    Run pdfminer in memory on the EPL quote proposal pages only and parse
+    them. Returns {} right away when the packet has no EPL section.
+    """
+    from pdfminer.high_level import extract_text
+    pages = find_erp_pages(pdf_bytes, raw_pages=raw_pages)
+    if not pages:
+        return {}
+    raw_text = extract_text(BytesIO(pdf_bytes), page_numbers=pages)
+    return parse_erp_quote_proposal(raw_text)
+
 def generate_html_table(parsed):
     """
     Create an HTML table with:
@@ -167,15 +210,7 @@ def main():
 
     uploaded_file = st.file_uploader("Drag and drop a PDF file", type=["pdf"])
     if uploaded_file is not None:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(uploaded_file.read())
-            tmp.flush()
-            tmp_path = tmp.name
-
-        raw_text = extract_text(tmp_path)
-        os.remove(tmp_path)
-
-        parsed_values = parse_erp_quote_proposal(raw_text)
+        parsed_values = extract_erp_quote_proposal(uploaded_file.read())
         if not any(parsed_values.values()):
             st.write("No data found for EMPLOYMENT-RELATED PRACTICES LIABILITY QUOTE PROPOSAL in this PDF.")
         else:
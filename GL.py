@@ -1,9 +1,7 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import pdfplumber
 import re
 import pandas as pd
-import fitz  # PyMuPDF
 import tempfile
 import io
 import docx
@@ -12,6 +10,9 @@ from docx.oxml import parse_xml
 from docx.oxml.ns import nsdecls, qn
 from docx.oxml.shared import OxmlElement
 from docx.enum.section import WD_ORIENT
+import PageStream
+from PdfProbe import GL_HEADING_RE, FORMS_HEADING_RE
+from PolicyForms import parse_line_into_columns, parse_policy_forms_for_lob
 
 # Helper to ensure we have a file-like object (supports seek)
 def ensure_file_like(pdf_file):
@@ -19,6 +20,74 @@ def ensure_file_like(pdf_file):
         return io.BytesIO(pdf_file)
     return pdf_file
 
+############################################
+# GL document model: open the PDF once
+############################################
+# GL_HEADING_RE is COMMERCIAL GENERAL LIABILITY, the line
+# extract_general_liability_info has always started the section on
+GL_PAGE_RE = re.compile(r"GENERAL\s+LIABILITY")
+QUOTE_PROPOSAL_RE = re.compile(r"QUOTE\s+PROPOSAL")
+
+def find_gl_page_range(page_texts):
+    """
+    Return (start, end) page indexes of the Commercial General Liability
+    proposal, from the first page naming COMMERCIAL GENERAL LIABILITY to the
+    page where another line's quote proposal begins. Without that anchor
+    the whole document is used.
+    """
+    start = next((i for i, t in enumerate(page_texts) if GL_HEADING_RE.search(t)), None)
+    if start is None:
+        return 0, len(page_texts)
+    for i in range(start + 1, len(page_texts)):
+        text = page_texts[i]
+        if QUOTE_PROPOSAL_RE.search(text) and not GL_PAGE_RE.search(text):
+            return start, i + 1
+    return start, len(page_texts)
+
+def load_gl_document(pdf_file, include_forms=True, raw_pages=None):
+    """
+    Parse the PDF once for every GL extractor. PyMuPDF locates the GL page
+    range and the forms schedule; pdfplumber only reads those pages.
+    Pass include_forms=False when the forms were already parsed elsewhere,
+    and raw_pages (PyMuPDF text per page) to skip the probe.
+    Passing an already loaded document returns it unchanged.
+    """
+    if isinstance(pdf_file, dict):
+        return pdf_file
+    if isinstance(pdf_file, bytes):
+        pdf_bytes = pdf_file  # keeps any text PageStream.prefetch attached
+    else:
+        pdf_file.seek(0)
+        pdf_bytes = pdf_file.read()
+
+    if raw_pages is None:
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            raw_pages = [page.get_text("text") for page in doc]
+        finally:
+            doc.close()
+
+    start, end = find_gl_page_range(raw_pages)
+    forms_start = len(raw_pages)
+    if include_forms:
+        forms_start = next((i for i, t in enumerate(raw_pages) if FORMS_HEADING_RE.search(t)), len(raw_pages))
+    wanted = sorted(set(range(start, end)) | set(range(forms_start, len(raw_pages))))
+
+    plumber_pages = dict(PageStream.iter_page_texts(pdf_bytes, wanted))
+
+    gl_pages = [plumber_pages[i] for i in range(start, end)]
+    forms_pages = [plumber_pages[i] for i in range(forms_start, len(raw_pages))]
+    return {
+        "page_range": (start, end),
+        "page_texts": gl_pages,
+        "text": "".join(t + "\n" for t in gl_pages if t),
+        "fitz_text": "".join(raw_pages[start:end]),
+        "document_fitz_text": "".join(raw_pages),
+        "forms_text": "\n".join(t for t in forms_pages if t),
+    }
+
 ############################################
 # 1) Make HTML table cells editable
 ############################################
@@ -41,21 +110,19 @@ def extract_general_liability_info(pdf_file):
     section_lines = []
     within_section = False
 
-    pdf_file = ensure_file_like(pdf_file)
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if not text:
-                continue
-            lines = text.split('\n')
-            for line in lines:
-                if "COMMERCIAL GENERAL LIABILITY" in line:
-                    within_section = True
-                if within_section:
-                    if any(stop_kw in line for stop_kw in stop_keywords):
-                        within_section = False
-                        break
-                    section_lines.append(line)
+    gl_doc = load_gl_document(pdf_file)
+    for text in gl_doc["page_texts"]:
+        if not text:
+            continue
+        lines = text.split('\n')
+        for line in lines:
+            if "COMMERCIAL GENERAL LIABILITY" in line:
+                within_section = True
+            if within_section:
+                if any(stop_kw in line for stop_kw in stop_keywords):
+                    within_section = False
+                    break
+                section_lines.append(line)
 
     rows = []
     header_found = False
@@ -98,14 +165,7 @@ def extract_general_liability_info(pdf_file):
 def extract_limits_of_insurance(pdf_file):
     dollar_pattern = re.compile(r'\$\s*[\d,]+(?:\.\d{2})?')
     stop_keywords = ["LOCATION OF ALL PREMISES YOU OWN, RENT OR OCCUPY:"]
-    all_text = ""
-    
-    pdf_file = ensure_file_like(pdf_file)
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                all_text += text + "\n"
+    all_text = load_gl_document(pdf_file)["text"]
     pattern = re.compile(r"LIMITS OF INSURANCE(.*?)(?:" + "|".join(stop_keywords) + ")", re.DOTALL)
     match = pattern.search(all_text)
     block = match.group(1).strip() if match else ""
@@ -131,13 +191,7 @@ def extract_locations(pdf_file):
         r"LOCATION OF ALL PREMISES YOU OWN, RENT OR OCCUPY:(.*?)(?:CLASSIFICATION & PREMIUM)",
         re.DOTALL
     )
-    all_text = ""
-    pdf_file = ensure_file_like(pdf_file)
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                all_text += text + "\n"
+    all_text = load_gl_document(pdf_file)["text"]
     match = pattern.search(all_text)
     block = match.group(1).strip() if match else ""
     lines = block.splitlines()
@@ -179,23 +233,21 @@ def extract_cgl_section_lines(pdf):
     start_pattern = re.compile(r"Classification\s*&\s*Premium", re.IGNORECASE)
     end_pattern = re.compile(r"ADDITIONAL\s+COVERAGES", re.IGNORECASE)
 
-    pdf = ensure_file_like(pdf)
-    with pdfplumber.open(pdf) as pdf_:
-        for page in pdf_.pages:
-            text = page.extract_text() or ""
-            lines = text.split("\n")
-            for line in lines:
-                if not found_start:
-                    if start_pattern.search(line):
-                        found_start = True
-                        continue
-                if found_start and not found_end:
-                    if end_pattern.search(line):
-                        found_end = True
-                        break
-                    cgl_lines.append(line)
-            if found_end:
-                break
+    gl_doc = load_gl_document(pdf)
+    for text in gl_doc["page_texts"]:
+        lines = text.split("\n")
+        for line in lines:
+            if not found_start:
+                if start_pattern.search(line):
+                    found_start = True
+                    continue
+            if found_start and not found_end:
+                if end_pattern.search(line):
+                    found_end = True
+                    break
+                cgl_lines.append(line)
+        if found_end:
+            break
 
     return cgl_lines
 
@@ -296,7 +348,6 @@ def parse_cgl_lines(cgl_lines):
     return extracted_rows
 
 def extract_classification_premium_by_location(pdf_file):
-    pdf_file = ensure_file_like(pdf_file)
     cgl_lines = extract_cgl_section_lines(pdf_file)
     rows = parse_cgl_lines(cgl_lines)
     for row in rows:
@@ -314,18 +365,14 @@ def extract_additional_coverages(pdf_file):
     with "Business Income" in Coverage and "Not Covered" in Limits (no Premium).
     Also handles other endings like "Included", "N/A", "Excluded" the same way.
     """
-    pdf_file = ensure_file_like(pdf_file)
-    pdf_file.seek(0)
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    full_text = ""
-    for page in doc:
-        full_text += page.get_text("text")
-    
+    gl_doc = load_gl_document(pdf_file)
+
     header_regex = re.compile(
         r"ADDITIONAL COVERAGES\s*Location\s*Coverage\s*Deductible\s*Limits\s*Premium(.*)",
         re.DOTALL | re.IGNORECASE
     )
-    match = header_regex.search(full_text)
+    # The GL pages first, then the whole document as before the page range
+    match = header_regex.search(gl_doc["fitz_text"]) or header_regex.search(gl_doc["document_fitz_text"])
     if not match:
         return pd.DataFrame(), []
     block = match.group(1)
@@ -583,17 +630,17 @@ def create_word_doc(dfs_dict):
 # 4) POLICY FORMS
 ############################################
 def extract_text_pdfplumber_custom(pdf_bytes: bytes) -> str:
+    if isinstance(pdf_bytes, dict):
+        # Loaded GL document: forms schedule pages were already read
+        return pdf_bytes["forms_text"]
     try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            extracted_text = "\n".join(
-                page.extract_text() for page in pdf.pages if page.extract_text()
-            )
-        return extracted_text
+        return PageStream.read_text(pdf_bytes, skip_empty=True)
     except Exception as e:
         st.error(f"Error with pdfplumber: {e}")
         return ""
 
 def extract_text_pymupdf_custom(pdf_bytes: bytes) -> str:
+    import fitz  # PyMuPDF
     try:
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
         extracted_text = "\n".join(page.get_text() for page in doc)
@@ -602,70 +649,8 @@ def extract_text_pymupdf_custom(pdf_bytes: bytes) -> str:
         st.error(f"Error with PyMuPDF: {e}")
         return ""
 
-def parse_line_into_columns(line: str) -> list:
-    tokens = line.split()
-    number_parts = []
-    edition = ""
-    description_parts = []
-    edition_pattern = re.compile(r"^\d{2}-\d{4}$")
-    found_edition = False
-    for token in tokens:
-        if not found_edition and edition_pattern.match(token):
-            edition = token
-            found_edition = True
-        else:
-            if not found_edition:
-                number_parts.append(token)
-            else:
-                description_parts.append(token)
-    number = " ".join(number_parts).strip()
-    description = " ".join(description_parts).strip()
-    return [number, edition, description]
-
 def parse_policy_forms(text: str) -> dict:
-    coverage_titles = [
-        "Commercial General Liability Coverage Part",
-        "Commercial General Liability"
-    ]
-    start_index = text.find("SCHEDULE OF FORMS AND ENDORSEMENTS")
-    if start_index == -1:
-        return {}
-    relevant_lines = text[start_index:].splitlines()
-    sections = {}
-    current_title = None
-    i = 0
-    while i < len(relevant_lines):
-        line = relevant_lines[i].strip()
-        if line in coverage_titles:
-            current_title = line
-            sections[current_title] = []
-            i += 1
-            if i < len(relevant_lines):
-                possible_header_line = relevant_lines[i].lower().strip()
-                if ("number" in possible_header_line and
-                    "edition" in possible_header_line and
-                    "description" in possible_header_line):
-                    i += 1
-            continue
-        if current_title:
-            if line.startswith("Commercial ") and (line not in coverage_titles):
-                current_title = None
-                i -= 1
-            else:
-                row = parse_line_into_columns(line)
-                number, edition, description = row
-                if not edition:
-                    if sections[current_title]:
-                        sections[current_title][-1][2] += " " + " ".join(
-                            part for part in [number, description] if part
-                        )
-                        sections[current_title][-1][2] = sections[current_title][-1][2].strip()
-                    else:
-                        sections[current_title].append(["", "", number + " " + description])
-                else:
-                    sections[current_title].append(row)
-        i += 1
-    return sections
+    return parse_policy_forms_for_lob(text, "General Liability")
 
 ############################################
 # 5) MAIN STREAMLIT APP
@@ -689,28 +674,24 @@ def main():
     uploaded_file = st.file_uploader("Upload your PDF file", type="pdf")
     
     if uploaded_file is not None:
-        # 1) Additional Coverages
-        ac_debug_df, ac_debug_tokens = extract_additional_coverages(uploaded_file)
-        uploaded_file.seek(0)
-        
-        # 2) General Liability
-        gl_df, _ = extract_general_liability_info(uploaded_file)
-        uploaded_file.seek(0)
+        # Read once: the GL document model and the Policy Forms reader share the bytes
+        pdf_bytes = uploaded_file.read()
+        gl_doc = load_gl_document(pdf_bytes)
+
+        # 1) General Liability
+        gl_df, _ = extract_general_liability_info(gl_doc)
         
-        # 3) Limits of Insurance
-        li_df, _ = extract_limits_of_insurance(uploaded_file)
-        uploaded_file.seek(0)
+        # 2) Limits of Insurance
+        li_df, _ = extract_limits_of_insurance(gl_doc)
         
-        # 4) Locations
-        loc_df, _ = extract_locations(uploaded_file)
-        uploaded_file.seek(0)
+        # 3) Locations
+        loc_df, _ = extract_locations(gl_doc)
         
-        # 5) Classification & Premium
-        cp_dict = extract_classification_premium_by_location(uploaded_file)
-        uploaded_file.seek(0)
+        # 4) Classification & Premium
+        cp_dict = extract_classification_premium_by_location(gl_doc)
         
-        # 6) Additional Coverages (final display)
-        ac_df, ac_tokens = extract_additional_coverages(uploaded_file)
+        # 5) Additional Coverages
+        ac_df, ac_tokens = extract_additional_coverages(gl_doc)
         
         # Display extracted tables
         if not gl_df.empty:
@@ -804,11 +785,8 @@ def main():
             key="policy_forms_extraction"
         )
         
-        uploaded_file.seek(0)
-        pdf_bytes = uploaded_file.read()
-        
         if extraction_method_policy == "pdfplumber":
-            policy_text = extract_text_pdfplumber_custom(pdf_bytes)
+            policy_text = extract_text_pdfplumber_custom(gl_doc)
         else:
             policy_text = extract_text_pymupdf_custom(pdf_bytes)
         
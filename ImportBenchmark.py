@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import statistics
+import subprocess
+
+############################################
+# Cold-start benchmark: import time, resident memory and heavy libraries
+# loaded by each module, each measured in a fresh interpreter.
+# Run with: python ImportBenchmark.py [--repeat 5] [--record perf_runs/imports.jsonl]
+############################################
+MODULES = [
+    "PolicyForms", "PdfProbe", "Policy", "Property", "GL", "Auto",
+    "Umbrella", "Employment", "inlandmarine", "WC", "ProposalPipeline", "NoTables",
+]
+# Libraries that should only load when a section first needs them
+HEAVY_LIBRARIES = ["camelot", "cv2", "fitz", "pdfplumber", "pdfminer", "pypdf", "PyPDF2", "docx", "pandas"]
+
+_PROBE = r"""
+import sys, time, json
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+rss_mb = None
+try:
+    import psutil
+    rss_mb = psutil.Process().memory_info().rss / 2**20
+except ImportError:
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_mb = rss / 2**20 if sys.platform == "darwin" else rss / 1024
+    except ImportError:
+        pass
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_mb, "heavy": heavy}}))
+"""
+
+def measure(module, repeat=3):
+    """Median import time and RSS of module over repeat fresh interpreters."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = _PROBE.format(root=root, module=module, heavy=HEAVY_LIBRARIES)
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root)
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            return {"module": module, "error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+        runs.append(json.loads(lines[-1]))
+    rss = [r["rss_mb"] for r in runs if r["rss_mb"] is not None]
+    return {
+        "module": module,
+        "seconds": round(statistics.median(r["seconds"] for r in runs), 4),
+        "rss_mb": round(statistics.median(rss), 1) if rss else None,
+        "heavy": runs[-1]["heavy"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import benchmark")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--record", help="append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    results = [measure(m, args.repeat) for m in args.modules]
+    print(f"{'module':<14}{'import s':>10}{'RSS MB':>9}  heavy libraries loaded")
+    for r in results:
+        if "error" in r:
+            print(f"{r['module']:<14}  error: {r['error']}")
+            continue
+        rss = f"{r['rss_mb']:.1f}" if r["rss_mb"] is not None else "-"
+        print(f"{r['module']:<14}{r['seconds']:>10.3f}{rss:>9}  {', '.join(r['heavy']) or '-'}")
+
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record)), exist_ok=True)
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "results": results,
+            }) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import time
+import itertools
+import threading
+
+############################################
+# Server-wide admission queue for proposal runs
+############################################
+# Every Streamlit session shares this module, so these limits hold for the
+# whole server: at most WORKERS proposals extract at once, together holding
+# at most PAGE_BUDGET pages, and at most MAX_QUEUED more wait in line.
+# The limits are per process: ProposalService runs its own queue, so a
+# machine serving both should split PROPOSAL_WORKERS and
+# PROPOSAL_PAGE_BUDGET between the two.
+WORKERS = max(1, int(os.environ.get("PROPOSAL_WORKERS", (os.cpu_count() or 2) // 2)))
+PAGE_BUDGET = int(os.environ.get("PROPOSAL_PAGE_BUDGET", 400))
+MAX_QUEUED = int(os.environ.get("PROPOSAL_MAX_QUEUED", 20))
+# Starting guess for the wait estimate, refined from finished runs
+DEFAULT_SECONDS_PER_PAGE = 1.5
+
+class QueueFull(Exception):
+    """Raised when the waiting line is already MAX_QUEUED long."""
+
+_cond = threading.Condition()
+_ids = itertools.count(1)
+_waiting = []   # tickets in arrival order
+_active = {}    # ticket id -> ticket
+_stats = {"seconds_per_page": DEFAULT_SECONDS_PER_PAGE, "completed": 0}
+
+def _reclaim_abandoned():
+    """Free slots whose session thread ended without releasing (rerun, stop, error)."""
+    for ticket_id, ticket in list(_active.items()):
+        if not ticket["thread"].is_alive():
+            del _active[ticket_id]
+    _waiting[:] = [t for t in _waiting if t["thread"].is_alive()]
+
+def _active_pages():
+    return sum(t["pages"] for t in _active.values())
+
+def _can_start(ticket):
+    # Strict arrival order, so a large packet is never starved by small ones;
+    # a packet bigger than the whole budget still runs once it is alone.
+    if not _waiting or _waiting[0] is not ticket or len(_active) >= WORKERS:
+        return False
+    return not _active or _active_pages() + ticket["pages"] <= PAGE_BUDGET
+
+def _estimated_wait(ticket):
+    """Seconds until ticket should start: remaining active work plus the pages queued ahead of it."""
+    spp = _stats["seconds_per_page"]
+    now = time.monotonic()
+    active_left = sum(
+        max(t["pages"] * spp - (now - t["started"]), 0) for t in _active.values()
+    )
+    ahead = sum(t["pages"] for t in _waiting[:_waiting.index(ticket)]) * spp
+    return (active_left + ahead) / WORKERS
+
+def acquire(pages, on_wait=None, poll=1.0):
+    """
+    Wait for a slot for a run of the given page count and return its ticket.
+    on_wait(position, queue_length, estimated_seconds) is called about every
+    poll seconds while the run waits. Raises QueueFull when the line is full.
+    """
+    pages = max(int(pages or 1), 1)
+    current = threading.current_thread()
+    with _cond:
+        _reclaim_abandoned()
+        # A rerun on the same session thread replaces its earlier ticket
+        for ticket_id, ticket in list(_active.items()):
+            if ticket["thread"] is current:
+                del _active[ticket_id]
+        if len(_waiting) >= MAX_QUEUED:
+            raise QueueFull(f"{len(_waiting)} proposals are already waiting")
+        ticket = {
+            "id": next(_ids),
+            "pages": pages,
+            "thread": current,
+            "enqueued": time.monotonic(),
+            "started": None,
+        }
+        _waiting.append(ticket)
+    try:
+        while True:
+            with _cond:
+                _reclaim_abandoned()
+                if _can_start(ticket):
+                    _waiting.remove(ticket)
+                    ticket["started"] = time.monotonic()
+                    ticket["waited"] = ticket["started"] - ticket["enqueued"]
+                    _active[ticket["id"]] = ticket
+                    _cond.notify_all()
+                    return ticket
+                progress = (_waiting.index(ticket) + 1, len(_waiting), _estimated_wait(ticket))
+            if on_wait is not None:
+                # Outside the lock, so a slow or failing display call in one
+                # session cannot hold up admission for every other caller
+                on_wait(*progress)
+            with _cond:
+                if not _can_start(ticket):
+                    _cond.wait(poll)
+    except BaseException:
+        with _cond:
+            if ticket in _waiting:
+                _waiting.remove(ticket)
+            _cond.notify_all()
+        raise
+
+def release(ticket):
+    """Give the slot back and fold the run's speed into the wait estimate."""
+    if not ticket:
+        return
+    with _cond:
+        if _active.pop(ticket["id"], None) is not None and ticket["started"] is not None:
+            seconds_per_page = (time.monotonic() - ticket["started"]) / ticket["pages"]
+            # Exponential moving average, so the estimate follows current load
+            _stats["seconds_per_page"] += 0.2 * (seconds_per_page - _stats["seconds_per_page"])
+            _stats["completed"] += 1
+        _cond.notify_all()
+
+def status() -> dict:
+    """Snapshot of the queue for dashboards."""
+    with _cond:
+        _reclaim_abandoned()
+        return {
+            "workers": WORKERS,
+            "page_budget": PAGE_BUDGET,
+            "active": len(_active),
+            "active_pages": _active_pages(),
+            "waiting": len(_waiting),
+            "waiting_pages": sum(t["pages"] for t in _waiting),
+            "seconds_per_page": round(_stats["seconds_per_page"], 3),
+            "completed": _stats["completed"],
+        }
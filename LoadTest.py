@@ -0,0 +1,553 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import datetime
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+
+from ProposalPipeline import UNDERWRITERS
+
+############################################
+# Concurrent-session load test of the proposal page: N simulated agents each
+# open NoTables.py in their own Streamlit session, pick an underwriter,
+# upload a main and a WC packet and download the proposal, at growing
+# concurrency. All sessions share one `streamlit run` server, so the
+# page's JobQueue, Deadlines workers, Profiling, Telemetry and progressive
+# previews are loaded exactly as agents load them. Reports throughput,
+# latency percentiles and the server's RSS (including its worker processes).
+# --target service drives the ProposalService job API the same way.
+# Run with: python LoadTest.py [--target page|service] [--concurrency 1 2 4 8] [--requests 3]
+#           [--main packet.pdf --wc wca.pdf] [--url http://host:8600 --server-pid PID]
+#           [--record perf_runs/load.jsonl]
+############################################
+DEFAULT_CONCURRENCY = [1, 2, 4, 8]
+PERCENTILES = [50, 90, 95, 99]
+POLL_SECONDS = 0.5
+RSS_SAMPLE_SECONDS = 0.5
+
+############################################
+# Synthetic packets
+############################################
+def synthetic_packets(tag, pages=12) -> tuple:
+    """
+    (main, wc) PDF bytes carrying the headings PdfProbe and the section
+    extractors look for, under a quote number unique to tag.
+    """
+    import fitz  # PyMuPDF
+
+    def build(page_lines):
+        doc = fitz.open()
+        for lines in page_lines:
+            page = doc.new_page()
+            page.insert_text((54, 72), "\n".join(lines), fontsize=9)
+        data = doc.tobytes()
+        doc.close()
+        return data
+
+    insured = f"Load Test Account {tag} LLC"
+    filler = [f"Line {i}: Building {i} Business Personal Property 100,000 $1,000 $250" for i in range(40)]
+    sections = [
+        ["PROPERTY COVERAGES"], ["GENERAL LIABILITY QUOTE PROPOSAL"], ["BUSINESS AUTO QUOTE PROPOSAL"],
+        ["COMMERCIAL INLAND MARINE QUOTE PROPOSAL"], ["UMBRELLA QUOTE PROPOSAL"],
+        ["EMPLOYMENT-RELATED PRACTICES LIABILITY QUOTE PROPOSAL"], ["SCHEDULE OF FORMS AND ENDORSEMENTS"],
+    ]
+    main_pages = [[
+        "COMMERCIAL PACKAGE QUOTE PROPOSAL", f"Quote No: CPP{tag}", "Rating Company: Load Test Mutual",
+        "Named Insured Name and Address", insured, "100 Main St, Dallas, TX 75201",
+    ]]
+    for i in range(max(pages - 1, len(sections))):
+        main_pages.append(sections[i] + filler if i < len(sections) else filler)
+    wc_pages = [[
+        "WORKERS COMPENSATION AND EMPLOYERS LIABILITY QUOTE", f"Quote No: WCA{tag}",
+        "Named Insured Name and Address", insured,
+    ] + filler]
+    return build(main_pages), build(wc_pages)
+
+def unique_copy(pdf_bytes, tag) -> bytes:
+    """The packet with a trailing comment so the service's upload cache never matches."""
+    return pdf_bytes + f"\n%loadtest {tag}\n".encode()
+
+############################################
+# Server and RSS sampling
+############################################
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def store_env(workdir) -> dict:
+    """Environment that keeps every store the server writes (results, book, caches, telemetry) under workdir."""
+    return dict(
+        os.environ,
+        PROPOSAL_RESULTS_DIR=os.path.join(workdir, "results"),
+        PROPOSAL_BOOK_DIR=os.path.join(workdir, "book"),
+        PROPOSAL_PAGE_CACHE_DB=os.path.join(workdir, "page_cache.db"),
+        PROPOSAL_TELEMETRY_DB=os.path.join(workdir, "telemetry.db"),
+        PROPOSAL_PROFILE_DIR=os.path.join(workdir, "perf_runs"),
+    )
+
+def _wait_until_up(proc, name, check, seconds=60):
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{name} exited with code {proc.returncode}")
+        try:
+            check()
+            return
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{name} did not start within {seconds} seconds")
+
+def start_server(workdir):
+    """ProposalService on a free local port, storing everything under workdir."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, "ProposalService.py", "--port", str(port)], cwd=root,
+                            env=store_env(workdir))
+    _wait_until_up(proc, "ProposalService", lambda: socket.create_connection(("127.0.0.1", port), timeout=1).close())
+    return proc, f"http://127.0.0.1:{port}"
+
+def _children(pid):
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(p) for p in f.read().split())
+    except OSError:
+        pass
+    return pids
+
+def tree_rss_mb(pid):
+    """RSS in MB of pid and all its descendants, or None if it cannot be read."""
+    try:
+        import psutil
+
+        proc = psutil.Process(pid)
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / 2**20
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    if not sys.platform.startswith("linux"):
+        return None
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            continue
+        stack.extend(_children(current))
+    return total / 2**20
+
+class RssSampler:
+    """Samples the server's RSS in the background; peak and mean per load level."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while True:
+            rss = tree_rss_mb(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+            if self._stop.wait(RSS_SAMPLE_SECONDS):
+                return
+
+    def __enter__(self):
+        if self.pid:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"rss_peak_mb": None, "rss_mean_mb": None}
+        return {
+            "rss_peak_mb": round(max(self.samples), 1),
+            "rss_mean_mb": round(sum(self.samples) / len(self.samples), 1),
+        }
+
+############################################
+# Agents on the ProposalService job API
+############################################
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/pdf\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+def _request(url, data=None, content_type=None, timeout=60):
+    request = urllib.request.Request(url, data=data, method="POST" if data is not None else "GET")
+    if content_type:
+        request.add_header("Content-Type", content_type)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, response.read()
+
+def run_service_session(url, main_pdf, wc_pdf, underwriter, timeout) -> dict:
+    """One job API session: upload, wait for the proposal, download it. Returns its outcome and seconds."""
+    started = time.perf_counter()
+    body, content_type = _multipart(
+        {"underwriter": underwriter},
+        {field: (name, data) for field, name, data in
+         (("main_pdf", "packet.pdf", main_pdf), ("wc_pdf", "WCA_packet.pdf", wc_pdf)) if data},
+    )
+    try:
+        _, payload = _request(f"{url}/jobs", body, content_type)
+    except urllib.error.HTTPError as e:
+        return {"outcome": "rejected" if e.code == 503 else "failed", "seconds": time.perf_counter() - started,
+                "error": f"HTTP {e.code}"}
+    job = json.loads(payload)
+    while job["status"] in ("queued", "running"):
+        if time.perf_counter() - started > timeout:
+            return {"outcome": "failed", "seconds": time.perf_counter() - started, "error": "timed out"}
+        time.sleep(POLL_SECONDS)
+        job = json.loads(_request(f"{url}/jobs/{job['job_id']}")[1])
+    if job["status"] != "done":
+        return {"outcome": "failed", "seconds": time.perf_counter() - started, "error": job.get("error", "")}
+    _, docx = _request(f"{url}/jobs/{job['job_id']}/docx")
+    return {"outcome": "ok", "seconds": time.perf_counter() - started, "bytes": len(docx),
+            "skipped": len(job.get("skipped_sections") or {})}
+
+############################################
+# Agents on the Streamlit page
+############################################
+# Each agent drives the unmodified NoTables.py the way the browser does: it
+# opens a session over the websocket, asks the server for upload URLs and
+# PUTs its packets to /_stcore/upload_file, reruns the script with the
+# underwriter box and the uploader set in its widget state, and downloads
+# the proposal from the download button's media URL. Nothing in the server
+# is patched.
+def start_page_server(workdir):
+    """`streamlit run NoTables.py` on a free local port; returns (proc, http url)."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    port = _free_port()
+    proc = subprocess.Popen([
+        sys.executable, "-m", "streamlit", "run", os.path.join(root, "NoTables.py"),
+        "--server.headless", "true", "--server.address", "127.0.0.1", "--server.port", str(port),
+        # The agents upload without the browser's XSRF cookie
+        "--server.fileWatcherType", "none", "--server.enableXsrfProtection", "false",
+        "--browser.gatherUsageStats", "false",
+    ], cwd=root, env=store_env(workdir))
+    url = f"http://127.0.0.1:{port}"
+    _wait_until_up(proc, "Streamlit", lambda: _request(f"{url}/_stcore/health", timeout=1))
+    return proc, url
+
+def _put_file(url, name, data, timeout):
+    body, content_type = _multipart({}, {"file": (name, data)})
+    request = urllib.request.Request(url, data=body, method="PUT")
+    request.add_header("Content-Type", content_type)
+    with urllib.request.urlopen(request, timeout=timeout):
+        pass
+
+class _PageSession:
+    """One websocket session on the page, reading what each script run shows."""
+
+    def __init__(self, conn, deadline):
+        self.conn = conn
+        self.deadline = deadline
+        self.session_id = None
+        self.widgets = {}  # "underwriter"/"uploader" -> element proto from the last run
+
+    async def read(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        raw = await asyncio.wait_for(self.conn.read_message(), max(self.deadline - time.monotonic(), 0.001))
+        if raw is None:
+            raise ConnectionError("the server closed the session")
+        msg = ForwardMsg()
+        msg.ParseFromString(raw)
+        if msg.WhichOneof("type") == "new_session":
+            self.session_id = msg.new_session.initialize.session_id
+        return msg
+
+    async def send(self, back):
+        await self.conn.write_message(back.SerializeToString(), binary=True)
+
+    async def run(self, widget_states=None) -> dict:
+        """Rerun the script with widget_states and collect what it showed until it finished."""
+        from streamlit.proto.Alert_pb2 import Alert
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back = BackMsg()
+        back.rerun_script.SetInParent()
+        if widget_states is not None:
+            back.rerun_script.widget_states.CopyFrom(widget_states)
+        await self.send(back)
+        seen = {"download_url": None, "exceptions": [], "errors": []}
+        while True:
+            msg = await self.read()
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                shown = element.WhichOneof("type")
+                if shown == "selectbox" and element.selectbox.label == "Select Underwriter":
+                    self.widgets["underwriter"] = element.selectbox
+                elif shown == "file_uploader":
+                    self.widgets["uploader"] = element.file_uploader
+                elif shown == "download_button":
+                    seen["download_url"] = element.download_button.url
+                elif shown == "exception":
+                    seen["exceptions"].append(f"{element.exception.type}: {element.exception.message}")
+                elif shown == "alert" and element.alert.format == Alert.ERROR:
+                    seen["errors"].append(element.alert.body)
+            elif kind == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return seen
+
+    async def upload_urls(self, names) -> list:
+        """Upload URLs for names, handed out by the server as it does to the browser."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        back = BackMsg()
+        back.file_urls_request.request_id = uuid.uuid4().hex
+        back.file_urls_request.session_id = self.session_id
+        back.file_urls_request.file_names.extend(names)
+        await self.send(back)
+        while True:
+            msg = await self.read()
+            if msg.WhichOneof("type") != "file_urls_response":
+                continue
+            response = msg.file_urls_response
+            if response.response_id != back.file_urls_request.request_id:
+                continue
+            if response.error_msg:
+                raise RuntimeError(f"upload URLs refused: {response.error_msg}")
+            return list(response.file_urls)
+
+async def _page_run(base_url, files, underwriter, timeout) -> dict:
+    """
+    One agent on the page: open a session, upload files [(name, data)] with
+    the underwriter selected, and download the proposal. Returns what the
+    proposal run showed plus the downloaded document's size.
+    """
+    from tornado.websocket import websocket_connect
+    from streamlit.proto.WidgetStates_pb2 import WidgetStates
+
+    deadline = time.monotonic() + timeout
+    ws_url = base_url.replace("http://", "ws://", 1) + "/_stcore/stream"
+    conn = await asyncio.wait_for(websocket_connect(ws_url), timeout)
+    try:
+        page = _PageSession(conn, deadline)
+        # The first run shows the widgets with their ids, as the browser sees them
+        await page.run()
+        selectbox, uploader = page.widgets.get("underwriter"), page.widgets.get("uploader")
+        if selectbox is None or uploader is None or page.session_id is None:
+            raise RuntimeError("the page did not show the underwriter box and the uploader")
+
+        states = WidgetStates()
+        choice = states.widgets.add()
+        choice.id = selectbox.id
+        # Newer Streamlit releases send the chosen option's text, older ones its index
+        if "raw_value" in selectbox.DESCRIPTOR.fields_by_name:
+            choice.string_value = underwriter
+        else:
+            choice.int_value = list(selectbox.options).index(underwriter)
+        upload = states.widgets.add()
+        upload.id = uploader.id
+        urls = await page.upload_urls([name for name, _ in files])
+        for (name, data), file_urls in zip(files, urls):
+            await asyncio.to_thread(_put_file, base_url + file_urls.upload_url, name, data, timeout)
+            info = upload.file_uploader_state_value.uploaded_file_info.add()
+            info.name, info.size, info.file_id = name, len(data), file_urls.file_id
+            info.file_urls.CopyFrom(file_urls)
+        if "max_file_id" in upload.file_uploader_state_value.DESCRIPTOR.fields_by_name:
+            upload.file_uploader_state_value.max_file_id = len(files)
+
+        seen = await page.run(states)
+        seen["bytes"] = None
+        if seen["download_url"]:
+            _, document = await asyncio.to_thread(
+                _request, base_url + seen["download_url"], None, None, max(deadline - time.monotonic(), 1)
+            )
+            # A .docx is a zip archive
+            seen["bytes"] = len(document) if document[:2] == b"PK" else 0
+        return seen
+    finally:
+        conn.close()
+
+def run_page_session(base_url, main_pdf, wc_pdf, underwriter, timeout) -> dict:
+    """One page session: pick the underwriter, upload both packets, download the proposal."""
+    files = [(name, data) for name, data in (("packet.pdf", main_pdf), ("WCA_packet.pdf", wc_pdf)) if data]
+    started = time.perf_counter()
+    try:
+        seen = asyncio.run(_page_run(base_url, files, underwriter, timeout))
+    except (asyncio.TimeoutError, TimeoutError):
+        return {"outcome": "failed", "seconds": time.perf_counter() - started, "error": "timed out"}
+    except Exception as e:
+        return {"outcome": "failed", "seconds": time.perf_counter() - started,
+                "error": f"{e.__class__.__name__}: {e}"}
+    seconds = time.perf_counter() - started
+    if seen["bytes"]:
+        return {"outcome": "ok", "seconds": seconds, "bytes": seen["bytes"], "errors": len(seen["errors"])}
+    if any("at capacity" in body for body in seen["errors"]):
+        return {"outcome": "rejected", "seconds": seconds, "error": "server at capacity"}
+    problems = seen["exceptions"] + seen["errors"]
+    if seen["download_url"]:
+        problems.append("the download was not a .docx")
+    return {"outcome": "failed", "seconds": seconds, "error": problems[0] if problems else "no download button"}
+
+############################################
+# Load levels
+############################################
+def percentile(values, pct):
+    """Nearest-rank percentile of values (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-pct * len(ordered) // 100))  # ceil
+    return ordered[min(rank, len(ordered)) - 1]
+
+def run_level(session, concurrency, requests_per_agent, packets, server_pid) -> dict:
+    """
+    concurrency agents at once, each running requests_per_agent sessions back
+    to back; session(main_pdf, wc_pdf, underwriter) runs one and returns its outcome.
+    """
+    results = []
+    lock = threading.Lock()
+
+    def agent(n):
+        for i in range(requests_per_agent):
+            tag = f"{concurrency}-{n}-{i}-{uuid.uuid4().hex[:8]}"
+            main_pdf, wc_pdf = packets(tag)
+            outcome = session(main_pdf, wc_pdf, UNDERWRITERS[(n + i) % len(UNDERWRITERS)])
+            with lock:
+                results.append(outcome)
+
+    with RssSampler(server_pid) as sampler:
+        started = time.perf_counter()
+        threads = [threading.Thread(target=agent, args=(n,), name=f"agent-{n}") for n in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+    latencies = [r["seconds"] for r in results if r["outcome"] == "ok"]
+    errors = sorted({r["error"] for r in results if r.get("error")})
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": len(latencies),
+        "rejected": sum(1 for r in results if r["outcome"] == "rejected"),
+        "failed": sum(1 for r in results if r["outcome"] == "failed"),
+        "wall_s": round(wall, 2),
+        "throughput_per_min": round(len(latencies) / wall * 60, 2) if wall else None,
+        **{f"p{p}_s": round(percentile(latencies, p), 2) if latencies else None for p in PERCENTILES},
+        **sampler.summary(),
+        "errors": errors[:5],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, latency and server RSS under concurrent agents")
+    parser.add_argument("--target", choices=["page", "service"], default="page",
+                        help="the NoTables.py Streamlit page (default) or the ProposalService job API")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--requests", type=int, default=3, help="sessions per agent at each level")
+    parser.add_argument("--main", help="main packet to upload instead of the synthetic one")
+    parser.add_argument("--wc", help="WC packet to upload instead of the synthetic one")
+    parser.add_argument("--pages", type=int, default=12, help="pages of the synthetic main packet")
+    parser.add_argument("--url", help="--target service: use a running ProposalService instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for RSS")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds before a session counts as failed")
+    parser.add_argument("--record", help="append the results as one JSON line to this file")
+    args = parser.parse_args()
+    if args.url and args.target != "service":
+        parser.error("--url only applies to --target service; the page test starts its own Streamlit server")
+
+    if args.main or args.wc:
+        supplied = []
+        for path in (args.main, args.wc):
+            if path:
+                with open(path, "rb") as f:
+                    supplied.append(f.read())
+            else:
+                supplied.append(None)
+
+        def packets(tag):
+            return tuple(unique_copy(data, tag) if data else None for data in supplied)
+    else:
+        def packets(tag):
+            return synthetic_packets(tag, args.pages)
+
+    server, server_pid = None, args.server_pid
+    workdir = tempfile.TemporaryDirectory(prefix="proposal-load-")
+    try:
+        if args.target == "page":
+            server, page_url = start_page_server(workdir.name)
+
+            def session(main_pdf, wc_pdf, underwriter):
+                return run_page_session(page_url, main_pdf, wc_pdf, underwriter, args.timeout)
+        else:
+            url = args.url
+            if url is None:
+                server, url = start_server(workdir.name)
+
+            def session(main_pdf, wc_pdf, underwriter):
+                return run_service_session(url, main_pdf, wc_pdf, underwriter, args.timeout)
+        if server is not None:
+            server_pid = server.pid
+        results = []
+        print(f"{'agents':>7}{'requests':>9}{'ok':>5}{'rej':>5}{'fail':>5}{'per min':>9}"
+              + "".join(f"{f'p{p} s':>8}" for p in PERCENTILES) + f"{'peak MB':>9}")
+        for concurrency in args.concurrency:
+            row = run_level(session, concurrency, args.requests, packets, server_pid)
+            results.append(row)
+            print(f"{concurrency:>7}{row['requests']:>9}{row['ok']:>5}{row['rejected']:>5}{row['failed']:>5}"
+                  f"{row['throughput_per_min'] or 0:>9.2f}"
+                  + "".join(f"{row[f'p{p}_s'] if row[f'p{p}_s'] is not None else '-':>8}" for p in PERCENTILES)
+                  + f"{row['rss_peak_mb'] if row['rss_peak_mb'] is not None else '-':>9}")
+            for error in row["errors"]:
+                print(f"        {error}")
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        workdir.cleanup()
+
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record)), exist_ok=True)
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "cpu_count": os.cpu_count(),
+                "target": args.target,
+                "packets": {"main": args.main, "wc": args.wc} if args.main or args.wc else f"synthetic ({args.pages} pages)",
+                "results": results,
+            }) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import subprocess
+
+############################################
+# Peak-memory benchmark for reading large packets: the old "text += page"
+# loop over every pdfplumber page against PageStream, each in a fresh
+# interpreter so peaks do not carry over.
+# Run with: python MemoryBenchmark.py packet.pdf [...] [--pipeline] [--record perf_runs/memory.jsonl]
+############################################
+MODES = ["eager", "stream"]
+
+_PROBE = r"""
+import sys, time, json
+sys.path.insert(0, {root!r})
+pdf_path, mode = {pdf_path!r}, {mode!r}
+with open(pdf_path, "rb") as f:
+    pdf_bytes = f.read()
+started = time.perf_counter()
+if mode == "eager":
+    import io, pdfplumber
+    text = ""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            text += (page.extract_text() or "") + "\n"
+    pages = len(pdf.pages)
+elif mode == "stream":
+    import PageStream
+    texts = PageStream.read_page_texts(pdf_bytes)
+    text, pages = "\n".join(texts), len(texts)
+else:
+    import PdfProbe, ProposalPipeline
+    probe = PdfProbe.probe_pdf(pdf_bytes)
+    ProposalPipeline.generate_proposal(pdf_bytes, main_probe=probe if probe["kind"] == "main" else None)
+    text, pages = "", probe["page_count"]
+elapsed = time.perf_counter() - started
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 2**20 if sys.platform == "darwin" else peak / 1024
+except ImportError:
+    import PageStream  # Windows: current working set, read right after the run
+    peak_mb = PageStream.current_rss_mb()
+print(json.dumps({{"seconds": elapsed, "peak_rss_mb": peak_mb, "pages": pages, "chars": len(text)}}))
+"""
+
+def measure(pdf_path, mode):
+    """Peak RSS and time of reading pdf_path one way, in a fresh interpreter."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = _PROBE.format(root=root, pdf_path=os.path.abspath(pdf_path), mode=mode)
+    # The whole pipeline runs inline so its memory is counted in this process
+    env = dict(os.environ, PROPOSAL_ISOLATE="0", PROPOSAL_MEMORY_BUDGET_MB="0")
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root, env=env)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"file": os.path.basename(pdf_path), "mode": mode,
+                "error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    result = json.loads(lines[-1])
+    return {
+        "file": os.path.basename(pdf_path),
+        "mode": mode,
+        "pages": result["pages"],
+        "seconds": round(result["seconds"], 3),
+        "peak_rss_mb": round(result["peak_rss_mb"], 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of eager vs streamed page reading")
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--pipeline", action="store_true", help="also time a full proposal run")
+    parser.add_argument("--record", help="append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    modes = MODES + (["pipeline"] if args.pipeline else [])
+    results = [measure(path, mode) for path in args.pdfs for mode in modes]
+    print(f"{'file':<32}{'mode':<10}{'pages':>7}{'seconds':>10}{'peak MB':>10}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['file']:<32}{r['mode']:<10}  error: {r['error']}")
+            continue
+        print(f"{r['file']:<32}{r['mode']:<10}{r['pages']:>7}{r['seconds']:>10.2f}{r['peak_rss_mb']:>10.1f}")
+
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record)), exist_ok=True)
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "memory_budget_mb": float(os.environ.get("PROPOSAL_MEMORY_BUDGET_MB", 1024)),
+                "results": results,
+            }) + "\n")
+
+if __name__ == "__main__":
+    main()
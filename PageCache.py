@@ -0,0 +1,185 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+############################################
+# Page-level content-hash cache for revised quotes
+############################################
+# Each page is keyed by a hash of what it draws (content stream, form
+# XObjects, fonts, page box), so a revised quote only re-parses the pages
+# that changed. The cache holds customer quote text, so it is off unless
+# PROPOSAL_PAGE_CACHE=1, and pages are deleted MAX_AGE_DAYS after they
+# were stored whether or not they are still being used.
+DB_PATH = os.environ.get(
+    "PROPOSAL_PAGE_CACHE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "page_cache.db")
+)
+# Least recently used pages beyond this are dropped
+MAX_PAGES = int(os.environ.get("PROPOSAL_PAGE_CACHE_PAGES", 100000))
+MAX_AGE_DAYS = float(os.environ.get("PROPOSAL_PAGE_CACHE_DAYS", 30))
+# Bump when what is stored per page changes
+CACHE_VERSION = 2
+
+# Only plain pdfplumber page text is cached: PageStream serves it to the
+# readers that ask for extract_text() with default options. Readers that
+# need words, characters, layout text or tables (camelot, extract_words,
+# layout=True) still parse their pages themselves.
+
+# Schema upgrades; MIGRATIONS[n] takes a database from user_version n to n + 1
+MIGRATIONS = [
+    # The first release's per-packet "pages" table is replaced by per-page text
+    """
+    DROP TABLE IF EXISTS pages;
+    CREATE TABLE IF NOT EXISTS page_text (
+        hash TEXT PRIMARY KEY,
+        text TEXT NOT NULL,
+        stored_at REAL NOT NULL,
+        used_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_page_text_used_at ON page_text(used_at);
+    CREATE INDEX IF NOT EXISTS idx_page_text_stored_at ON page_text(stored_at);
+    """,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+class CacheUnavailable(Exception):
+    """The packet cannot be hashed or the cache cannot be read; parse it normally."""
+
+def enabled() -> bool:
+    return os.environ.get("PROPOSAL_PAGE_CACHE", "0").strip().lower() in ("1", "true", "yes", "on")
+
+def _schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Bring the schema up to SCHEMA_VERSION; a current database is left untouched."""
+    if _schema_version(conn) >= SCHEMA_VERSION:
+        return
+    # One writer migrates; others wait on the lock and then see the new version
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for version in range(_schema_version(conn), SCHEMA_VERSION):
+            for statement in MIGRATIONS[version].split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def connect(db_path=None):
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=30)
+    try:
+        migrate(conn)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+def _key_prefix() -> bytes:
+    # Text from another pdfplumber release may differ, so it gets its own keys
+    try:
+        from importlib.metadata import version
+        plumber = version("pdfplumber")
+    except Exception:
+        plumber = "unknown"
+    return f"v{CACHE_VERSION}:pdfplumber-{plumber}:".encode()
+
+def _stream(doc, xref):
+    try:
+        return doc.xref_stream(xref) or b""
+    except Exception:
+        return b""
+
+def page_hashes(pdf_bytes) -> list:
+    """Content hash of every page, computed with PyMuPDF."""
+    import fitz  # PyMuPDF
+
+    prefix = _key_prefix()
+    hashes = []
+    doc = fitz.open(stream=bytes(pdf_bytes), filetype="pdf")
+    try:
+        for page in doc:
+            digest = hashlib.sha256(prefix)
+            digest.update(page.read_contents())
+            digest.update(repr((tuple(page.mediabox), tuple(page.cropbox), page.rotation)).encode())
+            # Font names and their ToUnicode maps decide how the drawn glyphs read
+            for xref, ext, ftype, basefont, name, encoding, *_ in page.get_fonts(full=True):
+                digest.update(repr((ext, ftype, basefont, name, encoding)).encode())
+                kind, value = doc.xref_get_key(xref, "ToUnicode")
+                if kind == "xref":
+                    digest.update(_stream(doc, int(value.split()[0])))
+            # Text drawn through form XObjects is not in the page's own stream
+            for xref, *_ in page.get_xobjects():
+                digest.update(_stream(doc, xref))
+            hashes.append(digest.hexdigest())
+    finally:
+        doc.close()
+    return hashes
+
+def purge(conn):
+    """Delete pages stored more than MAX_AGE_DAYS ago."""
+    if MAX_AGE_DAYS > 0:
+        with conn:
+            conn.execute("DELETE FROM page_text WHERE stored_at < ?", (time.time() - MAX_AGE_DAYS * 86400,))
+
+def lookup(hashes, db_path=None) -> dict:
+    """{hash: text} for the hashes already cached (and not expired)."""
+    wanted = list(dict.fromkeys(hashes))
+    found = {}
+    conn = connect(db_path)
+    try:
+        purge(conn)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start:start + 500]
+            rows = conn.execute(
+                f"SELECT hash, text FROM page_text WHERE hash IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            found.update(rows)
+        if found:
+            with conn:
+                conn.executemany(
+                    "UPDATE page_text SET used_at = ? WHERE hash = ?", [(time.time(), h) for h in found]
+                )
+    finally:
+        conn.close()
+    return found
+
+def store(entries, db_path=None):
+    """Save {hash: text} and trim the cache to MAX_PAGES; errors are ignored."""
+    if not entries:
+        return
+    try:
+        conn = connect(db_path)
+        try:
+            with conn:
+                now = time.time()
+                conn.executemany(
+                    "INSERT INTO page_text (hash, text, stored_at, used_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(hash) DO UPDATE SET used_at = excluded.used_at",
+                    [(h, text, now, now) for h, text in entries.items()],
+                )
+                conn.execute(
+                    "DELETE FROM page_text WHERE hash IN "
+                    "(SELECT hash FROM page_text ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (MAX_PAGES,),
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+def cached_texts(pdf_bytes, db_path=None) -> tuple:
+    """
+    (page hashes, [cached text or None per page]). Nothing is parsed here;
+    pages missing from the cache are read later by whichever section needs
+    them, and stored then.
+    """
+    try:
+        hashes = page_hashes(pdf_bytes)
+        cached = lookup(hashes, db_path)
+    except Exception as e:
+        raise CacheUnavailable(str(e)) from e
+    return hashes, [cached.get(h) for h in hashes]
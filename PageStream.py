@@ -0,0 +1,346 @@
+import os
+import sys
+import time
+import atexit
+import tempfile
+import threading
+import multiprocessing
+from io import BytesIO
+
+############################################
+# Memory-bounded page streaming for pdfplumber
+############################################
+# Resident memory one run's extraction may reach while streaming pages.
+# It is only enforced in processes that serve a single extraction at a time
+# (Deadlines workers and parallel page readers), where RSS is that run's own
+# footprint; the Streamlit server process holds every session, so its RSS
+# says nothing about one run. PROPOSAL_MEMORY_BUDGET_MB=0 turns the check off.
+MEMORY_BUDGET_MB = float(os.environ.get("PROPOSAL_MEMORY_BUDGET_MB", 1024))
+# How often (in pages) the budget is checked
+CHECK_EVERY = 10
+
+# True in a process dedicated to one extraction at a time
+_dedicated = False
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised when an extraction streams past MEMORY_BUDGET_MB of resident memory."""
+
+def dedicate_process():
+    """Mark this process as serving one extraction at a time, so the budget applies to it."""
+    global _dedicated
+    _dedicated = True
+
+def current_rss_mb():
+    """Resident memory of this process in MB, or None if it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except (OSError, ValueError):
+            return None
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize / 2**20
+    return None
+
+def check_memory_budget(context=""):
+    """Raise MemoryBudgetExceeded when this dedicated process is over MEMORY_BUDGET_MB."""
+    if MEMORY_BUDGET_MB <= 0 or not _dedicated:
+        return
+    rss = current_rss_mb()
+    if rss is not None and rss > MEMORY_BUDGET_MB:
+        where = f" while reading {context}" if context else ""
+        raise MemoryBudgetExceeded(
+            f"{rss:.0f} MB in use{where}, over the {MEMORY_BUDGET_MB:.0f} MB budget"
+        )
+
+def _open(source):
+    import pdfplumber
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    elif hasattr(source, "seek"):
+        source.seek(0)
+    return pdfplumber.open(source)
+
+def release_page(page):
+    """Drop a pdfplumber page's cached characters and layout objects."""
+    # pdfplumber >= 0.10 has Page.close(); older releases only flush_cache()
+    close = getattr(page, "close", None) or getattr(page, "flush_cache", None)
+    if close is not None:
+        close()
+
+def iter_pages(source, pages=None):
+    """
+    Yield (index, pdfplumber page) for the given page indexes (all pages by
+    default), releasing each page's cached layout objects once the caller
+    moves on and checking the memory budget every CHECK_EVERY pages.
+    source may be PDF bytes, a file-like object or a path.
+    """
+    with _open(source) as pdf:
+        indexes = range(len(pdf.pages)) if pages is None else pages
+        for count, i in enumerate(indexes, 1):
+            page = pdf.pages[i]
+            try:
+                yield i, page
+            finally:
+                release_page(page)
+            if count % CHECK_EVERY == 0:
+                check_memory_budget(f"page {i + 1}")
+
+def iter_page_texts(source, pages=None, **extract_kwargs):
+    """
+    Yield (index, text) per page; text is "" for pages without any. Text a
+    PrefetchedPdf already carries is reused, and only its missing pages are
+    parsed (and remembered, see remember()).
+    """
+    prefetched = prefetched_texts(source) if not extract_kwargs else None
+    if prefetched is None:
+        for i, page in iter_pages(source, pages):
+            yield i, page.extract_text(**extract_kwargs) or ""
+        return
+    fresh = {}
+    pdf = None
+    try:
+        for i in (range(len(prefetched)) if pages is None else pages):
+            text = prefetched[i]
+            if text is None:
+                if pdf is None:
+                    pdf = _open(source)
+                page = pdf.pages[i]
+                try:
+                    text = fresh[i] = page.extract_text() or ""
+                finally:
+                    release_page(page)
+                if len(fresh) % CHECK_EVERY == 0:
+                    check_memory_budget(f"page {i + 1}")
+            yield i, text
+    finally:
+        if pdf is not None:
+            pdf.close()
+        remember(source, fresh)
+
+def read_page_texts(source, pages=None, **extract_kwargs) -> list:
+    """Text of each requested page, in order."""
+    return [text for _, text in iter_page_texts(source, pages, **extract_kwargs)]
+
+def read_text(source, pages=None, sep="\n", skip_empty=False, **extract_kwargs) -> str:
+    """Page texts joined once with sep, instead of growing one string page by page."""
+    texts = read_page_texts(source, pages, **extract_kwargs)
+    return sep.join(t for t in texts if t) if skip_empty else sep.join(texts)
+
+############################################
+# Parallel page-range extraction
+############################################
+# Reader processes shared by every run in this process (1 turns it off),
+# pages per task, and the smallest packet worth splitting.
+PAGE_WORKERS = max(1, int(os.environ.get("PROPOSAL_PAGE_WORKERS", min(4, os.cpu_count() or 1))))
+CHUNK_SIZE = max(1, int(os.environ.get("PROPOSAL_PAGE_CHUNK", 25)))
+PARALLEL_MIN_PAGES = int(os.environ.get("PROPOSAL_PARALLEL_MIN_PAGES", 60))
+
+# Seconds prefetch() may spend reading a large packet in parallel before it
+# leaves the pages to the section extractors.
+PREFETCH_SECONDS = float(os.environ.get("PROPOSAL_PREFETCH_SECONDS", 60))
+
+class PrefetchedPdf(bytes):
+    """
+    PDF bytes that also carry the pdfplumber text of the pages read so far
+    (None for pages not read yet) and, with the page cache on, each page's
+    PageCache hash. Extractors treat it as the plain bytes; PageStream reads
+    the text from it instead of parsing those pages again. The text is only
+    reused by readers asking for the backend it came from.
+    """
+    backend = "pdfplumber"
+
+    def __new__(cls, data, page_texts, page_hashes=None):
+        self = super().__new__(cls, data)
+        self.page_texts = list(page_texts)
+        self.page_hashes = list(page_hashes) if page_hashes is not None else None
+        return self
+
+    def __reduce__(self):
+        return PrefetchedPdf, (bytes(self), self.page_texts, self.page_hashes)
+
+def prefetched_texts(source, backend="pdfplumber"):
+    """Page texts a PrefetchedPdf carries from backend (None for unread pages), else None."""
+    if getattr(source, "backend", None) != backend:
+        return None
+    return getattr(source, "page_texts", None)
+
+def remember(source, fresh):
+    """
+    Keep freshly parsed {index: text} on a PrefetchedPdf, and in the page
+    cache when it has the page hashes. Plain bytes are left alone.
+    """
+    texts = prefetched_texts(source)
+    if texts is None or not fresh:
+        return
+    for i, text in fresh.items():
+        texts[i] = text
+    hashes = getattr(source, "page_hashes", None)
+    if hashes is not None:
+        import PageCache
+
+        if PageCache.enabled():
+            PageCache.store({hashes[i]: text for i, text in fresh.items()})
+
+def read_pages(source, pages=None, **extract_kwargs) -> list:
+    """[(index, text)] for the requested pages, in one pass."""
+    return [(i, page.extract_text(**extract_kwargs) or "") for i, page in iter_pages(source, pages)]
+
+# Reader pools shared by every caller in this process, one per worker
+# count, so runs reuse warm processes instead of spawning a pool per call.
+# A reader is replaced after POOL_MAX_TASKS chunks, which bounds how much
+# memory it can pile up over many packets.
+POOL_MAX_TASKS = max(1, int(os.environ.get("PROPOSAL_POOL_MAX_TASKS", 40)))
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _shared_pool(workers):
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = multiprocessing.get_context("spawn").Pool(
+                workers, initializer=dedicate_process, maxtasksperchild=POOL_MAX_TASKS
+            )
+        return pool
+
+def shutdown():
+    """Stop the shared reader pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.terminate()
+        pool.join()
+
+atexit.register(shutdown)
+
+def _past(deadline):
+    return deadline is not None and time.time() > deadline
+
+def _extract_chunk(path, pages, extract_kwargs, deadline):
+    # Chunks of a call that already timed out are dropped, and a chunk in
+    # progress stops at the next page, so a shared reader is not held up
+    if _past(deadline):
+        raise multiprocessing.TimeoutError("dropped, the call already timed out")
+    results = []
+    for i, page in iter_pages(path, pages):
+        if _past(deadline):
+            raise multiprocessing.TimeoutError(f"stopped before page {i + 1}, the call timed out")
+        results.append((i, page.extract_text(**extract_kwargs) or ""))
+    return results
+
+def _page_count(pdf_bytes):
+    import fitz  # PyMuPDF, much faster than pdfplumber at counting
+
+    doc = fitz.open(stream=bytes(pdf_bytes), filetype="pdf")
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+def read_pages_parallel(pdf_bytes, pages, workers=None, chunk_size=None, timeout=None, **extract_kwargs) -> list:
+    """
+    read_pages() with the page list split into chunk_size chunks spread over
+    the shared pool of that many reader processes. The PDF is written once
+    to a temp file each reader opens itself. Results come back in the order
+    of pages. Raises multiprocessing.TimeoutError when the chunks take
+    longer than timeout seconds (the readers drop the rest of the call's
+    chunks), and MemoryBudgetExceeded when a reader goes over the memory
+    budget. Runs serially with one worker, or inside a daemonic process (an
+    extraction worker), which may not start processes of its own.
+    """
+    workers = PAGE_WORKERS if workers is None else max(1, int(workers))
+    chunk_size = CHUNK_SIZE if chunk_size is None else max(1, int(chunk_size))
+    pages = list(pages)
+    chunks = [pages[start:start + chunk_size] for start in range(0, len(pages), chunk_size)]
+    if workers == 1 or len(chunks) < 2 or multiprocessing.current_process().daemon:
+        return read_pages(pdf_bytes, pages, **extract_kwargs)
+
+    deadline = time.time() + timeout if timeout is not None else None
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(pdf_bytes)
+    try:
+        pending = _shared_pool(workers).starmap_async(
+            _extract_chunk, [(tmp.name, chunk, extract_kwargs, deadline) for chunk in chunks]
+        )
+        results = []
+        for chunk in pending.get(timeout):
+            results.extend(chunk)
+        return results
+    finally:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+
+def read_page_texts_parallel(pdf_bytes, page_count=None, workers=None, chunk_size=None, **extract_kwargs) -> list:
+    """pdfplumber text of every page, read by read_pages_parallel."""
+    if page_count is None:
+        page_count = _page_count(pdf_bytes)
+    return [text for _, text in read_pages_parallel(pdf_bytes, range(page_count), workers, chunk_size, **extract_kwargs)]
+
+def prefetch(pdf_bytes, page_count=None):
+    """
+    Attach the page text already at hand without parsing the packet inline:
+    pages the page cache holds (when PageCache is on) and, when at least
+    PARALLEL_MIN_PAGES pages are still unread, a parallel read bounded by
+    PREFETCH_SECONDS and the memory budget. Every other page is left to the
+    section extractors, which read only their own pages under their
+    deadlines. Comes back unchanged when nothing was read and the cache is off.
+    """
+    if pdf_bytes is None or prefetched_texts(pdf_bytes) is not None:
+        return pdf_bytes
+    import PageCache
+
+    hashes = texts = None
+    if PageCache.enabled():
+        try:
+            hashes, texts = PageCache.cached_texts(pdf_bytes)
+        except PageCache.CacheUnavailable:
+            pass
+    if texts is None:
+        if PAGE_WORKERS == 1:
+            return pdf_bytes
+        try:
+            texts = [None] * (page_count if page_count is not None else _page_count(pdf_bytes))
+        except Exception:
+            return pdf_bytes
+
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if PAGE_WORKERS > 1 and len(missing) >= PARALLEL_MIN_PAGES:
+        try:
+            fresh = dict(read_pages_parallel(pdf_bytes, missing, timeout=PREFETCH_SECONDS))
+        except Exception:
+            # Over the memory budget, out of time or a reader died: the
+            # sections read their own pages as usual
+            fresh = {}
+        for i, text in fresh.items():
+            texts[i] = text
+        if hashes is not None and fresh:
+            PageCache.store({hashes[i]: text for i, text in fresh.items()})
+
+    if hashes is None and all(text is None for text in texts):
+        return pdf_bytes
+    return PrefetchedPdf(pdf_bytes, texts, hashes)
@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import statistics
+
+import PageStream
+
+############################################
+# Parallel page-text benchmark: wall time of reading every page of each
+# packet with 1, 4 and 8 worker processes, checked against the serial text.
+# Run with: python ParallelBenchmark.py packet.pdf [...] [--workers 1 4 8] [--chunk-size 25]
+############################################
+DEFAULT_WORKERS = [1, 4, 8]
+
+def measure(pdf_bytes, workers, chunk_size, repeat=3):
+    """Median seconds and the page texts for one worker count."""
+    # The first call starts the shared reader pool; time the warm pool only
+    PageStream.read_page_texts_parallel(pdf_bytes, workers=workers, chunk_size=chunk_size)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        texts = PageStream.read_page_texts_parallel(pdf_bytes, workers=workers, chunk_size=chunk_size)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), texts
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs parallel page text extraction")
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=PageStream.CHUNK_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--record", help="append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'file':<32}{'pages':>7}{'workers':>9}{'seconds':>10}{'speedup':>9}  same text")
+    for path in args.pdfs:
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+        baseline_s = baseline_texts = None
+        for workers in args.workers:
+            seconds, texts = measure(pdf_bytes, workers, args.chunk_size, args.repeat)
+            if baseline_s is None:
+                baseline_s, baseline_texts = seconds, texts
+            row = {
+                "file": os.path.basename(path),
+                "pages": len(texts),
+                "workers": workers,
+                "chunk_size": args.chunk_size,
+                "seconds": round(seconds, 3),
+                "speedup": round(baseline_s / seconds, 2) if seconds else None,
+                "same_text": texts == baseline_texts,
+            }
+            results.append(row)
+            print(f"{row['file']:<32}{row['pages']:>7}{workers:>9}{row['seconds']:>10.2f}"
+                  f"{row['speedup']:>9.2f}  {'yes' if row['same_text'] else 'NO'}")
+
+    PageStream.shutdown()
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record)), exist_ok=True)
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "cpu_count": os.cpu_count(),
+                "results": results,
+            }) + "\n")
+
+if __name__ == "__main__":
+    main()
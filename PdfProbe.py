@@ -0,0 +1,154 @@
+import re
+
+############################################
+# Fast PyMuPDF probe used to classify uploads
+############################################
+# The headings each section extractor starts reading at. The extractors
+# import their pattern from here, so a packet is only reported as holding
+# a line of business when that line's extractor would find its section.
+# Property reads from "PROPERTY COVERAGES"
+PROPERTY_HEADING_RE = re.compile(r"PROPERTY\s+COVERAGES")
+# GL starts its page range here
+GL_HEADING_RE = re.compile(r"COMMERCIAL\s+GENERAL\s+LIABILITY")
+# Auto's vehicle schedule, or the heading Employment ends its section at
+AUTO_HEADING_RE = re.compile(r"schedule of covered autos you own|BUSINESS\s+AUTO\s+QUOTE\s+PROPOSAL", re.IGNORECASE)
+IM_HEADING_RE = re.compile(r"COMMERCIAL\s+INLAND\s+MARINE\s+QUOTE\s+PROPOSAL")
+UMBRELLA_HEADING_RE = re.compile(r"UMBRELLA\s+QUOTE\s+PROPOSAL")
+ERP_HEADING_RE = re.compile(r"EMPLOYMENT-RELATED\s+PRACTICES\s+LIABILITY\s+QUOTE\s+PROPOSAL", re.IGNORECASE)
+FORMS_HEADING_RE = re.compile(r"SCHEDULE\s+OF\s+FORMS\s+AND\s+ENDORSEMENTS")
+
+LOB_HEADING_PATTERNS = {
+    "Property": PROPERTY_HEADING_RE,
+    "General Liability": GL_HEADING_RE,
+    "Auto": AUTO_HEADING_RE,
+    "Inland Marine": IM_HEADING_RE,
+    "Umbrella": UMBRELLA_HEADING_RE,
+    "Employment": ERP_HEADING_RE,
+    "Forms": FORMS_HEADING_RE,
+}
+
+PREFIX_RE = re.compile(r"(policy|quote)\s*(number|no\.)?\s*[:#]?\s*([a-z]{3})", re.I)
+
+def get_policy_prefix(text: str):
+    m = PREFIX_RE.search(text)
+    if m:
+        return m.group(3).upper()
+    return None
+
+def is_wc_text(text: str) -> bool:
+    """True if the text reads like a Workers Compensation quote."""
+    if not text:
+        return False
+    lower = text.lower()
+    # Detect by explicit section title
+    if 'workers compensation' in lower and 'employers liability' in lower:
+        return True
+    # Detect by Quote/Policy No. prefix WCA
+    return get_policy_prefix(text) == 'WCA'
+
+def find_lob_pages(page_texts) -> dict:
+    """Return {lob: first page index} for every heading found in page_texts."""
+    found = {}
+    for i, text in enumerate(page_texts):
+        for lob, pattern in LOB_HEADING_PATTERNS.items():
+            if lob not in found and pattern.search(text):
+                found[lob] = i
+        if len(found) == len(LOB_HEADING_PATTERNS):
+            break
+    return found
+
+############################################
+# Document fingerprint: rating company and layout edition
+############################################
+RATING_COMPANY_RE = re.compile(r"Rating Company:\s*(.+)", re.IGNORECASE)
+ENDORSEMENTS_HEADING_RE = re.compile(r"POLICY\s+LEVEL\s+(?:ENDORSEMENTS|COVERAGES)", re.IGNORECASE)
+POLICY_LEVEL_COVERAGES_RE = re.compile(r"POLICY\s+LEVEL\s+COVERAGES", re.IGNORECASE)
+AUTO_SCHEDULE_RE = re.compile(r"schedule of covered autos you own", re.IGNORECASE)
+
+def _property_endorsements_layout(page_texts):
+    # Same two-page window Property reads the endorsements table from
+    for i, text in enumerate(page_texts):
+        if ENDORSEMENTS_HEADING_RE.search(text):
+            window = "\n".join(page_texts[i:i + 2])
+            if POLICY_LEVEL_COVERAGES_RE.search(window):
+                return "policy_level_coverages"
+            return "policy_level_endorsements"
+    return None
+
+def _auto_schedule_layout(page_texts):
+    # "line_per_cell": the vehicle schedule's text has the vehicle number and
+    # the model year on lines of their own, which the text parser reads
+    # directly; "table" needs camelot's table detection.
+    found = False
+    for text in page_texts:
+        if not AUTO_SCHEDULE_RE.search(text):
+            continue
+        found = True
+        lines = [ln.strip() for ln in text[AUTO_SCHEDULE_RE.search(text).end():].splitlines()]
+        for current, following in zip(lines, lines[1:]):
+            if "CLASSIFICATION" in current.upper():
+                break
+            if current.isdigit() and re.match(r"^\d{4}$", following):
+                return "line_per_cell"
+    return "table" if found else None
+
+def fingerprint(page_texts) -> dict:
+    """
+    Identify the rating company and the layout edition of each section
+    whose parser depends on it, from PyMuPDF page text:
+    {"rating_company", "layouts": {section: layout or None}, "key"}.
+    Sections go straight to the parser for their layout.
+    """
+    page_texts = page_texts or []
+    rating_company = None
+    for text in page_texts:
+        m = RATING_COMPANY_RE.search(text)
+        if m:
+            rating_company = m.group(1).strip()
+            break
+    layouts = {
+        "property_endorsements": _property_endorsements_layout(page_texts),
+        "auto_schedule": _auto_schedule_layout(page_texts),
+    }
+    key = "|".join([rating_company or "unknown"] + [f"{k}={v}" for k, v in layouts.items() if v])
+    return {"rating_company": rating_company, "layouts": layouts, "key": key}
+
+def probe_pdf(pdf_bytes: bytes, classify_pages: int = 4) -> dict:
+    """
+    Classify an upload as a Workers Comp ('wc') or main ('main') packet with
+    PyMuPDF. Page 1 usually decides it; the next pages (up to classify_pages)
+    are only read when it does not. A main packet is then read in full: the
+    PyMuPDF text of every page is kept for the section extractors, which
+    reuse it instead of opening the PDF again, and gives the first page of
+    each line's heading and the fingerprint. A WC packet stops after
+    classification.
+    Returns {"kind", "page_count", "page_texts", "lob_pages", "fingerprint"}.
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        page_count = len(doc)
+        page_texts = [None] * page_count
+        kind = "main"
+        head = ""
+        for i in range(min(classify_pages, page_count)):
+            page_texts[i] = doc[i].get_text("text")
+            head += page_texts[i] + "\n"
+            if is_wc_text(head):
+                kind = "wc"
+                break
+        if kind == "wc":
+            return {"kind": kind, "page_count": page_count, "page_texts": None, "lob_pages": {}, "fingerprint": None}
+        for i in range(page_count):
+            if page_texts[i] is None:
+                page_texts[i] = doc[i].get_text("text")
+    finally:
+        doc.close()
+    return {
+        "kind": kind,
+        "page_count": page_count,
+        "page_texts": page_texts,
+        "lob_pages": find_lob_pages(page_texts),
+        "fingerprint": fingerprint(page_texts),
+    }
@@ -142,8 +142,8 @@ def extract_terrorism_premium(file_bytes):
 # PDF Extraction Logic
 ##############################
 def extract_policy_information(file_bytes):
-    from pdfminer.high_level import extract_text
-    text = extract_text(io.BytesIO(file_bytes))
+    import TextBackends
+    text = TextBackends.read_text(file_bytes, "Policy Information")
     lines = [line.strip() for line in text.splitlines() if line.strip()]
 
     def clean_colon_space(s):
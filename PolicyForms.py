@@ -0,0 +1,324 @@
+import re
+
+import TextBackends
+
+############################################
+# One-pass policy forms parser for every line of business
+############################################
+FORMS_START = "SCHEDULE OF FORMS AND ENDORSEMENTS"
+FORMS_HEADING_RE = re.compile(r"SCHEDULE\s+OF\s+FORMS\s+AND\s+ENDORSEMENTS")
+EDITION_RE = re.compile(r"^\d{2}-\d{4}$")
+AUTO_ROW_RE = re.compile(r'^[A-Z0-9 ]+\s\d{2}-\d{4}\b')
+
+# Coverage-part titles that open a forms table, per line of business
+LOB_FORM_TITLES = {
+    "Property": [
+        "Commercial Property Coverage Part",
+        "Commercial Property Forms",
+    ],
+    "General Liability": [
+        "Commercial General Liability Coverage Part",
+        "Commercial General Liability",
+    ],
+    "Auto": [
+        "Commercial Auto Coverage Part",
+        "Commercial Auto",
+    ],
+    "Umbrella": [
+        "Commercial Umbrella Coverage Part",
+    ],
+    "Inland Marine": [
+        "Inland Marine Coverage Part",
+        "All Commercial Inland Marine Coverages",
+        "Coverages",
+        "Contractors Coverages",
+        "Installation Floater Coverages",
+        "Electronic Data Processing",
+    ],
+    "Workers Compensation": [
+        "Commercial Common Forms",
+        "Commercial Workers Compensation",
+    ],
+}
+
+# How each line of business decides where its table ends:
+#   "standard"      - a "Commercial ..." line that is not one of its titles
+#   "inland_marine" - any of INLAND_MARINE_STOP_TITLES, with descriptions trimmed
+#   "auto"          - narrative markers or a repeated row
+LOB_FORM_STYLES = {
+    "Property": "standard",
+    "General Liability": "standard",
+    "Auto": "auto",
+    "Umbrella": "standard",
+    "Inland Marine": "inland_marine",
+    "Workers Compensation": "standard",
+}
+
+INLAND_MARINE_STOP_TITLES = [
+    "Commercial Property Coverage Part",
+    "Commercial Property Forms",
+    "Commercial General Liability Coverage Part",
+    "Commercial Auto Coverage Part",
+    "Commercial Automobile",
+    "Commercial Umbrella",
+    "Commercial Umbrella Coverage Part",
+    "NOTICE", 'CL PN',
+]
+
+AUTO_NARRATIVE_MARKERS = [
+    "policy number:", "applicant", "effective date:",
+    "commercial automobile cl pn", "all commercial inland marine coverages",
+]
+
+AUTO_DESCRIPTION_STOP_PHRASES = [
+    "your payment includes",
+    "page 1 of 1",
+    "commercial automobile ca pn 83 36 tx 07 19 notice",
+    "texas motor vehicle crime prevention authority fee",
+    "notice -",
+    "authority fee · auto burglary,",
+    "auto burglary, theft and fraud prevention;",
+    "by law, we send this fee to the motor vehicle crime prevention authority",
+    "criminal justice efforts;",
+    "ca pn 83 36 tx 07 19",
+    "commercial automobile · ·",
+    "trauma care and emergency medical services for victims of accidents due to traffic offenses."
+]
+
+def parse_line_into_columns(line: str) -> list:
+    """
+    Splits a single line into [Number, Edition, Description].
+    Looks for a token matching MM-YYYY as 'Edition'. If not found,
+    entire line is 'Number' and Edition/Description are blank.
+    """
+    tokens = line.split()
+    number_parts = []
+    edition = ""
+    description_parts = []
+    found_edition = False
+    for token in tokens:
+        if not found_edition and EDITION_RE.match(token):
+            edition = token
+            found_edition = True
+        else:
+            if not found_edition:
+                number_parts.append(token)
+            else:
+                description_parts.append(token)
+    number = " ".join(number_parts).strip()
+    description = " ".join(description_parts).strip()
+    return [number, edition, description]
+
+def clean_description(description: str) -> str:
+    """
+    Removes extra text from the 'Description' if it contains certain stop phrases.
+    We cut off everything from that phrase onward.
+    """
+    desc_lower = description.lower()
+    for phrase in AUTO_DESCRIPTION_STOP_PHRASES:
+        idx = desc_lower.find(phrase)
+        if idx != -1:
+            # Cut off everything from that phrase onward
+            return description[:idx].strip()
+    return description
+
+def remove_punctuation_and_spaces(s: str) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '', s).lower()
+
+def find_coverage_stop_index(description: str, stop_kw: str) -> int:
+    norm_desc = remove_punctuation_and_spaces(description)
+    norm_stop = remove_punctuation_and_spaces(stop_kw)
+    idx = norm_desc.find(norm_stop)
+    if idx == -1:
+        return -1
+    real_idx = 0
+    cur_norm_count = 0
+    while real_idx < len(description) and cur_norm_count < idx:
+        c = description[real_idx]
+        if c.isalnum():
+            cur_norm_count += 1
+        real_idx += 1
+    return real_idx
+
+def truncate_on_all_caps(description: str) -> str:
+    tokens = description.split()
+    truncated = []
+    for token in tokens:
+        clean_token = re.sub(r'[^A-Za-z]', '', token)
+        if len(clean_token) >= 2 and clean_token.isupper():
+            break
+        truncated.append(token)
+    return " ".join(truncated).strip()
+
+def _is_header_line(line_lower: str) -> bool:
+    return "number" in line_lower and "edition" in line_lower and "description" in line_lower
+
+def _add_row(rows, number, edition, description):
+    """Start a new row, or extend the previous description when there is no edition."""
+    if not edition:
+        if rows:
+            rows[-1][2] += " " + " ".join(part for part in [number, description] if part)
+            rows[-1][2] = rows[-1][2].strip()
+        else:
+            rows.append(["", "", (number + " " + description)])
+    else:
+        rows.append([number, edition, description])
+
+def _new_state(lob):
+    if LOB_FORM_STYLES[lob] == "auto":
+        # Every Auto title is tracked on its own: title -> header -> rows -> done
+        return {
+            title: {"phase": "title", "rows": [], "seen": set()}
+            for title in LOB_FORM_TITLES[lob]
+        }
+    return {"current": None, "skip_header": False, "sections": {}}
+
+def _step_standard(state, titles, line, lower, parsed, truncate):
+    if state["skip_header"]:
+        state["skip_header"] = False
+        if _is_header_line(lower):
+            return
+    if line in titles:
+        state["current"] = line
+        state["sections"][line] = []
+        state["skip_header"] = True
+        return
+    current = state["current"]
+    if not current:
+        return
+    if truncate:
+        if any(stop_kw.lower() in lower for stop_kw in INLAND_MARINE_STOP_TITLES):
+            state["current"] = None
+            return
+        if not line:
+            return
+        number, edition, description = parsed()
+        earliest_idx = None
+        for stop_kw in INLAND_MARINE_STOP_TITLES:
+            idx = find_coverage_stop_index(description, stop_kw)
+            if idx != -1 and (earliest_idx is None or idx < earliest_idx):
+                earliest_idx = idx
+        if earliest_idx is not None:
+            description = description[:earliest_idx].strip()
+        description = truncate_on_all_caps(description)
+        if not edition and not state["sections"][current]:
+            state["sections"][current].append(["", "", (number + " " + description).strip()])
+        else:
+            _add_row(state["sections"][current], number, edition, description)
+        return
+    if line.startswith("Commercial ") and line not in titles:
+        state["current"] = None
+        return
+    number, edition, description = parsed()
+    _add_row(state["sections"][current], number, edition, description)
+
+def _step_auto(state, line, lower, parsed):
+    for title, tstate in state.items():
+        phase = tstate["phase"]
+        if phase == "title":
+            if line == title:
+                tstate["phase"] = "header"
+        elif phase == "header":
+            if _is_header_line(lower):
+                tstate["phase"] = "rows"
+        elif phase == "rows":
+            rows = tstate["rows"]
+            if any(marker in lower for marker in AUTO_NARRATIVE_MARKERS):
+                tstate["phase"] = "done"
+            elif AUTO_ROW_RE.match(line):
+                num, edt, desc = parsed()
+                if (num, edt) in tstate["seen"]:
+                    tstate["phase"] = "done"
+                else:
+                    tstate["seen"].add((num, edt))
+                    rows.append([num, edt, clean_description(desc)])
+            elif rows and line:
+                rows[-1][2] = clean_description(rows[-1][2] + " " + line)
+
+def parse_all_policy_forms(text: str, lobs=None) -> dict:
+    """
+    Scan "SCHEDULE OF FORMS AND ENDORSEMENTS" once and route every row to the
+    coverage-part titles of each line of business in the same pass.
+    Returns {lob: {title: [[Number, Edition, Description], ...]}}.
+
+    Every line of business, Auto included, reads from the heading on. The
+    old Auto parser read the whole document, so an Auto title printed before
+    the heading (on the quote pages) could open its table; here it cannot.
+    The pipeline passes extract_forms_text(), which starts at the forms
+    pages anyway. Without the heading only Auto reads, from the top.
+    """
+    lobs = list(lobs) if lobs is not None else list(LOB_FORM_TITLES)
+    results = {lob: {} for lob in lobs}
+    start_index = text.find(FORMS_START)
+    if start_index == -1:
+        # Only the Auto parser ever looked outside the forms schedule
+        lobs = [lob for lob in lobs if LOB_FORM_STYLES[lob] == "auto"]
+        start_index = 0
+    if not lobs:
+        return results
+
+    states = {lob: _new_state(lob) for lob in lobs}
+    title_sets = {lob: set(LOB_FORM_TITLES[lob]) for lob in lobs}
+
+    for raw_line in text[start_index:].splitlines():
+        line = raw_line.strip()
+        lower = line.lower()
+        cache = []
+
+        def parsed():
+            # Split the line at most once, whichever parsers ask for it
+            if not cache:
+                cache.append(parse_line_into_columns(line))
+            return list(cache[0])
+
+        for lob in lobs:
+            style = LOB_FORM_STYLES[lob]
+            if style == "auto":
+                _step_auto(states[lob], line, lower, parsed)
+            else:
+                _step_standard(states[lob], title_sets[lob], line, lower, parsed,
+                               truncate=(style == "inland_marine"))
+
+    for lob in lobs:
+        if LOB_FORM_STYLES[lob] == "auto":
+            results[lob] = {
+                title: tstate["rows"]
+                for title, tstate in states[lob].items()
+                if tstate["rows"]
+            }
+        else:
+            results[lob] = states[lob]["sections"]
+    return results
+
+def parse_policy_forms_for_lob(text: str, lob: str) -> dict:
+    """Forms sections for a single line of business."""
+    return parse_all_policy_forms(text, [lob])[lob]
+
+def extract_forms_text(pdf_bytes: bytes, raw_pages=None) -> str:
+    """
+    Text of the forms schedule only: PyMuPDF finds the first
+    "SCHEDULE OF FORMS AND ENDORSEMENTS" page and pdfplumber reads from
+    there to the end of the document. raw_pages (PyMuPDF text per page)
+    skips the probe.
+    """
+    if raw_pages is None:
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            raw_pages = [page.get_text("text") for page in doc]
+        finally:
+            doc.close()
+    page_count = len(raw_pages)
+    forms_start = next(
+        (i for i, text in enumerate(raw_pages) if FORMS_HEADING_RE.search(text)),
+        page_count
+    )
+    if forms_start >= page_count:
+        return ""
+    backend = TextBackends.backend_for("Policy Forms")
+    if backend == "pymupdf":
+        texts = raw_pages[forms_start:]  # the probe already read these pages
+    else:
+        texts = TextBackends.page_texts(pdf_bytes, backend, range(forms_start, page_count))
+    return "\n".join(t for t in texts if t)
@@ -0,0 +1,250 @@
+import os
+import time
+import html
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import streamlit as st
+
+############################################
+# Cached HTML previews of the extracted tables
+############################################
+# Tables are written straight to editable HTML in one pass (no to_html()
+# plus regex), each fragment is cached by a hash of the DataFrame, and a
+# section's headings, tables and notes go to the browser as one
+# st.markdown element. Under progressive() each section has a slot reserved
+# up front that shows a running timer until the section fills it.
+MAX_FRAGMENTS = int(os.environ.get("PROPOSAL_PREVIEW_CACHE", 512))
+# Proposal sections in page order
+SECTIONS = (
+    "Policy Information", "Property", "General Liability", "Employment",
+    "Auto", "Inland Marine", "Umbrella", "Workers Compensation",
+)
+TICK_SECONDS = 1.0
+
+# Header and cell styles of the teal standalone Inland Marine page
+TEAL_TABLE = "border-collapse: collapse; width: 100%;"
+TEAL_HEAD = "background-color: #2D5D77; color: white;"
+TEAL_CELL = "border: 1px solid #ccc; padding: 8px 12px;"
+
+_fragments = OrderedDict()
+_lock = threading.Lock()
+_state = threading.local()
+
+def mute(muted=True):
+    """Skip building previews on this thread (e.g. the job service, which has no page)."""
+    _state.muted = muted
+
+def muted() -> bool:
+    return getattr(_state, "muted", False)
+
+def frame_key(df, *options):
+    """Hash of the DataFrame's columns and values plus the render options, or None if unhashable."""
+    import pandas as pd
+
+    try:
+        values = pd.util.hash_pandas_object(df, index=False).values
+    except TypeError:  # lists/dicts in cells
+        return None
+    digest = hashlib.sha1(values.tobytes())
+    digest.update(repr((tuple(str(c) for c in df.columns), df.shape, options)).encode())
+    return digest.hexdigest()
+
+def _text(value) -> str:
+    if value is None or (isinstance(value, float) and value != value):  # None / NaN
+        return ""
+    return html.escape(str(value))
+
+def render_table(df, editable=True, teal=False) -> str:
+    """Editable HTML table of df in one pass (to_html() layout, or the teal inline-styled one)."""
+    if teal:
+        cell = f" style='{TEAL_CELL}'"
+        parts = [
+            f"<div class='table-container'><table style='{TEAL_TABLE}'>",
+            f"<thead style='{TEAL_HEAD}'><tr>",
+        ]
+        parts.extend(f"<th{cell}>{_text(c)}</th>" for c in df.columns)
+        row_open = "<tr style='background-color: white;'>"
+        close = "</tbody></table></div>"
+    else:
+        cell = ""
+        parts = ['<table border="1" class="dataframe"><thead><tr style="text-align: right;">']
+        parts.extend(f"<th>{_text(c)}</th>" for c in df.columns)
+        row_open = "<tr>"
+        close = "</tbody></table>"
+    parts.append("</tr></thead><tbody>")
+    td = f"<td contenteditable='true'{cell}>" if editable else f"<td{cell}>"
+    for row in df.itertuples(index=False, name=None):
+        parts.append(row_open)
+        parts.extend(f"{td}{_text(v)}</td>" for v in row)
+        parts.append("</tr>")
+    parts.append(close)
+    return "".join(parts)
+
+def table_html(df, editable=True, teal=False) -> str:
+    """render_table() through the fragment cache."""
+    key = frame_key(df, editable, teal)
+    if key is None:
+        return render_table(df, editable, teal)
+    with _lock:
+        fragment = _fragments.get(key)
+        if fragment is not None:
+            _fragments.move_to_end(key)
+            return fragment
+    fragment = render_table(df, editable, teal)
+    with _lock:
+        _fragments[key] = fragment
+        while len(_fragments) > MAX_FRAGMENTS:
+            _fragments.popitem(last=False)
+    return fragment
+
+class SectionView:
+    """Collects one section's preview; nothing is built while muted."""
+    __slots__ = ("parts", "enabled")
+
+    def __init__(self, enabled=True):
+        self.parts = []
+        self.enabled = enabled
+
+    def subheader(self, text):
+        if self.enabled:
+            self.parts.append(f"<h3>{html.escape(str(text))}</h3>")
+
+    def heading(self, text):
+        if self.enabled:
+            self.parts.append(f"<h4>{html.escape(str(text))}</h4>")
+
+    def text(self, text, bold=False):
+        if self.enabled:
+            text = html.escape(str(text))
+            self.parts.append(f"<p><strong>{text}</strong></p>" if bold else f"<p>{text}</p>")
+
+    def table(self, df, editable=True, align_left=False):
+        if self.enabled:
+            fragment = table_html(df, editable)
+            self.parts.append(f'<div style="text-align:left;">{fragment}</div>' if align_left else fragment)
+
+    def html(self, markup):
+        if self.enabled:
+            self.parts.append(markup.strip())
+
+class Slot:
+    __slots__ = ("name", "placeholder", "started", "done")
+
+    def __init__(self, name, placeholder):
+        self.name = name
+        self.placeholder = placeholder
+        self.started = None
+        self.done = False
+
+class Progressive:
+    """
+    One st.empty() slot per section, in page order. A ticker thread shows
+    how long the running section has taken; the section's preview replaces
+    the timer when it is ready.
+    """
+
+    def __init__(self, sections):
+        self.slots = {}
+        for name in sections:
+            self.slots[name] = Slot(name, st.empty())
+            self.slots[name].placeholder.caption(f"{name}: waiting")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ticker = None
+
+    def start(self):
+        try:
+            from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        except ImportError:
+            return
+        ctx = get_script_run_ctx()
+        if ctx is None:  # not inside a Streamlit session
+            return
+        self._ticker = threading.Thread(target=self._tick, name="preview-ticker", daemon=True)
+        add_script_run_ctx(self._ticker, ctx)
+        self._ticker.start()
+
+    def _show_running(self, slot):
+        elapsed = time.perf_counter() - slot.started
+        slot.placeholder.markdown(f"⏱ **{slot.name}**: extracting… {elapsed:.0f}s")
+
+    def _tick(self):
+        while not self._stop.wait(TICK_SECONDS):
+            with self._lock:
+                for slot in self.slots.values():
+                    if slot.started is not None and not slot.done:
+                        self._show_running(slot)
+
+    def begin(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            return
+        with self._lock:
+            # Sections run one after another: one still running here failed without a preview
+            for other in self.slots.values():
+                if other.started is not None and not other.done:
+                    other.placeholder.empty()
+                    other.done = True
+            if slot.started is None:
+                slot.started = time.perf_counter()
+                self._show_running(slot)
+
+    def fill(self, name, markup) -> bool:
+        slot = self.slots.get(name)
+        if slot is None:
+            return False
+        with self._lock:
+            slot.done = True
+            slot.placeholder.markdown(markup, unsafe_allow_html=True)
+        return True
+
+    def close(self):
+        """Stop the timers; slots of sections that never showed anything are cleared."""
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join(timeout=TICK_SECONDS * 2)
+        with self._lock:
+            for slot in self.slots.values():
+                if not slot.done:
+                    slot.placeholder.empty()
+                    slot.done = True
+
+@contextmanager
+def progressive(sections=SECTIONS):
+    """Reserve a slot per section on this thread while the block runs."""
+    board = Progressive(sections)
+    _state.progressive = board
+    board.start()
+    try:
+        yield board
+    finally:
+        _state.progressive = None
+        board.close()
+
+def begin(name):
+    """Mark section name as running (starts its timer under progressive())."""
+    board = getattr(_state, "progressive", None)
+    if board is not None:
+        board.begin(name)
+
+@contextmanager
+def section(name=None):
+    """
+    with Preview.section("Auto") as view: view.subheader(...); view.table(df)
+    sends everything added in the block as a single st.markdown element,
+    into the section's reserved slot when there is one.
+    """
+    view = SectionView(enabled=not muted())
+    yield view
+    if view.parts:
+        markup = "".join(view.parts)
+        board = getattr(_state, "progressive", None)
+        if board is None or not board.fill(name, markup):
+            st.markdown(markup, unsafe_allow_html=True)
+
+def clear_cache():
+    with _lock:
+        _fragments.clear()
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import datetime
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+############################################
+# Opt-in per-stage timing and memory instrumentation
+############################################
+# Turn on with the sidebar checkbox or PROPOSAL_PROFILE=1.
+# Each thread (Streamlit session, batch worker, job thread) records its own
+# run. CPU time is this thread's own, plus what Deadlines workers report for
+# the calls they ran. Workers also measure their own memory peak; the
+# process-wide tracemalloc peak is only kept for a stage while no other run
+# is active, since overlapping runs allocate into the same peak.
+PROFILE_ENV_VAR = "PROPOSAL_PROFILE"
+RUNS_DIR = os.environ.get(
+    "PROPOSAL_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_runs")
+)
+
+# The run being recorded on each thread
+_state = threading.local()
+# Runs currently tracing memory; tracemalloc is started by the first and
+# stopped by the last, and left alone if something else turned it on
+_trace_lock = threading.Lock()
+_tracing_runs = 0
+_we_started_tracing = False
+# Runs active in this process, and how many have ever started, to tell
+# whether a stage overlapped another run
+_active_runs = 0
+_runs_started = 0
+
+def profiling_requested() -> bool:
+    return os.environ.get(PROFILE_ENV_VAR, "").strip().lower() in ("1", "true", "yes", "on")
+
+def _begin_tracing():
+    global _tracing_runs, _we_started_tracing
+    with _trace_lock:
+        if _tracing_runs == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _we_started_tracing = True
+        _tracing_runs += 1
+
+def _end_tracing():
+    global _tracing_runs, _we_started_tracing
+    with _trace_lock:
+        _tracing_runs = max(_tracing_runs - 1, 0)
+        if _tracing_runs == 0 and _we_started_tracing:
+            tracemalloc.stop()
+            _we_started_tracing = False
+
+def _run_began():
+    global _active_runs, _runs_started
+    with _trace_lock:
+        _active_runs += 1
+        _runs_started += 1
+
+def _run_ended():
+    global _active_runs
+    with _trace_lock:
+        _active_runs = max(_active_runs - 1, 0)
+
+def _alone() -> tuple:
+    """(no other run active, runs started so far)."""
+    with _trace_lock:
+        return _active_runs == 1, _runs_started
+
+def _current():
+    """This thread's run, or None when it is not recording."""
+    return getattr(_state, "run", None)
+
+def is_active() -> bool:
+    return _current() is not None
+
+def start_run(enabled=True, trace_memory=True, **meta):
+    """
+    Begin recording stages for one proposal run on this thread. Does nothing
+    when not enabled. trace_memory=False records times only, which is cheap
+    enough for every run.
+    """
+    previous = _current()
+    if previous is not None:
+        # A previous run on this thread stopped with an exception before finish_run
+        _run_ended()
+        if previous["_trace_memory"]:
+            _end_tracing()
+    _state.run = None
+    if not enabled:
+        return None
+    _run_began()
+    if trace_memory:
+        _begin_tracing()
+    _state.run = run = {
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "meta": dict(meta),
+        "stages": [],
+        "_stack": [],
+        "_documents": {},
+        "_trace_memory": trace_memory,
+        "_wall": time.perf_counter(),
+        "_cpu": time.thread_time(),
+        "_worker_cpu": 0.0,
+    }
+    return run
+
+def register_document(data, page_count):
+    """Remember the page count of a PDF so stages that receive it can report pages."""
+    run = _current()
+    if run is not None and data is not None:
+        run["_documents"][id(data)] = page_count
+
+def _page_count(run, args):
+    if not args:
+        return None
+    first = args[0]
+    if isinstance(first, (bytes, bytearray)):
+        return run["_documents"].get(id(first))
+    if isinstance(first, dict):
+        if isinstance(first.get("page_range"), tuple):
+            start, end = first["page_range"]
+            return max(end - start, 0)
+        if isinstance(first.get("page_texts"), list):
+            return len(first["page_texts"])
+    if isinstance(first, list) and first and isinstance(first[0], str):
+        return len(first)
+    return None
+
+def worker_options() -> dict:
+    """What a Deadlines worker should measure for a call made on this thread."""
+    run = _current()
+    if run is None:
+        return {}
+    return {"measure": True, "trace_memory": run["_trace_memory"]}
+
+def measure_call(func, args, kwargs, options):
+    """
+    Run func in a Deadlines worker, measuring its CPU time and, with
+    trace_memory, its tracemalloc peak. Returns (result, usage or None).
+    The worker serves one call at a time, so both are the call's own.
+    """
+    if not options.get("measure"):
+        return func(*args, **kwargs), None
+    trace = options.get("trace_memory") and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    cpu = time.process_time()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        usage = {"cpu_s": time.process_time() - cpu}
+        if trace:
+            usage["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+    return result, usage
+
+def add_worker_usage(usage):
+    """Charge what a Deadlines worker measured to this thread's open stage."""
+    run = _current()
+    if run is None or not usage:
+        return
+    run["_worker_cpu"] += usage["cpu_s"]
+    if run["_stack"]:
+        frame = run["_stack"][-1]
+        frame["worker_cpu"] += usage["cpu_s"]
+        if usage.get("peak_kb") is not None:
+            frame["worker_peak_kb"] = max(frame["worker_peak_kb"] or 0.0, usage["peak_kb"])
+
+@contextmanager
+def stage(name, pages=None):
+    """Record wall time, CPU time, peak traced memory and pages for one stage."""
+    run = _current()
+    if run is None:
+        yield
+        return
+    stack = run["_stack"]
+    alone, started = _alone()
+    tracing = run["_trace_memory"] and alone
+    if tracing:
+        # The peak reached so far belongs to the enclosing stage
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    frame = {
+        "peak": 0,
+        "base": tracemalloc.get_traced_memory()[0] if tracing else 0,
+        "worker_cpu": 0.0,
+        "worker_peak_kb": None,
+    }
+    stack.append(frame)
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.thread_time() - cpu + frame["worker_cpu"]
+        # Another run started or was running: the process-wide peak is not this stage's
+        tracing = tracing and _alone() == (True, started)
+        peak = max(frame["peak"], tracemalloc.get_traced_memory()[1]) if tracing else 0
+        stack.pop()
+        if stack:
+            parent = stack[-1]
+            parent["peak"] = max(parent["peak"], peak)
+            parent["worker_cpu"] += frame["worker_cpu"]
+            if frame["worker_peak_kb"] is not None:
+                parent["worker_peak_kb"] = max(parent["worker_peak_kb"] or 0.0, frame["worker_peak_kb"])
+        peaks = [kb for kb in (
+            max(peak - frame["base"], 0) / 1024 if tracing else None, frame["worker_peak_kb"]
+        ) if kb is not None]
+        run["stages"].append({
+            "stage": name,
+            "depth": len(stack),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "peak_kb": round(max(peaks), 1) if peaks else None,
+            "pages": pages,
+        })
+
+def profiled(func, label=None):
+    """Wrap func so each call is a stage while a run is being recorded."""
+    if getattr(func, "_profiled", False):
+        return func
+    label = label or f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        run = _current()
+        if run is None:
+            return func(*args, **kwargs)
+        with stage(label, pages=_page_count(run, args)):
+            return func(*args, **kwargs)
+
+    wrapper._profiled = True
+    return wrapper
+
+def instrument_module(module, names=(), prefixes=()):
+    """Wrap the named functions, and every function starting with one of prefixes, in module."""
+    if module is None:
+        return
+    for name, obj in list(vars(module).items()):
+        if not callable(obj) or getattr(obj, "__module__", None) != module.__name__:
+            continue
+        if name in names or any(name.startswith(p) for p in prefixes):
+            setattr(module, name, profiled(obj, f"{module.__name__}.{name}"))
+
+def finish_run(out_dir=None, write=True, **meta):
+    """
+    Stop recording this thread's run, write it as one JSON file under out_dir
+    (RUNS_DIR by default) unless write=False, and return the record. Returns
+    None when no run was active on this thread.
+    """
+    run, _state.run = _current(), None
+    if run is None:
+        return None
+    _run_ended()
+    if run["_trace_memory"]:
+        _end_tracing()
+    record = {
+        "started_at": run["started_at"],
+        "wall_s": round(time.perf_counter() - run["_wall"], 4),
+        "cpu_s": round(time.thread_time() - run["_cpu"] + run["_worker_cpu"], 4),
+        "meta": {**run["meta"], **meta},
+        "stages": run["stages"],
+    }
+    if not write:
+        return record
+    out_dir = out_dir or RUNS_DIR
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = os.path.join(out_dir, f"run_{stamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2, default=str)
+        record["path"] = path
+    except OSError as e:
+        record["path"] = None
+        record["error"] = str(e)
+    return record
+
+def stages_dataframe(record):
+    """Stages of a run record as a DataFrame in completion order."""
+    import pandas as pd
+
+    return pd.DataFrame(record.get("stages", []))
+
+def render_sidebar(record):
+    """Show a run record in a collapsible sidebar panel."""
+    import streamlit as st
+
+    if not record:
+        return
+    with st.sidebar.expander("Performance", expanded=False):
+        st.caption(f"Total {record['wall_s']:.2f}s wall, {record['cpu_s']:.2f}s CPU")
+        df = stages_dataframe(record)
+        if not df.empty:
+            columns = ["stage", "wall_s", "cpu_s", "peak_kb", "pages"]
+            top = df[df["depth"] == 0].sort_values("wall_s", ascending=False)
+            st.dataframe(top[columns], use_container_width=True, hide_index=True)
+            st.caption("All stages (nested calls indented)")
+            nested = df.assign(stage=["  " * d + s for d, s in zip(df["depth"], df["stage"])])
+            st.dataframe(nested[columns], use_container_width=True, hide_index=True)
+        if record.get("path"):
+            st.caption(f"Saved to {record['path']}")
@@ -1,8 +1,9 @@
-import pdfplumber
 import re
 import pandas as pd
-import os
 from io import BytesIO
+import PageStream
+import TextBackends
+from PolicyForms import parse_line_into_columns, parse_policy_forms_for_lob
 
 ############################################
 # 1) Utility: extract_text_between
@@ -148,40 +149,51 @@ def parse_other_coverages_text(text):
 ############################################
 # 7) parse_other_coverages_pdfplumber
 ############################################
-def parse_other_coverages_pdfplumber(pdf_path):
-    page_num = None
-    with pdfplumber.open(pdf_path) as pdf:
-        total_pages = len(pdf.pages)
-        for i, page in enumerate(pdf.pages, start=1):
-            txt = page.extract_text() or ""
-            if re.search(r"OTHER\s*COVERAGES", txt, re.IGNORECASE):
-                page_num = i
-                break
-    if page_num is None:
-        return pd.DataFrame()
-
+def parse_other_coverages_from_pages(page_texts):
+    """
+    Single scan over per-page text: skip pages until "OTHER COVERAGES"
+    appears, then capture lines until "mortgage holder(s)".
+    page_texts may be a list or a lazy generator; pages after the
+    section are never requested.
+    """
     lines_to_parse = []
     capturing = False
-    with pdfplumber.open(pdf_path) as pdf:
-        for p in range(page_num - 1, total_pages):
-            page_text = pdf.pages[p].extract_text() or ""
-            lines = page_text.split("\n")
-            for line in lines:
-                low_line = line.lower()
-                if re.search(r"other\s*coverages", low_line):
-                    capturing = True
-                    continue
-                if "mortgage holder(s)" in low_line:
-                    capturing = False
-                if capturing:
-                    lines_to_parse.append(line)
-            if not capturing and lines_to_parse:
-                break
+    found_page = False
+    for page_text in page_texts:
+        if not found_page:
+            if not re.search(r"OTHER\s*COVERAGES", page_text, re.IGNORECASE):
+                continue
+            found_page = True
+        for line in page_text.split("\n"):
+            low_line = line.lower()
+            if re.search(r"other\s*coverages", low_line):
+                capturing = True
+                continue
+            if "mortgage holder(s)" in low_line:
+                capturing = False
+            if capturing:
+                lines_to_parse.append(line)
+        if not capturing and lines_to_parse:
+            break
+    if not found_page:
+        return pd.DataFrame()
 
     text_to_parse = "\n".join(lines_to_parse)
     df = parse_other_coverages_text(text_to_parse)
     return df
 
+def parse_other_coverages_pdfplumber(pdf_source):
+    """
+    pdf_source may be a file path, raw PDF bytes, a file-like object,
+    or a list of already extracted page texts.
+    """
+    if isinstance(pdf_source, (list, tuple)):
+        return parse_other_coverages_from_pages(pdf_source)
+    # Pages are read one at a time; the scan stops at the end of the section
+    return parse_other_coverages_from_pages(
+        text for _, text in PageStream.iter_page_texts(pdf_source)
+    )
+
 ############################################
 # 8) parse_property_coverages
 ############################################
@@ -236,17 +248,9 @@ def display_coverage_blocks_as_tables(blocks):
 ############################################
 def extract_text_pdfplumber(pdf_bytes: bytes, use_layout: bool = True) -> str:
     try:
-        import pdfplumber
-        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-            if use_layout:
-                text = "\n".join(
-                    page.extract_text(layout=True) or "" for page in pdf.pages
-                )
-            else:
-                text = "\n".join(
-                    page.extract_text() or "" for page in pdf.pages
-                )
-        return text
+        if use_layout:
+            return PageStream.read_text(pdf_bytes, layout=True)
+        return PageStream.read_text(pdf_bytes)
     except Exception as e:
         print(f"Error extracting text: {e}")
         return ""
@@ -433,84 +437,27 @@ def parse_policy_endorsements_table_old(text: str) -> pd.DataFrame:
 
 
 
-def parse_policy_endorsements_table_combined(text: str) -> pd.DataFrame:
+def parse_policy_endorsements_table_combined(text: str, layout=None) -> pd.DataFrame:
     """
-    Selects parser based on PDF version detected by header.
-    If the header contains 'POLICY LEVEL COVERAGES', uses the new parser; otherwise uses the old parser.
+    Selects parser based on the layout from the document fingerprint:
+    'policy_level_coverages' uses the new parser, 'policy_level_endorsements' the old one.
+    The other parser only runs when the chosen one finds no rows.
+    Without a layout it is detected from the header, as before.
     """
-    upper_text = text.upper()
-    if "POLICY LEVEL COVERAGES" in upper_text:
-        df = parse_policy_endorsements_table(text)
+    if layout is None:
+        layout = "policy_level_coverages" if "POLICY LEVEL COVERAGES" in text.upper() else "policy_level_endorsements"
+    if layout == "policy_level_coverages":
+        parsers = (parse_policy_endorsements_table, parse_policy_endorsements_table_old)
     else:
-        df = parse_policy_endorsements_table_old(text)
+        parsers = (parse_policy_endorsements_table_old, parse_policy_endorsements_table)
+    df = parsers[0](text)
+    if df.empty:
+        df = parsers[1](text)
     df = fix_alignment(df)
     return df
 
-
 def parse_policy_forms(text: str) -> dict:
-    coverage_titles = [
-        "Commercial Property Coverage Part",
-        "Commercial Property Forms"
-    ]
-    start_index = text.find("SCHEDULE OF FORMS AND ENDORSEMENTS")
-    if start_index == -1:
-        return {}
-    relevant_lines = text[start_index:].splitlines()
-    sections = {}
-    current_title = None
-    i = 0
-    while i < len(relevant_lines):
-        line = relevant_lines[i].strip()
-        if line in coverage_titles:
-            current_title = line
-            sections[current_title] = []
-            i += 1
-            if i < len(relevant_lines):
-                possible_header_line = relevant_lines[i].lower().strip()
-                if ("number" in possible_header_line and
-                    "edition" in possible_header_line and
-                    "description" in possible_header_line):
-                    i += 1
-            continue
-        if current_title:
-            if line.startswith("Commercial ") and (line not in coverage_titles):
-                current_title = None
-                i -= 1
-            else:
-                row = parse_line_into_columns(line)
-                number, edition, description = row
-                if not edition:
-                    if sections[current_title]:
-                        sections[current_title][-1][2] += " " + " ".join(
-                            part for part in [number, description] if part
-                        )
-                        sections[current_title][-1][2] = sections[current_title][-1][2].strip()
-                    else:
-                        sections[current_title].append(["", "", number + " " + description])
-                else:
-                    sections[current_title].append(row)
-        i += 1
-    return sections
-
-def parse_line_into_columns(line: str) -> list:
-    tokens = line.split()
-    number_parts = []
-    edition = ""
-    description_parts = []
-    edition_pattern = re.compile(r"^\d{2}-\d{4}$")
-    found_edition = False
-    for token in tokens:
-        if not found_edition and edition_pattern.match(token):
-            edition = token
-            found_edition = True
-        else:
-            if not found_edition:
-                number_parts.append(token)
-            else:
-                description_parts.append(token)
-    number = " ".join(number_parts).strip()
-    description = " ".join(description_parts).strip()
-    return [number, edition, description]
+    return parse_policy_forms_for_lob(text, "Property")
 
 ############################################
 # 14) HELPER: Make a DataFrame's HTML cells editable
@@ -523,23 +470,25 @@ def make_table_cells_editable(html_str: str) -> str:
 ##############################################################
 #  parse_property_pdf(pdf_bytes) - unified extraction
 ##############################################################
-def parse_property_pdf(pdf_bytes):
+def extract_page_texts(pdf_bytes) -> list:
+    """
+    Open the PDF once from memory and return the plain text of every page,
+    read with the backend configured for Property.
+    """
+    return TextBackends.page_texts(pdf_bytes, TextBackends.backend_for("Property"))
+
+def parse_property_pdf(pdf_bytes, page_texts=None, forms_sections=None, fingerprint=None):
     """
     Reads the PDF in memory, extracts all Property data,
     and returns the DataFrames as a dictionary.
-    This is the same logic that was in your standalone main().
+    Nothing is written to disk, so concurrent calls are safe.
+    Pass page_texts to reuse a document that was already parsed,
+    forms_sections when the forms schedule was already parsed, and the
+    PdfProbe fingerprint to skip layout detection.
     """
-    import pdfplumber
-
-    temp_pdf_path = "temp_forced_4cols.pdf"
-    with open(temp_pdf_path, "wb") as f:
-        f.write(pdf_bytes)
-
-    with pdfplumber.open(temp_pdf_path) as pdf:
-        full_text = ""
-        for page in pdf.pages:
-            txt = page.extract_text() or ""
-            full_text += txt + "\n"
+    if page_texts is None:
+        page_texts = extract_page_texts(pdf_bytes)
+    full_text = "".join(txt + "\n" for txt in page_texts)
 
     # 1) PROPERTY COVERAGES
     proposal_index = 0
@@ -806,18 +755,16 @@ def parse_property_pdf(pdf_bytes):
     # 4) POLICY LEVEL ENDORSEMENTS
     df_endorsements = pd.DataFrame()
     endorsements_page = None
-    with pdfplumber.open(temp_pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            txt = page.extract_text() or ""
-            if "POLICY LEVEL ENDORSEMENTS" in txt.upper() or "POLICY LEVEL COVERAGES" in txt.upper():
-                endorsements_page = i
-                break
+    for i, txt in enumerate(page_texts, start=1):
+        if "POLICY LEVEL ENDORSEMENTS" in txt.upper() or "POLICY LEVEL COVERAGES" in txt.upper():
+            endorsements_page = i
+            break
     if endorsements_page is not None:
-        with pdfplumber.open(temp_pdf_path) as pdf:
-            endorsements_text = ""
-            for i in range(endorsements_page - 1, min(endorsements_page - 1 + 2, len(pdf.pages))):
-                endorsements_text += pdf.pages[i].extract_text() + "\n"
-        tmp_end = parse_policy_endorsements_table_combined(endorsements_text)
+        endorsements_text = "".join(
+            txt + "\n" for txt in page_texts[endorsements_page - 1:endorsements_page + 1]
+        )
+        layout = (fingerprint or {}).get("layouts", {}).get("property_endorsements")
+        tmp_end = parse_policy_endorsements_table_combined(endorsements_text, layout)
         if not tmp_end.empty:
             for col in ["Deductible", "Limit", "Premium"]:
                 tmp_end[col] = tmp_end[col].apply(format_currency)
@@ -825,20 +772,15 @@ def parse_property_pdf(pdf_bytes):
 
     # 5) OTHER COVERAGES
     df_other = pd.DataFrame()
-    with pdfplumber.open(temp_pdf_path) as pdf:
-        # same approach as parse_other_coverages_pdfplumber
-        df_tmp = parse_other_coverages_pdfplumber(temp_pdf_path)
-        if not df_tmp.empty:
-            for col in ["Limit", "Premium"]:
-                df_tmp[col] = df_tmp[col].apply(format_currency)
-            df_other = df_tmp
+    df_tmp = parse_other_coverages_from_pages(page_texts)
+    if not df_tmp.empty:
+        for col in ["Limit", "Premium"]:
+            df_tmp[col] = df_tmp[col].apply(format_currency)
+        df_other = df_tmp
 
     # 6) POLICY FORMS
-    forms_sections = parse_policy_forms(full_text)
-
-    # Clean up
-    if os.path.exists(temp_pdf_path):
-        os.remove(temp_pdf_path)
+    if forms_sections is None:
+        forms_sections = parse_policy_forms(full_text)
 
     # Return all data as a dictionary
     return {
@@ -0,0 +1,2078 @@
+import os
+import tempfile
+import threading
+
+import streamlit as st
+
+import Profiling
+
+############################################
+# Proposal pipeline shared by the page, batch mode and the job service
+############################################
+# Everything between the uploaded packets and the finished Word document:
+# the section extractors and their deadlines, the formatting and Word
+# helpers and generate_proposal(). It is imported once per process, so
+# NoTables.py, BatchProposals and ProposalService run the same code
+# without executing the Streamlit page script. Streamlit display calls
+# made off the script thread (batch and service runs) do nothing.
+
+# Underwriter templates; "" is the generic template
+UNDERWRITERS = ["", "Brandy Medders", "Brandy Medders Tower", "Linda Callahan", "Latosha Hope", "Joshua Crawford"]
+
+import io
+import pandas as pd
+import docx
+from io import BytesIO
+
+# PDF stamping helper imports
+
+
+from io import BytesIO
+
+import re
+from PIL import ImageDraw, ImageFont
+from io import BytesIO
+
+import datetime
+
+# docx imports for styling, orientation, repeated headers, etc.
+from docx.oxml import parse_xml, OxmlElement
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import RGBColor, Pt, Inches
+from docx.enum.section import WD_ORIENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.enum.text import WD_BREAK  # required for page break insertion
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+import Policy
+
+# --- Coverage mapping patch: include Employment Practices & Cyber ---
+_orig_cov_in_list = Policy.coverage_in_list
+def coverage_in_list_patched(cov_list, ctype):
+    # Use original logic first
+    if _orig_cov_in_list(cov_list, ctype):
+        return True
+    ctype_u = ctype.upper()
+    # Map Employment Practices
+    if ctype_u == "EMPLOYMENT PRACTICES":
+        return any("Employment-Related Practices Liability Insurance" in cov for cov in cov_list)
+    # Map Cyber
+    if ctype_u == "CYBER":
+        return any("Cyber Coverage Insurance" in cov for cov in cov_list)
+    return False
+Policy.coverage_in_list = coverage_in_list_patched
+
+import Property
+import GL  # Ensure GL.py is in your project folder
+import Auto  # Ensure Auto.py is in your project folder
+import Umbrella  # Import the Umbrella module
+import PolicyForms
+import PdfProbe
+import Telemetry
+import Deadlines
+import JobQueue
+import PageStream
+import ProposalResult
+import BookOfBusiness
+import Preview
+
+# Try to import Employment module with correct case.
+try:
+    import Employment
+except ImportError as e:
+    st.warning("Employment module not found. Employment section will be skipped. Error: " + str(e))
+    Employment = None
+
+# Try to import inlandmarine module (note: file is named in lowercase).
+try:
+    import inlandmarine as InlandMarine
+except ImportError as e:
+    st.error("Could not import inlandmarine module. Ensure inlandmarine.py is in the same folder. Error: " + str(e))
+    InlandMarine = None
+
+# Import Workers Compensation module (WC.py)
+try:
+    import WC
+except ImportError as e:
+    st.error("Workers Compensation (WC) module not found. WC section will be skipped. Error: " + str(e))
+    WC = None
+
+# Section extractors run in a worker process under a per-section deadline.
+# On timeout the section is skipped and the call returns the empty value below.
+Deadlines.isolate(Policy, "Policy Information", {
+    "extract_policy_information": dict,
+    "extract_coverages": lambda: ([], []),
+})
+Deadlines.isolate(Property, "Property", {"parse_property_pdf": dict})
+Deadlines.isolate(GL, "General Liability", {
+    "load_gl_document": None,
+    "extract_general_liability_info": lambda: (pd.DataFrame(), []),
+    "extract_limits_of_insurance": lambda: (pd.DataFrame(), []),
+    "extract_locations": lambda: (pd.DataFrame(), []),
+    "extract_classification_premium_by_location": dict,
+    "extract_additional_coverages": lambda: (pd.DataFrame(), []),
+})
+Deadlines.isolate(Employment, "Employment", {"extract_erp_quote_proposal": dict})
+Deadlines.isolate(Auto, "Auto", {
+    "extract_loss_payees": list,
+    "extract_table1_pypdf": list,
+    "extract_table2_pymupdf": list,
+    "extract_table3_camelot": pd.DataFrame,
+    "extract_premium_pdfplumber_for_table4": dict,
+    "extract_deductibles_pypdf": dict,
+    "extract_cost_of_hire_used_pdfplumber": pd.DataFrame,
+    "extract_cost_of_hire_not_used_pdfplumber": pd.DataFrame,
+    "extract_non_ownership_liability_pymupdf": pd.DataFrame,
+    "extract_additional_coverages_pymupdf": pd.DataFrame,
+    "extract_vehicle_coverages_pymupdf": pd.DataFrame,
+    "extract_location_coverages_pymupdf": pd.DataFrame,
+})
+Deadlines.isolate(InlandMarine, "Inland Marine", {
+    "load_inland_marine_document": None,
+    "extract_with_pdfplumber": lambda: (pd.DataFrame(), ""),
+})
+Deadlines.isolate(Umbrella, "Umbrella", {"extract_umbrella_data": dict})
+Deadlines.isolate(WC, "Workers Compensation", {
+    "get_pdf_text": str,
+    "get_pdf_lines": list,
+    "extract_table_3_pdfplumber": list,
+})
+
+# Every extractor reports as a stage while a profiled run is active. For
+# isolated extractors the stage's CPU time and memory peak are measured in
+# the worker that ran the call and sent back with its result.
+Profiling.instrument_module(PdfProbe, names=("probe_pdf",))
+Profiling.instrument_module(PolicyForms, names=("extract_forms_text", "parse_all_policy_forms"))
+Profiling.instrument_module(Policy, prefixes=("extract_",))
+Profiling.instrument_module(Property, names=("parse_property_pdf",))
+Profiling.instrument_module(GL, names=("load_gl_document",), prefixes=("extract_",))
+Profiling.instrument_module(Auto, prefixes=("extract_",))
+Profiling.instrument_module(Umbrella, names=("extract_umbrella_data",))
+Profiling.instrument_module(Employment, names=("extract_erp_quote_proposal",))
+Profiling.instrument_module(InlandMarine, names=("load_inland_marine_document", "process_excel_file"),
+                            prefixes=("extract_",))
+Profiling.instrument_module(WC, names=("parse_policy_forms",), prefixes=("extract_", "get_pdf_"))
+
+# Extractor debug output (st.subheader/st.markdown/st.write) is dropped on
+# the thread running generate_proposal(quiet=True). The extractors get a
+# stand-in for streamlit rather than streamlit itself being patched, so
+# other sessions and the page's own previews keep their output.
+_quiet = threading.local()
+
+def _drop(*args, **kwargs):
+    return None
+
+class _QuietStreamlit:
+    """streamlit for the extractor modules, minus the quiet calls on a quiet thread."""
+    QUIET = ("subheader", "markdown", "write")
+
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        if name in self.QUIET and getattr(_quiet, "on", False):
+            return _drop
+        return getattr(self._module, name)
+
+for _module in (Policy, GL, Auto, Umbrella, Employment, InlandMarine, WC):
+    if _module is not None and getattr(_module, "st", None) is st:
+        _module.st = _QuietStreamlit(st)
+
+# ------------------------------------------------------------------------
+# Workers Compensation detector based on Policy/Quote prefix
+# ------------------------------------------------------------------------
+import io as _io
+
+def _extract_text_first_pages(pdf_bytes: bytes, max_pages: int = 4) -> str:
+    """Extract text quickly from first pages."""
+    try:
+        import pdfplumber
+        with pdfplumber.open(_io.BytesIO(pdf_bytes)) as pdf:
+            return "\n".join(p.extract_text() or "" for p in pdf.pages[:max_pages])
+    except Exception:
+        pass
+    try:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(_io.BytesIO(pdf_bytes))
+        return "\n".join(page.extract_text() or "" for page in reader.pages[:max_pages])
+    except Exception:
+        pass
+    try:
+        return pdf_bytes.decode('latin1', errors='ignore')
+    except Exception:
+        return ""
+
+def _is_wc_pdf_bytes(pdf_bytes: bytes) -> bool:
+    """Return True if PDF is Workers Comp based on prefix or key text.
+    Slow fallback for PDFs PyMuPDF cannot open; see PdfProbe.probe_pdf."""
+    return PdfProbe.is_wc_text(_extract_text_first_pages(pdf_bytes))
+# ------------------------------------------------------------------------
+
+
+from Property import (
+    extract_text_between,
+    parse_property_coverages,
+    parse_policy_endorsements_table,
+    fix_alignment,
+    format_currency,
+    parse_other_coverages_pdfplumber,
+    parse_policy_forms,
+    parse_property_pdf
+)
+
+######################################
+# HELPER FUNCTIONS FOR EXCEL FORMAT
+######################################
+def currency_fmt(x):
+    if x is None or x == '':
+        return ''
+    try:
+        val = float(str(x).replace('$', '').replace(',', ''))
+        return f"${val:,.2f}"
+    except:
+        return str(x)
+
+def co_insurance_fmt(x):
+    if x is None or x == '':
+        return ''
+    try:
+        val = float(str(x).replace('%', ''))
+        if val <= 1:
+            val = val * 100
+        return f"{val:.0f}%"
+    except:
+        return str(x)
+
+def format_inlandmarine_excel_table(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy(deep=True).fillna('')
+    for col in df.columns:
+        col_lower = col.lower().replace('-', '').replace(' ', '')
+        if col_lower in ['limit', 'deductible', 'premium']:
+            df[col] = InlandMarine.currency_series(df[col])
+        elif 'coinsurance' in col_lower:
+            df[col] = InlandMarine.co_insurance_series(df[col], fractions_only=True)
+    return df
+
+######################################
+# HELPER FOR REMOVING COMMAS AND MAKING WHOLE NUMBERS
+######################################
+def remove_commas_make_whole_number(val):
+    """
+    Converts a string like "59,057" to "59057".
+    """
+    if not isinstance(val, str):
+        return val
+    try:
+        f = float(val.replace(',', ''))
+        return str(int(f))
+    except:
+        return val
+
+######################################
+# HELPER FUNCTION: format_auto_classification_premium_table
+######################################
+def format_auto_classification_premium_table(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy(deep=True)
+    # Process "State" column: convert full state name to abbreviation.
+    state_map = {
+        "Texas": "TX",
+        "Arkansas": "AR",
+        "California": "CA",
+    }
+    if "State" in df.columns:
+        df["State"] = df["State"].apply(lambda x: state_map.get(x.strip(), x.strip()) if isinstance(x, str) else x)
+    
+    # Process "Location" column: extract only the 3-digit number.
+    if "Location" in df.columns:
+        def extract_loc(val):
+            if not isinstance(val, str):
+                return val
+            match = re.search(r'(\d{3})', val)
+            return match.group(1) if match else val
+        df["Location"] = df["Location"].apply(extract_loc)
+    
+    # Process "Classification" column: trim to the first two words and rename to "Class".
+    if "Classification" in df.columns:
+        def clean_class(val):
+            if not isinstance(val, str):
+                return val
+            if "–" in val:
+                part = val.split("–")[0].strip()
+            elif "-" in val:
+                part = val.split("-")[0].strip()
+            else:
+                part = val.strip()
+            words = part.split()
+            return " ".join(words[:2])
+        df["Classification"] = df["Classification"].apply(clean_class)
+    
+    # For "Code No." and "Premium Basis", remove commas and force whole number conversion.
+    if "Code No." in df.columns:
+        df["Code No."] = df["Code No."].apply(remove_commas_make_whole_number)
+    if "Premium Basis" in df.columns:
+        df["Premium Basis"] = df["Premium Basis"].apply(remove_commas_make_whole_number)
+    
+    # Process "Basis Type" column: keep only the last word.
+    if "Basis Type" in df.columns:
+        def last_word(val):
+            if not isinstance(val, str):
+                return val
+            parts = val.split()
+            return parts[-1] if parts else val
+        df["Basis Type"] = df["Basis Type"].apply(last_word)
+    
+    # Drop "Other" column if it exists.
+    if "Other" in df.columns:
+        df = df.drop(columns=["Other"])
+    
+    # Rename columns as specified.
+    rename_map = {
+        "State": "ST",
+        "Location": "Loc",
+        "Classification": "Class",
+        "Premium Basis": "Prem Basis",
+        "Prod/Comp Ops Premium": "Prod/Comp Ops Prem",
+        "Premises / Ops Deductible": "Prem / Ops Ded",
+        "Prod/Comp Ops Deductible": "Prod/Comp Ops Ded"
+    }
+    df = df.rename(columns=rename_map)
+    
+    return df
+
+###########################################
+# HELPER FUNCTION TO FORMAT CELL VALUES
+###########################################
+def format_cell_value(val):
+    text = str(val)
+    if re.fullmatch(r'\d{1,3}(,\d{3})*', text):
+        return text.replace(',', '')
+    return text
+
+###########################################
+# UPDATED format_premium TO INCLUDE COMMA SEPARATORS
+###########################################
+def format_premium(value):
+    try:
+        val = float(str(value).replace("$", "").replace(",", ""))
+        if val.is_integer():
+            return f"${int(val):,}"
+        else:
+            return f"${val:,.2f}"
+    except:
+        return str(value)
+
+###############################################
+# HELPER FUNCTIONS FOR WORD EXPORT
+###############################################
+def set_repeat_table_header(row):
+    tr = row._tr
+    trPr = tr.find(qn('w:trPr'))
+    if trPr is None:
+        trPr = OxmlElement('w:trPr')
+        tr.insert(0, trPr)
+    tblHeader = OxmlElement('w:tblHeader')
+    tblHeader.set(qn('w:val'), "true")
+    trPr.append(tblHeader)
+
+def safe_set_table_style(table, style_name="Table Grid"):
+    try:
+        table.style = style_name
+    except KeyError:
+        table.style = None
+
+def enable_table_autofit(table):
+    """
+    Allow MS Word to auto-fit columns to data width.
+    """
+    tbl = table._tbl
+    tblPr = tbl.find(qn('w:tblPr'))
+    if tblPr is None:
+        tblPr = OxmlElement('w:tblPr')
+        tbl.insert(0, tblPr)
+    tblW = tblPr.find(qn('w:tblW'))
+    if tblW is not None:
+        tblPr.remove(tblW)
+    table.allow_autofit = True
+    table.autofit = True
+    table.alignment = WD_TABLE_ALIGNMENT.CENTER
+
+def set_table_borders_teal_custom(table, color="2D5D77", size="4"):
+    tbl = table._tbl
+    tblBorders = tbl.find(qn('w:tblBorders'))
+    if tblBorders is None:
+        tblBorders = OxmlElement('w:tblBorders')
+        tbl.insert(0, tblBorders)
+    for border in ["top", "left", "bottom", "right", "insideH", "insideV"]:
+        border_el = tblBorders.find(qn("w:" + border))
+        if border_el is None:
+            border_el = OxmlElement("w:" + border)
+            tblBorders.append(border_el)
+        border_el.set(qn("w:val"), "single")
+        border_el.set(qn("w:sz"), size)
+        border_el.set(qn("w:color"), color)
+
+def _find_marker_paragraph(doc, marker_text):
+    for para in doc.paragraphs:
+        if marker_text in para.text:
+            return para
+    return None
+
+def insert_paragraph_after(element, doc, text=""):
+    new_paragraph = doc.add_paragraph(text)
+    body = doc._body._element
+    if isinstance(element, Table):
+        marker = element._tbl
+    elif isinstance(element, Paragraph):
+        marker = element._p
+    else:
+        return new_paragraph
+    children = list(body)
+    try:
+        idx = children.index(marker)
+        body.remove(new_paragraph._element)
+        body.insert(idx+1, new_paragraph._element)
+    except ValueError:
+        pass
+    return new_paragraph
+
+def add_table_title(doc, title, insert_after=None):
+    if insert_after is None:
+        para = doc.add_paragraph(title)
+    else:
+        para = insert_paragraph_after(insert_after, doc, title)
+    para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    for run in para.runs:
+        run.font.bold = True
+        run.font.color.rgb = RGBColor(45, 93, 119)  # Dark teal
+        run.font.size = Pt(12)
+    return para
+
+def set_vertical_text_header(cell, text):
+    cell.text = text
+    tcPr = cell._tc.get_or_add_tcPr()
+    textDirection = OxmlElement('w:textDirection')
+    textDirection.set(qn('w:val'), 'btLr')
+    tcPr.append(textDirection)
+    shading_elm = OxmlElement('w:shd')
+    shading_elm.set(qn('w:val'), 'clear')
+    shading_elm.set(qn('w:color'), 'auto')
+    shading_elm.set(qn('w:fill'), '2D5D77')
+    tcPr.append(shading_elm)
+    for para in cell.paragraphs:
+        para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        for run in para.runs:
+            run.font.bold = True
+            run.font.color.rgb = RGBColor(255, 255, 255)
+
+################################################
+# NEW HELPER: set_table_full_width
+# For the "Covered Entity Schedule by Policy" table only.
+################################################
+def set_table_full_width(table):
+    tbl = table._tbl
+    tblPr = tbl.find(qn('w:tblPr'))
+    if tblPr is None:
+        tblPr = OxmlElement('w:tblPr')
+        tbl.insert(0, tblPr)
+    tblW = tblPr.find(qn('w:tblW'))
+    if tblW is None:
+        tblW = OxmlElement('w:tblW')
+        tblPr.append(tblW)
+    # Set preferred width to 100% using a percentage value.
+    tblW.set(qn('w:w'), "10000")  # 10000 is used to denote 100%
+    tblW.set(qn('w:type'), "pct")
+    # Turn off auto-fit so that the table stretches.
+    table.autofit = False
+
+################################################
+# MAIN TABLE-BUILDING FUNCTION
+# (We now remove forced widths so that tables auto-fit content,
+# except when explicitly adjusted afterwards.)
+################################################
+def add_teal_table(doc, heading_text, df, insert_after=None, apply_custom_widths=True):
+    if df.empty:
+        return None
+    if heading_text:
+        title_para = add_table_title(doc, heading_text, insert_after)
+    else:
+        title_para = insert_paragraph_after(insert_after, doc, "")
+    
+    table = doc.add_table(rows=1, cols=len(df.columns))
+    safe_set_table_style(table, "Table Grid")
+    # For regular tables, auto-fit columns to the content:
+    enable_table_autofit(table)
+    set_repeat_table_header(table.rows[0])
+    
+    hdr_cells = table.rows[0].cells
+    for i, col_name in enumerate(df.columns):
+        if heading_text == "Covered Entity Schedule by Policy" and i > 0:
+            set_vertical_text_header(hdr_cells[i], col_name)
+        else:
+            hdr_cells[i].text = col_name
+            shading_elm = parse_xml(r'<w:shd {} w:fill="2D5D77"/>'.format(nsdecls('w')))
+            hdr_cells[i]._tc.get_or_add_tcPr().append(shading_elm)
+            for para in hdr_cells[i].paragraphs:
+                for run in para.runs:
+                    run.font.color.rgb = RGBColor(255, 255, 255)
+                    run.font.bold = True
+    
+    # Add row data
+    for _, row_data in df.iterrows():
+        row_cells = table.add_row().cells
+        for j, val in enumerate(row_data):
+            row_cells[j].text = format_cell_value(val)
+    
+    if insert_after is not None:
+        title_para._p.addnext(table._element)
+    
+    set_table_borders_teal_custom(table)
+    empty_para = insert_paragraph_after(table, doc, "")
+    
+    # We remove forced widths so that table columns auto-fit.
+    return empty_para
+
+################################################
+# ADVANCED PLACEHOLDER REPLACEMENT (9 pt)
+################################################
+def replace_placeholders_9pt_in_paragraph(paragraph, replacements):
+    runs_info = []
+    for run in paragraph.runs:
+        runs_info.append({
+            'text': run.text,
+            'font_name': run.font.name,
+            'font_size': run.font.size,
+            'bold': run.bold,
+            'italic': run.italic
+        })
+    full_text = "".join(r['text'] for r in runs_info)
+    if not any(ph in full_text for ph in replacements):
+        return
+    new_runs = []
+    i = 0
+    buffer = ""
+    while i < len(full_text):
+        found = False
+        for ph, replacement in replacements.items():
+            if full_text[i:].startswith(ph):
+                if buffer:
+                    new_runs.append(("normal", buffer))
+                    buffer = ""
+                new_runs.append(("placeholder", replacement))
+                i += len(ph)
+                found = True
+                break
+        if not found:
+            buffer += full_text[i]
+            i += 1
+    if buffer:
+        new_runs.append(("normal", buffer))
+    
+    while paragraph.runs:
+        paragraph.runs[0].text = ""
+        paragraph._p.remove(paragraph.runs[0]._r)
+    
+    normal_font_name = runs_info[0]['font_name']
+    normal_font_size = runs_info[0]['font_size']
+    normal_bold = runs_info[0]['bold']
+    normal_italic = runs_info[0]['italic']
+    
+    for runtype, textval in new_runs:
+        new_run = paragraph.add_run(textval)
+        if runtype == "placeholder":
+            new_run.font.size = Pt(9)
+        else:
+            if normal_font_name:
+                new_run.font.name = normal_font_name
+            if normal_font_size:
+                new_run.font.size = normal_font_size
+            new_run.bold = normal_bold
+            new_run.italic = normal_italic
+
+def replace_placeholders_9pt_in_textboxes(doc, replacements):
+    ns = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+    txbx_list = doc._element.findall('.//w:txbxContent', ns)
+    for txbx in txbx_list:
+        p_elems = txbx.findall('.//w:p', ns)
+        for p_elem in p_elems:
+            paragraph = Paragraph(p_elem, doc)
+            replace_placeholders_9pt_in_paragraph(paragraph, replacements)
+
+def replace_placeholders_in_entire_doc(doc, placeholders):
+    for paragraph in doc.paragraphs:
+        for run in paragraph.runs:
+            for ph, val in placeholders.items():
+                if ph in run.text:
+                    run.text = run.text.replace(ph, val)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    for run in paragraph.runs:
+                        for ph, val in placeholders.items():
+                            if ph in run.text:
+                                run.text = run.text.replace(ph, val)
+    ns = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+    txbx_list = doc._element.findall('.//w:txbxContent', ns)
+    for txbx in txbx_list:
+        for t in txbx.findall('.//w:t', ns):
+            for ph, val in placeholders.items():
+                if ph in t.text:
+                    t.text = t.text.replace(ph, val)
+
+def replace_placeholders_selectively(doc, placeholders):
+    for paragraph in doc.paragraphs:
+        if "<Terrorism Premium>" in paragraph.text:
+            for run in paragraph.runs:
+                for ph, value in placeholders.items():
+                    if ph in run.text:
+                        run.text = run.text.replace(ph, value)
+        else:
+            replace_placeholders_9pt_in_paragraph(paragraph, placeholders)
+    replace_placeholders_9pt_in_textboxes(doc, placeholders)
+
+def replace_markers(doc, replacements):
+    for para in doc.paragraphs:
+        for marker, value in replacements.items():
+            if marker in para.text:
+                para.text = para.text.replace(marker, value)
+
+def replace_markers_in_textboxes(doc, replacements):
+    ns = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+    txbx_list = doc._element.findall('.//w:txbxContent', ns)
+    for txbx in txbx_list:
+        for t in txbx.findall('.//w:t', ns):
+            for marker, value in replacements.items():
+                if marker in t.text:
+                    t.text = t.text.replace(marker, value)
+
+def is_forms_sections_nonempty(forms_sections):
+    # If forms_sections is a DataFrame, check if it's empty.
+    if isinstance(forms_sections, pd.DataFrame):
+        return not forms_sections.empty
+    # If it's not truthy (e.g., an empty dict or list), return False.
+    if not forms_sections:
+        return False
+    # Otherwise, assume it's a dictionary and iterate over its items.
+    for _, rows in forms_sections.items():
+        if rows:
+            return True
+    return False
+
+# Word-building steps report as stages while a profiled run is active
+add_teal_table = Profiling.profiled(add_teal_table, "Word: add_teal_table")
+replace_placeholders_selectively = Profiling.profiled(
+    replace_placeholders_selectively, "Word: replace_placeholders_selectively"
+)
+replace_placeholders_in_entire_doc = Profiling.profiled(
+    replace_placeholders_in_entire_doc, "Word: replace_placeholders_in_entire_doc"
+)
+replace_markers_in_textboxes = Profiling.profiled(
+    replace_markers_in_textboxes, "Word: replace_markers_in_textboxes"
+)
+
+
+####################################
+# PROPOSAL PIPELINE
+####################################
+def generate_proposal(main_pdf_bytes=None, wc_pdf_bytes=None, excel_file=None,
+                       main_probe=None, underwriter="", update_progress=None, quiet=True):
+    """
+    Extract every section of the uploaded packets and build the Word proposal.
+    Needs no Streamlit session: outside one the display calls do nothing.
+    With quiet, the extractor modules' st.subheader/st.markdown/st.write
+    output is dropped for this thread only (see _QuietStreamlit).
+    Returns (word_io, shape, result): shape holds the detected LOBs and the
+    vehicle, location and state counts, result is the ProposalResult with
+    every extracted table.
+    """
+    previous = getattr(_quiet, "on", False)
+    _quiet.on = quiet
+    try:
+        return _build_proposal(main_pdf_bytes, wc_pdf_bytes, excel_file, main_probe, underwriter, update_progress)
+    finally:
+        _quiet.on = previous
+        # The PDFs spilled for the section workers
+        Deadlines.release_documents()
+
+def _build_proposal(main_pdf_bytes, wc_pdf_bytes, excel_file, main_probe, underwriter, update_progress):
+    if update_progress is None:
+        update_progress = lambda current_step: None
+    if main_probe is None and main_pdf_bytes is not None:
+        try:
+            main_probe = PdfProbe.probe_pdf(main_pdf_bytes)
+        except Exception:
+            main_probe = None
+    texas_found = False
+    step = 0
+    inland_excel = []
+    result = ProposalResult.ProposalResult(meta={
+        "underwriter": underwriter,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+    })
+
+    processing_main = main_pdf_bytes is not None
+    # Page text already at hand for the extractors: cached pages from PageCache
+    # (when it is on) and, on large packets, a time-boxed parallel read; the
+    # sections parse whatever is left themselves
+    with Profiling.stage("Page text"):
+        main_pdf_bytes = PageStream.prefetch(main_pdf_bytes, main_probe["page_count"] if main_probe else None)
+        wc_pdf_bytes = PageStream.prefetch(wc_pdf_bytes)
+    if main_probe:
+        Profiling.register_document(main_pdf_bytes, main_probe["page_count"])
+    # PyMuPDF text of every main packet page, shared by the section extractors
+    main_raw_pages = main_probe["page_texts"] if main_probe else None
+    # Rating company and layout edition, so sections pick their parser directly
+    main_fingerprint = main_probe.get("fingerprint") if main_probe else None
+
+    # Initialize default DataFrames and variables.
+    df_property_cov = pd.DataFrame()
+    df_blanket = pd.DataFrame()
+    df_main = pd.DataFrame()
+    df_endorsements = pd.DataFrame()
+    df_other = pd.DataFrame()
+    property_forms = {}
+    gl_df = pd.DataFrame()
+    li_df = pd.DataFrame()
+    loc_df = pd.DataFrame()
+    cp_dict = {}
+    ac_df = pd.DataFrame()
+    gl_policy_forms = pd.DataFrame()
+
+    # ---------------------------
+    # Process Workers Compensation (WC) Variables
+    # ---------------------------
+    if wc_pdf_bytes is not None and WC is not None:
+        text_wc = WC.get_pdf_text(wc_pdf_bytes)
+        lines_wc = text_wc.splitlines()
+        workers_comp_rows = WC.extract_workers_comp_table(lines_wc)
+        wc_table3_rows = WC.extract_table_3_pdfplumber(wc_pdf_bytes)
+        all_segments = WC.extract_state_segments(lines_wc)
+        wc_forms_sections = WC.parse_policy_forms(text_wc)
+        last_segment = None
+        for seg in all_segments:
+            state_name = "Unknown State"
+            for i, txt in enumerate(seg):
+                if "SCHEDULE OF OPERATIONS" in txt.upper() and (i+1) < len(seg):
+                    candidate = seg[i+1].strip()
+                    if candidate.upper() in ["EST ANNUAL"]:
+                        continue
+                    if candidate and "QUOTE NO" not in candidate.upper():
+                        state_name = candidate
+                        break
+            if state_name != "Unknown State":
+                last_segment = (seg, state_name)
+        try:
+            wc_pdfminer_lines = WC.get_pdf_lines(wc_pdf_bytes)
+            wc_policy_info_dict = WC.extract_policy_information(wc_pdfminer_lines)
+            wc_pol_data = [
+                ("Date", wc_policy_info_dict["Date"]),
+                ("Rating Company", wc_policy_info_dict.get("Rating Company", "")),
+                ("Quote No.", wc_policy_info_dict["Quote No."]),
+                ("Policy No.", wc_policy_info_dict["Policy No."]),
+                ("NCCI Carrier Code No.", wc_policy_info_dict["NCCI Carrier Code No."]),
+                ("FEIN", wc_policy_info_dict["FEIN"]),
+                ("Risk ID No.", wc_policy_info_dict["Risk ID No."]),
+                ("Bureau File No.", wc_policy_info_dict["Bureau File No."]),
+                ("Entity of Insured", wc_policy_info_dict["Entity of Insured"]),
+                ("Proposed Policy Period", wc_policy_info_dict["Proposed Policy Period"]),
+                ("Named Insured", wc_policy_info_dict["Named Insured"]),
+                ("DBA", wc_policy_info_dict["DBA"]),
+                ("Insured Address", wc_policy_info_dict["Insured Address"]),
+                ("Insured City, State & Zip", wc_policy_info_dict["Insured City, State & Zip"]),
+                ("Agent Name", wc_policy_info_dict["Agent Name"]),
+                ("Agent Phone", wc_policy_info_dict["Agent Phone"]),
+                ("Agent Address", wc_policy_info_dict["Agent Address"]),
+                ("Agent City, State & Zip", wc_policy_info_dict["Agent City, State & Zip"])
+            ]
+            df_wc_policy_info = pd.DataFrame(wc_pol_data, columns=["Field", "Value"])
+        except Exception as e:
+            df_wc_policy_info = pd.DataFrame()
+    else:
+        workers_comp_rows = None
+        wc_table3_rows = None
+        all_segments = None
+        last_segment = None
+        wc_forms_sections = None
+        df_wc_policy_info = pd.DataFrame()
+
+    # ---------------------------
+    # Process Main Policy PDF (UI Display)
+    # ---------------------------
+    main_forms = {}
+    if processing_main:
+        Preview.begin("Policy Information")
+        file_bytes = main_pdf_bytes
+        # Scan the forms schedule once for every line of business
+        main_forms = PolicyForms.parse_all_policy_forms(
+            PolicyForms.extract_forms_text(file_bytes, raw_pages=main_raw_pages)
+        )
+        policy_info = Policy.extract_policy_information(file_bytes)
+        policy_cov_list, policy_premiums = Policy.extract_coverages(file_bytes)
+        df_policy = pd.DataFrame([
+            ("Date", policy_info["Date"]),
+            ("Rating Company", policy_info.get("Rating Company", "")),
+            ("Quote No.", policy_info["Quote No."]),
+            ("Policy No.", policy_info["Policy No."]),
+            ("Proposed Policy Period", policy_info["Proposed Policy Period"]),
+            ("Named Insured", policy_info["Named Insured"]),
+            ("DBA", policy_info["DBA"]),
+            ("Insured Address", policy_info["Insured Address"]),
+            ("Insured City, State & Zip", policy_info["Insured City, State & Zip"]),
+            ("Agent Name", policy_info["Agent Name"]),
+            ("Agent Phone", policy_info["Agent Phone"]),
+            ("Agent Address", policy_info["Agent Address"]),
+            ("Agent City, State & Zip", policy_info["Agent City, State & Zip"])
+        ], columns=["Field", "Value"])
+        df_policy_cov = pd.DataFrame(list(zip(policy_cov_list, policy_premiums)), columns=["Coverage", "Premium"])
+        result.add_fields("Policy Information", policy_info)
+        result.add_table("Policy Information", "Coverages", df_policy_cov)
+        
+        coverage_types = [
+            "PROPERTY", "INLAND MARINE", "GENERAL LIABILITY", "COMMERCIAL AUTO",
+            "WORKERS COMPENSATION", "UMBRELLA", "CYBER", "DIRECTORS & OFFICERS",
+            "EMPLOYMENT PRACTICES", "CRIME", "FIDUCIARY LIABILITY"
+        ]
+        entity_name = policy_info["Named Insured"] or ""
+        coverage_values = []
+        for ctype in coverage_types:
+            c_u = ctype.upper()
+            if c_u == "CYBER":
+                has_cyber = not gl_df.empty and gl_df.iloc[:, 0].str.contains("Cyber Coverage Insurance", case=False).any()
+                coverage_values.append("✔" if has_cyber else "X")
+            elif c_u == "EMPLOYMENT PRACTICES":
+                has_emp = any("Employment-Related Practices Liability Insurance" in cov for cov in policy_cov_list)
+                coverage_values.append("✔" if has_emp else "X")
+            else:
+                coverage_values.append("✔" if Policy.coverage_in_list(policy_cov_list, ctype) else "X")
+        step += 1; update_progress(step)
+        html_entity = f"""
+        <table>
+          <thead>
+            <tr>
+              <th contenteditable="true">COVERED ENTITY</th>
+              {''.join(f'<th class="vertical-header" contenteditable="true">{ctype}</th>' for ctype in coverage_types)}
+            </tr>
+          </thead>
+          <tbody>
+            <tr>
+              <td contenteditable="true">{entity_name}</td>
+              {''.join(f'<td contenteditable="true">{val}</td>' for val in coverage_values)}
+            </tr>
+          </tbody>
+        </table>
+        """
+        with Preview.section("Policy Information") as view:
+            view.subheader("Policy Information")
+            view.table(df_policy)
+            view.subheader("Policy Coverages")
+            view.table(df_policy_cov)
+            view.subheader("Covered Entity Schedule by Policy")
+            view.html(html_entity)
+        
+        # --- Property Section (UI Display) ---
+        Preview.begin("Property")
+        property_data = Property.parse_property_pdf(
+            file_bytes, forms_sections=main_forms["Property"], fingerprint=main_fingerprint
+        )
+        df_property_cov = property_data.get("df_cov", pd.DataFrame())
+        df_blanket = property_data.get("df_blanket", pd.DataFrame())
+        df_main = property_data.get("df_main", pd.DataFrame())
+        df_endorsements = property_data.get("df_endorsements", pd.DataFrame())
+        df_other = property_data.get("df_other", pd.DataFrame())
+        forms_sections = property_data.get("forms_sections", {})
+        for name, df in (("Coverages", df_property_cov), ("Blanket Coverages", df_blanket),
+                         ("Location Coverages", df_main), ("Policy Level Endorsements", df_endorsements),
+                         ("Other Coverages", df_other)):
+            result.add_table("Property", name, df)
+        result.add_forms("Property", forms_sections)
+        with Preview.section("Property") as view:
+            view.subheader("Property Coverages")
+            if not df_property_cov.empty:
+                view.table(df_property_cov)
+            if not df_blanket.empty:
+                view.subheader("Blanket Coverages")
+                view.table(df_blanket)
+            if not df_main.empty:
+                view.subheader("Location Coverages")
+                view.table(df_main)
+            if not df_endorsements.empty:
+                view.subheader("Policy Level Endorsements")
+                view.table(df_endorsements)
+            if not df_other.empty:
+                view.subheader("Other Coverages")
+                view.table(df_other)
+            if forms_sections and view.enabled:
+                view.subheader("Policy Forms")
+                for title, rows in forms_sections.items():
+                    if rows:
+                        view.subheader(title)
+                        view.table(pd.DataFrame(rows, columns=["Number", "Edition", "Description"]))
+        property_forms = forms_sections.copy()
+        
+        # --- General Liability Section (UI Display) ---
+        Preview.begin("General Liability")
+        gl_doc = GL.load_gl_document(file_bytes, include_forms=False, raw_pages=main_raw_pages)
+        gl_df, _ = GL.extract_general_liability_info(gl_doc)
+        li_df, _ = GL.extract_limits_of_insurance(gl_doc)
+        loc_df, _ = GL.extract_locations(gl_doc)
+        cp_dict = GL.extract_classification_premium_by_location(gl_doc)
+        ac_df, _ = GL.extract_additional_coverages(gl_doc)
+        gl_forms_sections = main_forms["General Liability"]
+        for name, df in (("Coverages", gl_df), ("Limits of Insurance", li_df),
+                         ("Locations", loc_df), ("Additional Coverages", ac_df)):
+            result.add_table("General Liability", name, df)
+        for key, value in cp_dict.items():
+            if isinstance(value, tuple):
+                result.add_table("General Liability", f"Classification & Premium - {key}", value[0])
+        result.add_forms("General Liability", gl_forms_sections)
+        with Preview.section("General Liability") as view:
+            view.subheader("General Liability Coverages")
+            if not gl_df.empty:
+                view.table(gl_df)
+            if not li_df.empty:
+                view.subheader("Limits of Insurance (GL)")
+                view.table(li_df)
+            if not loc_df.empty:
+                view.subheader("Locations (GL)")
+                view.table(loc_df)
+            if cp_dict and view.enabled:
+                view.subheader("Classification & Premium (GL)")
+                for key, value in cp_dict.items():
+                    if isinstance(value, tuple):
+                        df_cp = value[0].copy()
+                        if "Code No." in df_cp.columns:
+                            df_cp["Code No."] = df_cp["Code No."].apply(lambda x: str(x).replace(',', '').replace('$','').strip())
+                        for col in ["Premises / Ops Deductible", "Prod/Comp Ops Deductible"]:
+                            if col in df_cp.columns:
+                                df_cp[col] = df_cp[col].apply(lambda x: format_premium(x) if x not in ["", None] else "")
+                        df_cp = format_auto_classification_premium_table(df_cp)
+                        if not df_cp.empty:
+                            view.text(f"Classification & Premium - {key}")
+            if not ac_df.empty:
+                view.subheader("Additional Coverages (GL)")
+                view.table(ac_df)
+            if gl_forms_sections:
+                view.subheader("GL Policy Forms")
+                step += 1; update_progress(step)
+                for title, rows in gl_forms_sections.items():
+                    if rows and view.enabled:
+                        view.subheader(title)
+                        view.table(pd.DataFrame(rows, columns=["Number", "Edition", "Description"]))
+        gl_policy_forms = gl_forms_sections.copy()
+        
+        # --- Employment Section (UI Display) ---
+        Preview.begin("Employment")
+        if Employment is not None:
+            try:
+                parsed_employment = Employment.extract_erp_quote_proposal(file_bytes, raw_pages=main_raw_pages)
+                if not any(parsed_employment.values()):
+                    with Preview.section("Employment") as view:
+                        view.subheader("Employment")
+                        view.text("No data found for EMPLOYMENT-RELATED PRACTICES LIABILITY QUOTE PROPOSAL in this PDF.")
+                    df_employment = pd.DataFrame(columns=["Aggregate Limit", "Each Claim Limit", "Deductible", "Retroactive Date", "Estimated Total Premium"])
+                    step += 1; update_progress(step)
+                else:
+                    df_employment = pd.DataFrame([[ 
+                        parsed_employment.get("agg_limit_value", ""),
+                        parsed_employment.get("each_claim_limit_value", ""),
+                        parsed_employment.get("deductible_value", ""),
+                        parsed_employment.get("retro_date", ""),
+                        parsed_employment.get("est_premium", "")
+                    ]], columns=["Aggregate Limit", "Each Claim Limit", "Deductible", "Retroactive Date", "Estimated Total Premium"])
+                    with Preview.section("Employment") as view:
+                        view.subheader("Employment")
+                        view.table(df_employment, editable=False)
+            except Exception as e:
+                st.error(f"Error processing Employment section: {e}")
+                df_employment = pd.DataFrame(columns=["Aggregate Limit", "Each Claim Limit", "Deductible", "Retroactive Date", "Estimated Total Premium"])
+                step += 1; update_progress(step)
+        else:
+            df_employment = pd.DataFrame(columns=["Aggregate Limit", "Each Claim Limit", "Deductible", "Retroactive Date", "Estimated Total Premium"])
+            step += 1; update_progress(step)
+        result.add_table("Employment", "Coverage", df_employment)
+        
+        # --- Auto Section (UI Display) ---
+        # Extract every Auto table first ...
+        Preview.begin("Auto")
+        auto_loss_payees = Auto.extract_loss_payees(file_bytes)
+        df_loss_payees = pd.DataFrame(auto_loss_payees) if auto_loss_payees else pd.DataFrame()
+        
+        auto_table1 = Auto.extract_table1_pypdf(file_bytes)
+        df_auto1 = pd.DataFrame(auto_table1) if auto_table1 else pd.DataFrame()
+        
+        auto_table2 = Auto.extract_table2_pymupdf(file_bytes)
+        df_auto2 = pd.DataFrame(auto_table2) if auto_table2 else pd.DataFrame()
+        
+        df_auto3 = Auto.extract_table3_camelot(
+            file_bytes, raw_pages=main_raw_pages, fingerprint=main_fingerprint
+        )
+        
+        # Build coverage_summary from df_auto3.
+        coverage_summary = df_auto3.copy(deep=True)
+        for col in ["Value", "Territory", "Premium"]:
+            if col in coverage_summary.columns:
+                coverage_summary.drop(columns=col, inplace=True)
+        if "VIN Number" in coverage_summary.columns:
+            ix = coverage_summary.columns.get_loc("VIN Number")
+            coverage_summary.insert(ix+1, "Liability", "")
+        universal_liability = ""
+        for row in auto_table2 or []:
+            coverage_str = row.get("Coverages, Limits & Deductibles", "").lower()
+            if "liability" in coverage_str:
+                universal_liability = row.get("Limits", "")
+                break
+        coverage_summary["Liability"] = universal_liability
+        premium_details = Auto.extract_premium_pdfplumber_for_table4(file_bytes)
+        for col in ["PIP", "Med Pay", "UM", "UIM"]:
+            coverage_summary[col] = ""
+        deductibles = Auto.extract_deductibles_pypdf(file_bytes)
+        coverage_summary["Comp\nDeductible"] = ""
+        coverage_summary["Collision\nDeductible"] = ""
+        for idx, row in coverage_summary.iterrows():
+            veh_no = str(row["Veh No."]).strip()
+            if veh_no in premium_details:
+                details = premium_details[veh_no]
+                coverage_summary.at[idx, "PIP"] = details.get("PIP", "N")
+                coverage_summary.at[idx, "Med Pay"] = details.get("Med Pay", "N")
+                coverage_summary.at[idx, "UM"] = details.get("UM", "N")
+                coverage_summary.at[idx, "UIM"] = details.get("UIM", "N")
+            else:
+                coverage_summary.at[idx, "PIP"] = "N"
+                coverage_summary.at[idx, "Med Pay"] = "N"
+                coverage_summary.at[idx, "UM"] = "N"
+                coverage_summary.at[idx, "UIM"] = "N"
+            if veh_no in deductibles:
+                comp_val = deductibles[veh_no].get("Comp Deductible", "")
+                collision_val = deductibles[veh_no].get("Collision Deductible", "")
+                coverage_summary.at[idx, "Comp\nDeductible"] = format_premium(comp_val) if comp_val not in ["", None] else ""
+                coverage_summary.at[idx, "Collision\nDeductible"] = format_premium(collision_val) if collision_val not in ["", None] else ""
+        
+        df_cost_hire_used = Auto.extract_cost_of_hire_used_pdfplumber(file_bytes)
+        
+        df_cost_hire_not = Auto.extract_cost_of_hire_not_used_pdfplumber(file_bytes)
+        
+        df_non_ownership = Auto.extract_non_ownership_liability_pymupdf(file_bytes)
+        
+        df_additional = Auto.extract_additional_coverages_pymupdf(file_bytes)
+        
+        df_vehicle = Auto.extract_vehicle_coverages_pymupdf(file_bytes)
+        
+        df_location = Auto.extract_location_coverages_pymupdf(file_bytes)
+        
+        auto_forms_sections = main_forms["Auto"]
+        for name, df in (("Coverages Premium", df_auto1), ("Schedule of Coverages", df_auto2),
+                         ("Schedule of Covered Autos", df_auto3), ("Coverage Summary", coverage_summary),
+                         ("Loss Payees", df_loss_payees), ("Cost of Hire (Used)", df_cost_hire_used),
+                         ("Cost of Hire (NOT Used)", df_cost_hire_not), ("Non-Ownership Liability", df_non_ownership),
+                         ("Additional Coverages", df_additional), ("Vehicle Coverages", df_vehicle),
+                         ("Location Coverages", df_location)):
+            result.add_table("Auto", name, df)
+        result.add_forms("Auto", auto_forms_sections)
+        step += 1; update_progress(step)
+        # ... and show the whole Auto section at once
+        with Preview.section("Auto") as view:
+            view.subheader("Auto Section")
+            for title, df, missing in (
+                ("Auto Coverages Premium", df_auto1, "No data found for Auto Coverages Premium."),
+                ("Schedule of Coverages and Covered Autos (Auto)", df_auto2,
+                 "No data found for Schedule of Coverages and Covered Autos (Auto)."),
+                ("Schedule of Covered Autos (Auto)", df_auto3, "No data found for Schedule of Covered Autos (Auto)."),
+            ):
+                if not df.empty:
+                    view.subheader(title)
+                    view.table(df)
+                else:
+                    view.text(missing)
+            for title, df, missing in (
+                ("Coverage Summary (Auto)", coverage_summary, "No data found for Coverage Summary (Auto)."),
+                ("Auto Loss Payees", df_loss_payees, "No Auto Loss Payees found."),
+                ("Cost of Hire (Used) - Auto", df_cost_hire_used, "No Auto Cost of Hire (Used) found."),
+                ("Cost of Hire (NOT Used) - Auto", df_cost_hire_not, "No Auto Cost of Hire (NOT Used) found."),
+                ("Non-Ownership Liability - Auto", df_non_ownership, "No Auto Non-Ownership Liability found."),
+                ("Additional Coverages - Auto", df_additional, "No Auto Additional Coverages found."),
+                ("Vehicle Coverages - Auto", df_vehicle, "No Auto Vehicle Coverages found."),
+                ("Location Coverages - Auto", df_location, "No Auto Location Coverages found."),
+            ):
+                view.subheader(title)
+                if not df.empty:
+                    view.table(df)
+                else:
+                    view.text(missing)
+            view.subheader("Auto Policy Forms")
+            for title, rows in (auto_forms_sections or {}).items():
+                if rows and view.enabled:
+                    view.subheader(title)
+                    view.table(pd.DataFrame(rows, columns=["Number", "Edition", "Description"]))
+    else:
+        st.info("Main policy PDF not provided. Skipping main policy sections and processing Workers Compensation only.")
+    
+    # --- Inland Marine Section (UI Display) ---
+    if processing_main and InlandMarine is not None:
+        Preview.begin("Inland Marine")
+        im_doc = InlandMarine.load_inland_marine_document(
+            main_pdf_bytes, include_forms=False, raw_pages=main_raw_pages
+        )
+        im_coverage_df, im_debug = InlandMarine.extract_with_pdfplumber(im_doc)
+        result.add_table("Inland Marine", "Coverage", im_coverage_df)
+        if excel_file is not None:
+            im_excel_tables, excel_debug = InlandMarine.process_excel_file(excel_file)
+            # Format each table once; the Word export reuses these
+            inland_excel = [
+                (tbl_name, format_inlandmarine_excel_table(tbl_df))
+                for (tbl_name, tbl_df) in im_excel_tables
+            ]
+            for tbl_name, tbl_df in inland_excel:
+                result.add_table("Inland Marine", f"Excel - {tbl_name}", tbl_df)
+        im_forms_sections = main_forms["Inland Marine"]
+        result.add_forms("Inland Marine", im_forms_sections)
+        with Preview.section("Inland Marine") as view:
+            view.subheader("Inland Marine")
+            view.text("Inland Marine Coverage", bold=True)
+            if not im_coverage_df.empty:
+                view.table(im_coverage_df, editable=False)
+            else:
+                view.text("No Inland Marine coverage data found in PDF.")
+            if excel_file is not None:
+                view.text("Inland Marine Tables (Excel)", bold=True)
+                if inland_excel:
+                    for table_name, df_xl_display in inland_excel:
+                        view.text(table_name, bold=True)
+                        view.table(df_xl_display, editable=False)
+                else:
+                    view.text("No data found in the uploaded Excel file.")
+            view.text("Inland Marine Policy Forms", bold=True)
+            if im_forms_sections:
+                for title, rows in im_forms_sections.items():
+                    view.subheader(title)
+                    if rows and view.enabled:
+                        view.table(pd.DataFrame(rows, columns=["Number", "Edition", "Description"]), editable=False)
+                    elif not rows:
+                        view.text("(No rows found under this coverage type.)")
+            else:
+                view.text("No Inland Marine forms found in the PDF.")
+    else:
+        step += 1; update_progress(step)
+        with Preview.section("Inland Marine") as view:
+            view.text("Inland Marine section not available.")
+    
+    # --- Umbrella Section (UI Display) ---
+    if processing_main:
+        Preview.begin("Umbrella")
+        umbrella_data = None
+        try:
+            umbrella_data = Umbrella.extract_umbrella_data(
+                main_pdf_bytes, policy_forms_sections=main_forms["Umbrella"],
+                raw_pages=main_raw_pages
+            )
+            step += 1; update_progress(step)
+            for name in ("CoveragePremium", "Limits", "Retention"):
+                if umbrella_data.get(name) is not None:
+                    result.add_table("Umbrella", name, umbrella_data[name])
+            for header, df_um in umbrella_data.get("Schedule") or []:
+                result.add_table("Umbrella", f"Schedule - {header}", df_um)
+            result.add_forms("Umbrella", umbrella_data.get("PolicyForms"))
+            with Preview.section("Umbrella") as view:
+                view.subheader("Umbrella")
+                for name, title, missing in (
+                    ("CoveragePremium", "Umbrella Coverage & Premium", "No Umbrella Coverage & Premium data found."),
+                    ("Limits", "Umbrella Limits of Insurance", "No Umbrella Limits data found."),
+                    ("Retention", "Umbrella Self-Insured Retention", "No Umbrella Self-Insured Retention data found."),
+                ):
+                    if umbrella_data.get(name) is not None and not umbrella_data[name].empty:
+                        view.subheader(title)
+                        view.table(umbrella_data[name], editable=False)
+                    else:
+                        view.text(missing)
+                if umbrella_data.get("Schedule"):
+                    view.subheader("Umbrella Schedule of Underlying Insurance")
+                    for header, df_um in umbrella_data["Schedule"]:
+                        view.heading(header)
+                        view.table(df_um, editable=False)
+                else:
+                    view.text("No Umbrella Schedule data found.")
+                if umbrella_data.get("PolicyForms"):
+                    view.subheader("Umbrella Policy Forms")
+                    for title, df_um_forms in umbrella_data["PolicyForms"].items():
+                        view.heading(title)
+                        view.table(df_um_forms, editable=False)
+                else:
+                    view.text("No Umbrella Policy Forms data found.")
+        except Exception as e:
+            st.error(f"Error processing Umbrella section: {e}")
+    
+    # --- Workers Compensation Section (UI Display) ---
+    if wc_pdf_bytes is not None and WC is not None:
+        Preview.begin("Workers Compensation")
+        with Preview.section("Workers Compensation") as view:
+            view.subheader("Workers Compensation")
+            try:
+                wc_pdfminer_lines = WC.get_pdf_lines(wc_pdf_bytes)
+                wc_policy_info_dict = WC.extract_policy_information(wc_pdfminer_lines)
+                wc_pol_data = [
+                    ("Date", wc_policy_info_dict["Date"]),
+                    ("Rating Company", wc_policy_info_dict.get("Rating Company", "")),
+                    ("Quote No.", wc_policy_info_dict["Quote No."]),
+                    ("Policy No.", wc_policy_info_dict["Policy No."]),
+                    ("NCCI Carrier Code No.", wc_policy_info_dict["NCCI Carrier Code No."]),
+                    ("FEIN", wc_policy_info_dict["FEIN"]),
+                    ("Risk ID No.", wc_policy_info_dict["Risk ID No."]),
+                    ("Bureau File No.", wc_policy_info_dict["Bureau File No."]),
+                    ("Entity of Insured", wc_policy_info_dict["Entity of Insured"]),
+                    ("Proposed Policy Period", wc_policy_info_dict["Proposed Policy Period"]),
+                    ("Named Insured", wc_policy_info_dict["Named Insured"]),
+                    ("DBA", wc_policy_info_dict["DBA"]),
+                    ("Insured Address", wc_policy_info_dict["Insured Address"]),
+                    ("Insured City, State & Zip", wc_policy_info_dict["Insured City, State & Zip"]),
+                    ("Agent Name", wc_policy_info_dict["Agent Name"]),
+                    ("Agent Phone", wc_policy_info_dict["Agent Phone"]),
+                    ("Agent Address", wc_policy_info_dict["Agent Address"]),
+                    ("Agent City, State & Zip", wc_policy_info_dict["Agent City, State & Zip"])
+                ]
+                df_wc_policy_info = pd.DataFrame(wc_pol_data, columns=["Field", "Value"])
+                result.add_fields("Workers Compensation", dict(wc_pol_data))
+                view.subheader("Workers Compensation Policy Information")
+                view.table(df_wc_policy_info, align_left=True)
+            except Exception as e:
+                view.text(f"Error extracting WC policy info: {e}")
+            text_wc = WC.get_pdf_text(wc_pdf_bytes)
+            lines_wc = text_wc.splitlines()
+            workers_comp_rows = WC.extract_workers_comp_table(lines_wc)
+            result.add_table("Workers Compensation", "Coverage", workers_comp_rows, ["Coverage", "Limit", "Type"])
+            if workers_comp_rows:
+                df_wc = pd.DataFrame(workers_comp_rows, columns=["Coverage", "Limit", "Type"])
+                view.subheader("Workers Compensation Coverage")
+                view.table(df_wc, align_left=True)
+            else:
+                st.info("No Workers Compensation data found in the WC PDF.")
+            wc_table3_rows = WC.extract_table_3_pdfplumber(wc_pdf_bytes)
+            result.add_table("Workers Compensation", "Additional Premium", wc_table3_rows, ["Description", "Premium"])
+            if wc_table3_rows:
+                df_wc_t3 = pd.DataFrame(wc_table3_rows, columns=["Description", "Premium"])
+                view.subheader("Additional Premium Info (WC)")
+                view.table(df_wc_t3, align_left=True)
+            else:
+                st.info("No Additional Premium Info for Workers Compensation found in the WC PDF.")
+            state_segments = WC.extract_state_segments(lines_wc)
+            if state_segments:
+                view.html("<h2>State-specific Schedule of Operations (WC)</h2>")
+                for seg in state_segments:
+                    state_name = ""
+                    for i, txt in enumerate(seg):
+                        if "SCHEDULE OF OPERATIONS" in txt.upper() and (i+1) < len(seg):
+                            candidate = seg[i+1].strip()
+                            if candidate.upper() in ["EST ANNUAL"]:
+                                continue
+                            if candidate and "QUOTE NO" not in candidate.upper():
+                                state_name = candidate
+                                break
+                    view.subheader(state_name)
+                    schedule_rows, subtotal_data = WC.extract_schedule_operations_table(seg)
+                    if schedule_rows:
+                        df_schedule = pd.DataFrame(schedule_rows, columns=[
+                            "Loc", "ST", "Code No.", "Classification",
+                            "Premium Basis Total Estimated Annual Remuneration",
+                            "Rate Per $100 of Remuneration", "Estimated Annual Premium"
+                        ])
+                        result.add_table("Workers Compensation", f"Schedule of Operations - {state_name}", df_schedule)
+                        view.table(df_schedule, align_left=True)
+                    if subtotal_data:
+                        df_subtotal = pd.DataFrame([subtotal_data], columns=["Subtotal", "Description", "Amount"])
+                        view.table(df_subtotal, align_left=True)
+                    additional_premium = WC.extract_additional_premium_info(seg)
+                    if additional_premium:
+                        df_add_premium = pd.DataFrame(additional_premium, columns=["Code No.", "Description", "Premium"])
+                        view.table(df_add_premium, align_left=True)
+            wc_forms_sections = WC.parse_policy_forms(text_wc)
+            result.add_forms("Workers Compensation", wc_forms_sections)
+            if wc_forms_sections:
+                view.html("<h2>Workers Compensation Forms</h2>")
+                for title, rows in wc_forms_sections.items():
+                    view.subheader(title)
+                    if rows:
+                        df_wc_forms = pd.DataFrame(rows, columns=["Number", "Edition", "Description"])
+                        view.table(df_wc_forms, align_left=True)
+                    else:
+                        st.info(f"No rows found under {title}.")
+            else:
+                st.info("No Workers Compensation Forms sections found in the WC PDF.")
+    
+    # ---------------------------
+    # BUILD WORD DOCUMENT (Final Export)
+    # ---------------------------
+    if 'df_employment' not in locals():
+        df_employment = pd.DataFrame(columns=["Aggregate Limit", "Each Claim Limit", "Deductible", "Retroactive Date", "Estimated Total Premium"])
+        step += 1; update_progress(step)
+    
+    template_filename = f"Proposal Template{(' ' + underwriter) if underwriter else ''}.docx"
+    template_path = os.path.join(os.path.dirname(__file__), template_filename)
+    doc = docx.Document(template_path)
+    section = doc.sections[0]
+    section.header_distance = Pt(60)
+    # For tables (except the one mentioned) we let them auto-fit content.
+    word_doc = doc
+    
+    # -----------------------------------------------------------
+    # PREPARE PLACEHOLDER TEXT & TERRORISM PREMIUM / QUOTE NO LOGIC
+    # -----------------------------------------------------------
+    if processing_main:
+        chosen_no = policy_info.get("Quote No.", "")
+        if not chosen_no:
+            chosen_no = policy_info.get("Policy No.", "")
+        terrorism_premium = ""
+        if not df_policy_cov.empty:
+            for idx, row in df_policy_cov.iterrows():
+                cov_name = str(row["Coverage"]).strip().lower()
+                if "terrorism" in cov_name:
+                    terrorism_premium = str(row["Premium"])
+                    break
+        rating_company = policy_info.get("Rating Company", "")
+        placeholders = {
+            "<Insured Name>": policy_info.get("Named Insured", ""),
+            "<Quote No.>": chosen_no,
+            "<Date>": datetime.datetime.today().strftime("%m/%d/%Y"),
+            "<Terrorism Premium>": terrorism_premium,
+            "<Rating Company>": rating_company,
+        }
+    else:
+        try:
+            wc_pdfminer_lines = WC.get_pdf_lines(wc_pdf_bytes)
+            wc_policy_info_dict = WC.extract_policy_information(wc_pdfminer_lines)
+        except Exception as e:
+            wc_policy_info_dict = {}
+        placeholders = {
+            "<Insured Name>": wc_policy_info_dict.get("Named Insured", "N/A"),
+            "<Quote No.>": wc_policy_info_dict.get("Quote No.", wc_policy_info_dict.get("Policy No.", "")),
+            "<Date>": datetime.datetime.today().strftime("%m/%d/%Y"),
+            "<Terrorism Premium>": "",
+            "<Rating Company>": wc_policy_info_dict.get("Rating Company", ""),
+        }
+    
+    replace_placeholders_selectively(word_doc, placeholders)
+    
+    # --- Policy Section ---
+    marker_para = _find_marker_paragraph(word_doc, "{Policy}")
+    if processing_main:
+        if marker_para is not None:
+            body = word_doc._body._element
+            marker_index = list(body).index(marker_para._element)
+            body.remove(marker_para._element)
+            new_elements = []
+            if not df_policy_cov.empty:
+                df_policy_cov_no_totals = df_policy_cov[
+                    ~df_policy_cov["Coverage"].str.strip().str.lower().str.contains("total proposed premium", na=False) &
+                    ~df_policy_cov["Coverage"].str.strip().str.lower().str.contains("terrorism", na=False)
+                ]
+                title1 = add_table_title(word_doc, "Policy Coverages")
+                table1 = word_doc.add_table(rows=1, cols=2)
+                safe_set_table_style(table1, "Table Grid")
+                enable_table_autofit(table1)
+                hdr_cells = table1.rows[0].cells
+                hdr_cells[0].text = "Coverage"
+                hdr_cells[1].text = "Premium"
+                for cell in hdr_cells:
+                    shading_elm = parse_xml(r'<w:shd {} w:fill="2D5D77"/>'.format(nsdecls('w')))
+                    cell._tc.get_or_add_tcPr().append(shading_elm)
+                    for para in cell.paragraphs:
+                        for run in para.runs:
+                            run.font.color.rgb = RGBColor(255, 255, 255)
+                            run.font.bold = True
+                coverage_data = []
+                if wc_pdf_bytes is not None and WC is not None and wc_table3_rows:
+                    df_wc_t3 = pd.DataFrame(wc_table3_rows, columns=["Description", "Premium"])
+                    if not df_wc_t3.empty:
+                        wc_premium_val = df_wc_t3.iloc[-1]["Premium"]
+                        coverage_data.append({
+                            "Coverage": "Workers Compensation",
+                            "Premium": wc_premium_val
+                        })
+                for _, row in df_policy_cov_no_totals.iterrows():
+                    coverage_data.append({
+                        "Coverage": str(row["Coverage"]),
+                        "Premium": row["Premium"]
+                    })
+                total_val = 0.0
+                for cov_row in coverage_data:
+                    try:
+                        pval = float(str(cov_row["Premium"]).replace("$", "").replace(",", ""))
+                    except:
+                        pval = 0.0
+                    total_val += pval
+                coverage_data.append({
+                    "Coverage": "Total Proposed Premium",
+                    "Premium": total_val
+                })
+                for row_dict in coverage_data:
+                    row_cells = table1.add_row().cells
+                    row_cells[0].text = row_dict["Coverage"]
+                    # Dollars are formatted with commas via updated format_premium
+                    row_cells[1].text = format_premium(row_dict["Premium"])
+                set_table_borders_teal_custom(table1)
+                new_elements.append(title1._element)
+                new_elements.append(table1._element)
+                empty_para = word_doc.add_paragraph("")
+                new_elements.append(empty_para._element)
+            title2 = add_table_title(word_doc, "Policy Information")
+            table2 = word_doc.add_table(rows=1, cols=2)
+            safe_set_table_style(table2, "Table Grid")
+            enable_table_autofit(table2)
+            hdr_cells = table2.rows[0].cells
+            hdr_cells[0].text = "Field"
+            hdr_cells[1].text = "Value"
+            for cell in hdr_cells:
+                shading_elm = parse_xml(r'<w:shd {} w:fill="2D5D77"/>'.format(nsdecls('w')))
+                cell._tc.get_or_add_tcPr().append(shading_elm)
+                for para in cell.paragraphs:
+                    for run in para.runs:
+                        run.font.color.rgb = RGBColor(255, 255, 255)
+                        run.font.bold = True
+            if wc_pdf_bytes is not None and WC is not None and not df_wc_policy_info.empty:
+                table_data = df_wc_policy_info
+            else:
+                table_data = df_policy
+            for idx, row in table_data.iterrows():
+                row_cells = table2.add_row().cells
+                row_cells[0].text = str(row["Field"])
+                row_cells[1].text = str(row["Value"])
+            set_table_borders_teal_custom(table2)
+            new_elements.append(title2._element)
+            new_elements.append(table2._element)
+            empty_para = word_doc.add_paragraph("")
+            new_elements.append(empty_para._element)
+            if wc_pdf_bytes is not None:
+                new_coverage_values = []
+                for ctype in coverage_types:
+                    if ctype.upper() == "WORKERS COMPENSATION":
+                        new_coverage_values.append("✔")
+                    else:
+                        new_coverage_values.append("✔" if Policy.coverage_in_list(policy_cov_list, ctype) else "X")
+                coverage_values = new_coverage_values
+            else:
+                coverage_values = [ "✔" if Policy.coverage_in_list(policy_cov_list, ctype) else "X" for ctype in coverage_types ]
+            # --- Special Handling for "Covered Entity Schedule by Policy" Table:
+            title3 = add_table_title(word_doc, "Covered Entity Schedule by Policy")
+            cols = len(coverage_types) + 1
+            table3 = word_doc.add_table(rows=2, cols=cols)
+            safe_set_table_style(table3, "Table Grid")
+            # Do NOT call enable_table_autofit for this table;
+            # Instead, set the table to full width (100%).
+            set_table_full_width(table3)
+            hdr_cells = table3.rows[0].cells
+            hdr_cells[0].text = "COVERED ENTITY"
+            shading_elm = parse_xml(r'<w:shd {} w:fill="2D5D77"/>'.format(nsdecls('w')))
+            hdr_cells[0]._tc.get_or_add_tcPr().append(shading_elm)
+            for para in hdr_cells[0].paragraphs:
+                for run in para.runs:
+                    run.font.color.rgb = RGBColor(255, 255, 255)
+                    run.font.bold = True
+            for i, ctype in enumerate(coverage_types):
+                cell = hdr_cells[i+1]
+                set_vertical_text_header(cell, ctype)
+            data_cells = table3.rows[1].cells
+            data_cells[0].text = entity_name
+            for i, val in enumerate(coverage_values):
+                data_cells[i+1].text = val
+            set_table_borders_teal_custom(table3)
+            new_elements.append(title3._element)
+            new_elements.append(table3._element)
+            empty_para = word_doc.add_paragraph("")
+            new_elements.append(empty_para._element)
+            for elem in new_elements:
+                body.insert(marker_index, elem)
+                marker_index += 1
+    else:
+        if marker_para is not None:
+            marker_para.text = ""
+    
+    # --- Property Section in Word Export ---
+    property_marker = _find_marker_paragraph(word_doc, "{Property}")
+    if property_marker:
+        property_marker.text = ""
+        current_ref = property_marker
+        if (not df_property_cov.empty or not df_blanket.empty or not df_main.empty or
+            not df_endorsements.empty or not df_other.empty or is_forms_sections_nonempty(property_forms)):
+            if not df_property_cov.empty:
+                current_ref = add_table_title(word_doc, "Property Coverages", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_property_cov, insert_after=current_ref) or current_ref
+            if not df_blanket.empty:
+                current_ref = add_table_title(word_doc, "Blanket Coverages", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_blanket, insert_after=current_ref) or current_ref
+            if not df_main.empty:
+                current_ref = add_table_title(word_doc, "Location Coverages", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_main, insert_after=current_ref) or current_ref
+            if not df_endorsements.empty:
+                current_ref = add_table_title(word_doc, "Policy Level Endorsements", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_endorsements, insert_after=current_ref) or current_ref
+            if not df_other.empty:
+                current_ref = add_table_title(word_doc, "Other Coverages", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_other, insert_after=current_ref) or current_ref
+            if is_forms_sections_nonempty(property_forms):
+                for title, rows in property_forms.items():
+                    if rows:
+                        current_ref = add_table_title(word_doc, title, insert_after=current_ref)
+                        df_forms = pd.DataFrame(rows, columns=["Number", "Edition", "Description"])
+                        current_ref = add_teal_table(word_doc, "", df_forms, insert_after=current_ref) or current_ref
+    
+    # --- General Liability Section in Word Export ---
+    gl_marker = _find_marker_paragraph(word_doc, "{General Liability}")
+    if gl_marker:
+        gl_marker.text = ""
+        current_ref = gl_marker
+        if (not gl_df.empty or not li_df.empty or not loc_df.empty or
+            (cp_dict and any(not v[0].empty for k, v in cp_dict.items() if isinstance(v, tuple))) or
+            not ac_df.empty or is_forms_sections_nonempty(gl_policy_forms)):
+            if not gl_df.empty:
+                current_ref = add_table_title(word_doc, "General Liability Coverages", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", gl_df, insert_after=current_ref) or current_ref
+            if not li_df.empty:
+                current_ref = add_table_title(word_doc, "Limits of Insurance (GL)", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", li_df, insert_after=current_ref) or current_ref
+            if not loc_df.empty:
+                current_ref = add_table_title(word_doc, "Locations (GL)", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", loc_df, insert_after=current_ref) or current_ref
+            if cp_dict:
+                for key, value in cp_dict.items():
+                    if isinstance(value, tuple):
+                        df_cp = value[0].copy()
+                        if "Code No." in df_cp.columns:
+                            df_cp["Code No."] = df_cp["Code No."].apply(lambda x: str(x).replace(',', '').replace('$', '').strip())
+                        for col in ["Premises / Ops Deductible", "Prod/Comp Ops Deductible"]:
+                            if col in df_cp.columns:
+                                df_cp[col] = df_cp[col].apply(lambda x: format_premium(x) if x not in ["", None] else "")
+                        df_cp = format_auto_classification_premium_table(df_cp)
+                        if not df_cp.empty:
+                            df_deductibles = None
+                            if "Prem / Ops Ded" in df_cp.columns or "Prod/Comp Ops Ded" in df_cp.columns:
+                                ded_prem = df_cp["Prem / Ops Ded"].iloc[0] if "Prem / Ops Ded" in df_cp.columns and not df_cp["Prem / Ops Ded"].empty else ""
+                                ded_prod = df_cp["Prod/Comp Ops Ded"].iloc[0] if "Prod/Comp Ops Ded" in df_cp.columns and not df_cp["Prod/Comp Ops Ded"].empty else ""
+                                df_deductibles = pd.DataFrame({
+                                    "Description": ["Prem/Ops", "Prod/Comp Ops"],
+                                    "Amount": [ded_prem, ded_prod]
+                                })
+                                df_cp = df_cp.drop(columns=["Prem / Ops Ded", "Prod/Comp Ops Ded"], errors='ignore')
+                            
+                            current_ref = add_table_title(word_doc, f"Classification & Premium - {key}", insert_after=current_ref)
+                            current_ref = add_teal_table(word_doc, "", df_cp, insert_after=current_ref) or current_ref
+                            if df_deductibles is not None and not df_deductibles.empty:
+                                current_ref = add_table_title(word_doc, "Deductibles", insert_after=current_ref)
+                                current_ref = add_teal_table(word_doc, "", df_deductibles, insert_after=current_ref) or current_ref
+            if not ac_df.empty:
+                current_ref = add_table_title(word_doc, "Additional Coverages (GL)", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", ac_df, insert_after=current_ref) or current_ref
+            if is_forms_sections_nonempty(gl_policy_forms):
+                for title, rows in gl_policy_forms.items():
+                    if rows:
+                        current_ref = add_table_title(word_doc, title, insert_after=current_ref)
+                        df_gl_forms = pd.DataFrame(rows, columns=["Number", "Edition", "Description"])
+                        current_ref = add_teal_table(word_doc, "", df_gl_forms, insert_after=current_ref) or current_ref
+    
+    # --- Auto Section in Word Export ---
+    auto_marker = _find_marker_paragraph(word_doc, "{Auto}")
+    if auto_marker:
+        auto_marker.text = ""
+        current_ref = auto_marker
+        if ('df_auto1' in locals() and (not df_auto1.empty or not df_auto2.empty or not coverage_summary.empty or
+            not df_loss_payees.empty or not df_cost_hire_used.empty or not df_cost_hire_not.empty or
+            not df_non_ownership.empty or not df_additional.empty or not df_vehicle.empty or
+            not df_location.empty or bool(auto_forms_sections))):
+            
+            if not df_auto1.empty:
+                df_auto1 = format_auto_classification_premium_table(df_auto1)
+                current_ref = add_table_title(word_doc, "Classification & Premium", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_auto1, insert_after=current_ref) or current_ref
+            
+            if not df_auto2.empty:
+                current_ref = add_table_title(word_doc, "Schedule of Coverages and Covered Autos (Auto)", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_auto2, insert_after=current_ref) or current_ref
+            
+            # Omit the "Schedule of Covered Autos (Auto)" table (df_auto3) from Word export.
+            
+            if "State" in coverage_summary.columns:
+                coverage_summary.rename(columns={"State": "ST"}, inplace=True)
+            cols = list(coverage_summary.columns)
+            if "ST" in cols:
+                cols.remove("ST")
+                cols = ["ST"] + cols
+                coverage_summary = coverage_summary[cols]
+            coverage_summary.rename(columns={
+                "Comp\nDeductible": "Comp Ded",
+                "Collision\nDeductible": "Coll Ded"
+            }, inplace=True)
+            desired_cols = ["ST", "Veh No.", "Year", "Model", "VIN Number", "Liability", "PIP", "Med Pay", "UM", "UIM", "Comp Ded", "Coll Ded"]
+            existing_cols = [c for c in desired_cols if c in coverage_summary.columns]
+            coverage_summary = coverage_summary[existing_cols]
+            
+            # Replace "$Include" with "Inc" in the "UM" column.
+            if "UM" in coverage_summary.columns:
+                coverage_summary["UM"] = coverage_summary["UM"].apply(lambda x: "Inc" if str(x).strip() == "$Include" else x)
+            
+            import math
+            def format_currency_for_word(val):
+                s = str(val).replace('$','').replace(',','').strip()
+                if not s:
+                    return str(val)
+                try:
+                    f = float(s)
+                    if math.isclose(f, round(f)):
+                        return f"${int(f):,}"
+                    else:
+                        return f"${f:,.2f}"
+                except:
+                    return str(val)
+            for col in ["Liability", "Comp Ded", "Coll Ded"]:
+                if col in coverage_summary.columns:
+                    coverage_summary[col] = coverage_summary[col].apply(format_currency_for_word)
+            
+            def remove_trailing_zeros(val):
+                try:
+                    s = str(val).replace(",", "")
+                    num = float(s)
+                    if math.isclose(num, round(num)):
+                        return str(int(round(num)))
+                    else:
+                        return f"{num:.6f}".rstrip("0").rstrip(".")
+                except:
+                    return val
+            coverage_summary = coverage_summary.applymap(remove_trailing_zeros)
+            
+            current_ref = add_table_title(word_doc, "Auto Coverage Summary", insert_after=current_ref)
+            current_ref = add_teal_table(word_doc, "", coverage_summary, insert_after=current_ref) or current_ref
+            
+            if not df_loss_payees.empty:
+                current_ref = add_table_title(word_doc, "Loss Payees (Auto)", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_loss_payees, insert_after=current_ref) or current_ref
+            if not df_cost_hire_used.empty:
+                current_ref = add_table_title(word_doc, "Cost of Hire (Used) - Auto", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_cost_hire_used, insert_after=current_ref) or current_ref
+            if not df_cost_hire_not.empty:
+                current_ref = add_table_title(word_doc, "Cost of Hire (NOT Used) - Auto", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_cost_hire_not, insert_after=current_ref) or current_ref
+            if not df_non_ownership.empty:
+                current_ref = add_table_title(word_doc, "Non-Ownership Liability - Auto", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_non_ownership, insert_after=current_ref) or current_ref
+            if not df_additional.empty:
+                current_ref = add_table_title(word_doc, "Additional Coverages - Auto", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_additional, insert_after=current_ref) or current_ref
+            if not df_vehicle.empty:
+                current_ref = add_table_title(word_doc, "Vehicle Coverages - Auto", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_vehicle, insert_after=current_ref) or current_ref
+            if not df_location.empty:
+                current_ref = add_table_title(word_doc, "Location Coverages - Auto", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_location, insert_after=current_ref) or current_ref
+            if auto_forms_sections:
+                current_ref = add_table_title(word_doc, "Auto Policy Forms", insert_after=current_ref)
+                for title, rows in auto_forms_sections.items():
+                    if rows:
+                        current_ref = add_table_title(word_doc, title, insert_after=current_ref)
+                        df_auto_forms = pd.DataFrame(rows, columns=["Number", "Edition", "Description"])
+                        current_ref = add_teal_table(word_doc, "", df_auto_forms, insert_after=current_ref) or current_ref
+        else:
+            st.info("No Auto section marker found in the Word template.")
+    else:
+        st.info("No Auto section marker found in the Word template.")
+    
+    # Insert AutoFee image only if Auto tables found.
+    auto_tables_found = (
+        'df_auto1' in locals() and (
+            not df_auto1.empty or not df_auto2.empty or not coverage_summary.empty or
+            not df_loss_payees.empty or not df_cost_hire_used.empty or
+            not df_cost_hire_not.empty or not df_non_ownership.empty or
+            not df_additional.empty or not df_vehicle.empty or
+            not df_location.empty or bool(auto_forms_sections)
+        )
+    )
+    if auto_tables_found:
+        auto_fee_marker = _find_marker_paragraph(word_doc, "{AutoFee}")
+        if auto_fee_marker is not None:
+            body = word_doc._body._element
+            children = list(body)
+            try:
+                marker_index = children.index(auto_fee_marker._element)
+            except ValueError:
+                marker_index = len(children)
+            body.remove(auto_fee_marker._element)
+            img_para = word_doc.add_paragraph("")
+            img_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            img_run = img_para.add_run()
+            image_path = os.path.join(os.path.dirname(__file__), "AutoFee.png")
+            img_run.add_picture(image_path, width=Inches(8.5))
+            body.insert(marker_index, img_para._element)
+    else:
+        auto_fee_marker = _find_marker_paragraph(word_doc, "{AutoFee}")
+        if auto_fee_marker is not None:
+            auto_fee_marker.text = ""
+    
+    # --- Inland Marine Section in Word Export ---
+    im_marker = _find_marker_paragraph(word_doc, "{Inland Marine}")
+    if im_marker:
+        im_marker.text = ""
+        current_ref = im_marker
+        if InlandMarine is not None and processing_main:
+            # Reuse the document parsed for the UI section above
+            im_coverage_df, im_debug = InlandMarine.extract_with_pdfplumber(im_doc)
+            if not im_coverage_df.empty:
+                current_ref = add_table_title(word_doc, "Inland Marine Coverage", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", im_coverage_df, insert_after=current_ref) or current_ref
+            else:
+                current_ref = insert_paragraph_after(im_marker, word_doc, "No Inland Marine coverage data found in PDF.")
+            inland_excel_tables = inland_excel
+            if inland_excel_tables:
+                for table_name, df_xl_display in inland_excel_tables:
+                    current_ref = add_table_title(word_doc, table_name, insert_after=current_ref)
+                    current_ref = add_teal_table(word_doc, "", df_xl_display, insert_after=current_ref) or current_ref
+            im_forms_sections = main_forms["Inland Marine"]
+            if im_forms_sections:
+                for title, rows in im_forms_sections.items():
+                    if rows:
+                        current_ref = add_table_title(word_doc, title, insert_after=current_ref)
+                        df_im_forms = pd.DataFrame(rows, columns=["Number", "Edition", "Description"])
+                        current_ref = add_teal_table(word_doc, "", df_im_forms, insert_after=current_ref) or current_ref
+        else:
+            current_ref = insert_paragraph_after(im_marker, word_doc, "Inland Marine section not available.")
+    
+    # --- Umbrella Section in Word Export ---
+    umbrella_marker = _find_marker_paragraph(word_doc, "{Umbrella}")
+    if umbrella_marker:
+        umbrella_marker.text = ""
+        current_ref = umbrella_marker
+        if umbrella_data is not None:
+            if umbrella_data.get("CoveragePremium") is not None and not umbrella_data["CoveragePremium"].empty:
+                current_ref = add_table_title(word_doc, "Umbrella Coverage & Premium", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", umbrella_data["CoveragePremium"], insert_after=current_ref) or current_ref
+            else:
+                insert_paragraph_after(current_ref, word_doc, "No Umbrella Coverage & Premium data found.")
+            if umbrella_data.get("Limits") is not None and not umbrella_data["Limits"].empty:
+                current_ref = add_table_title(word_doc, "Umbrella Limits of Insurance", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", umbrella_data["Limits"], insert_after=current_ref) or current_ref
+            else:
+                insert_paragraph_after(current_ref, word_doc, "No Umbrella Limits data found.")
+            if umbrella_data.get("Retention") is not None and not umbrella_data["Retention"].empty:
+                current_ref = add_table_title(word_doc, "Umbrella Self-Insured Retention", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", umbrella_data["Retention"], insert_after=current_ref) or current_ref
+            else:
+                insert_paragraph_after(current_ref, word_doc, "No Umbrella Self-Insured Retention data found.")
+            if umbrella_data.get("Schedule"):
+                current_ref = add_table_title(word_doc, "Umbrella Schedule of Underlying Insurance", insert_after=current_ref)
+                for header, df_um in umbrella_data["Schedule"]:
+                    current_ref = add_table_title(word_doc, header, insert_after=current_ref)
+                    current_ref = add_teal_table(word_doc, "", df_um, insert_after=current_ref) or current_ref
+            else:
+                insert_paragraph_after(current_ref, word_doc, "No Umbrella Schedule data found.")
+            if umbrella_data.get("PolicyForms"):
+                current_ref = add_table_title(word_doc, "Umbrella Policy Forms", insert_after=current_ref)
+                for title, df_um_forms in umbrella_data["PolicyForms"].items():
+                    current_ref = add_table_title(word_doc, title, insert_after=current_ref)
+                    current_ref = add_teal_table(word_doc, "", df_um_forms, insert_after=current_ref) or current_ref
+            else:
+                insert_paragraph_after(current_ref, word_doc, "No Umbrella Policy Forms data found.")
+        else:
+            insert_paragraph_after(current_ref, word_doc, "No Umbrella data found.")
+    
+    # --- Employment Section in Word Export ---
+    employment_marker = _find_marker_paragraph(word_doc, "{Employment}")
+    if employment_marker:
+        employment_marker.text = ""
+        current_ref = employment_marker
+        if not df_employment.empty:
+            current_ref = add_table_title(word_doc, "Employment", insert_after=current_ref)
+            current_ref = add_teal_table(word_doc, "", df_employment, insert_after=current_ref) or current_ref
+        else:
+            insert_paragraph_after(employment_marker, word_doc, "No Employment data found.")
+    
+    # --- Workers Compensation Section in Word Export ---
+    wc_marker = _find_marker_paragraph(word_doc, "{Workers Compensation}")
+    if wc_marker:
+        wc_marker.text = ""
+        current_ref = wc_marker
+        if wc_pdf_bytes is not None:
+            if processing_main:
+                if not df_wc_policy_info.empty:
+                    for index, row in df_wc_policy_info.iterrows():
+                        if row["Field"] in ["NCCI Carrier Code No.", "FEIN", "Risk ID No.", "Bureau File No."]:
+                            value = row["Value"]
+                            try:
+                                value = int(float(value))
+                            except Exception:
+                                value = str(value).replace(",", "")
+                            df_wc_policy_info.at[index, "Value"] = str(value)
+            try:
+                rating_company = df_wc_policy_info.loc[df_wc_policy_info["Field"] == "Rating Company", "Value"].values[0]
+            except Exception:
+                rating_company = "[Rating Company]"
+            disclaimer_text = f"""Pursuant to Texas Labor Code §411.066, {rating_company} is required to notify its policyholders that accident prevention services are available from {rating_company} at no additional charge. These services may include surveys, recommendations, training programs, consultations, analyses of accident causes, industrial hygiene, and industrial health services. {rating_company} is also required to provide return-to-work coordination services as required by Texas Labor Code §413.021 and to notify you of the availability of the return-to-work reimbursement program for employers under Texas Labor Code §413.022. If you would like more information, contact {rating_company} at (800) 955-0325 and LossControl@BerkleySW.com for accident prevention services or (800) 955-0325 and Claims@BerkleySW.com for return-to-work coordination services. For information about these requirements, call the Texas Department of Insurance, Division of Workers' Compensation (TDI-DWC) at 1-800-687-7080 or for information about the return-to-work reimbursement program for employers, call the TDI-DWC at (512) 804-5000. If {rating_company} fails to respond to your request for accident prevention services or return-to-work coordination services, you may file a complaint with the TDI-DWC in writing at Texas Department of Insurance or by mail to Texas Department of Insurance, Division of Workers' Compensation, P.O. Box 12050, HS-WS, Austin, Texas 78711-2050."""
+            
+            notice_para = insert_paragraph_after(current_ref, word_doc, "Notice:")
+            for run in notice_para.runs:
+                run.font.size = Pt(18)
+                run.font.bold = True
+            blank_para = insert_paragraph_after(notice_para, word_doc, "")
+            current_ref = insert_paragraph_after(blank_para, word_doc, disclaimer_text)
+            for run in current_ref.runs:
+                run.font.bold = True
+                        
+            page_break_para = insert_paragraph_after(current_ref, word_doc, "")
+            page_break_run = page_break_para.add_run()
+            page_break_run.add_break(WD_BREAK.PAGE)
+            current_ref = page_break_para
+        if processing_main:
+            if df_wc_policy_info is not None and not df_wc_policy_info.empty:
+                current_ref = add_table_title(word_doc, "Workers Compensation Policy Information", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_wc_policy_info, insert_after=current_ref) or current_ref
+            if workers_comp_rows:
+                df_wc_cov = pd.DataFrame(workers_comp_rows, columns=["Coverage", "Limit", "Type"])
+                current_ref = add_table_title(word_doc, "Workers Compensation Coverage", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_wc_cov, insert_after=current_ref) or current_ref
+            if wc_table3_rows:
+                df_wc_t3 = pd.DataFrame(wc_table3_rows, columns=["Description", "Premium"])
+                current_ref = add_table_title(word_doc, "Workers Compensation Additional Premium Info", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_wc_t3, insert_after=current_ref) or current_ref
+            if last_segment is not None:
+                seg, state_name = last_segment
+                current_ref = add_table_title(word_doc, "State-specific Schedule of Operations (WC)", insert_after=current_ref)
+                current_ref = add_table_title(word_doc, f"State: {state_name}", insert_after=current_ref)
+                schedule_rows, subtotal_data = WC.extract_schedule_operations_table(seg)
+                if schedule_rows:
+                    df_schedule = pd.DataFrame(schedule_rows, columns=[
+                        "Loc", "ST", "Code No.", "Classification",
+                        "Premium Basis Total Estimated Annual Remuneration",
+                        "Rate Per $100 of Remuneration", "Estimated Annual Premium"
+                    ])
+                    current_ref = add_teal_table(word_doc, "Schedule of Operations", df_schedule, insert_after=current_ref) or current_ref
+                if subtotal_data:
+                    df_subtotal = pd.DataFrame([subtotal_data], columns=["Subtotal", "Description", "Amount"])
+                    current_ref = add_teal_table(word_doc, "Subtotal", df_subtotal, insert_after=current_ref) or current_ref
+                additional_premium = WC.extract_additional_premium_info(seg)
+                if additional_premium:
+                    df_add_premium = pd.DataFrame(additional_premium, columns=["Code No.", "Description", "Premium"])
+                    current_ref = add_teal_table(word_doc, "Additional Premium Info", df_add_premium, insert_after=current_ref) or current_ref
+            if wc_forms_sections:
+                current_ref = add_table_title(word_doc, "Workers Compensation Policy Forms (Last Section)", insert_after=current_ref)
+                for title, rows in wc_forms_sections.items():
+                    if rows:
+                        current_ref = add_table_title(word_doc, title, insert_after=current_ref)
+                        df_wc_forms = pd.DataFrame(rows, columns=["Number", "Edition", "Description"])
+                        current_ref = add_teal_table(word_doc, "", df_wc_forms, insert_after=current_ref) or current_ref
+        else:
+            if df_wc_policy_info is not None and not df_wc_policy_info.empty:
+                current_ref = add_table_title(word_doc, "Workers Compensation Policy Information", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_wc_policy_info, insert_after=current_ref) or current_ref
+            if workers_comp_rows:
+                df_wc_cov = pd.DataFrame(workers_comp_rows, columns=["Coverage", "Limit", "Type"])
+                current_ref = add_table_title(word_doc, "Workers Compensation Coverage", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_wc_cov, insert_after=current_ref) or current_ref
+            if wc_table3_rows:
+                df_wc_t3 = pd.DataFrame(wc_table3_rows, columns=["Description", "Premium"])
+                current_ref = add_table_title(word_doc, "Workers Compensation Additional Premium Info", insert_after=current_ref)
+                current_ref = add_teal_table(word_doc, "", df_wc_t3, insert_after=current_ref) or current_ref
+            if all_segments:
+                current_ref = add_table_title(word_doc, "Workers Compensation Policy Information", insert_after=current_ref)
+                for seg in all_segments:
+                    state_name = ""
+                    for i, txt in enumerate(seg):
+                        if "SCHEDULE OF OPERATIONS" in txt.upper() and (i+1) < len(seg):
+                            candidate = seg[i+1].strip()
+                            if candidate.upper() in ["EST ANNUAL"]:
+                                continue
+                            if candidate and "QUOTE NO" not in candidate.upper():
+                                state_name = candidate
+                                break
+                    current_ref = add_table_title(word_doc, f"State: {state_name}", insert_after=current_ref)
+                    schedule_rows, subtotal_data = WC.extract_schedule_operations_table(seg)
+                    if schedule_rows:
+                        df_schedule = pd.DataFrame(schedule_rows, columns=[
+                            "Loc", "ST", "Code No.", "Classification",
+                            "Premium Basis Total Estimated Annual Remuneration",
+                            "Rate Per $100 of Remuneration", "Estimated Annual Premium"
+                        ])
+                        current_ref = add_teal_table(word_doc, "Schedule of Operations", df_schedule, insert_after=current_ref) or current_ref
+                    if subtotal_data:
+                        df_subtotal = pd.DataFrame([subtotal_data], columns=["Subtotal", "Description", "Amount"])
+                        current_ref = add_teal_table(word_doc, "Subtotal", df_subtotal, insert_after=current_ref) or current_ref
+                    additional_premium = WC.extract_additional_premium_info(seg)
+                    if additional_premium:
+                        df_add_premium = pd.DataFrame(additional_premium, columns=["Code No.", "Description", "Premium"])
+                        current_ref = add_teal_table(word_doc, "Additional Premium Info", df_add_premium, insert_after=current_ref) or current_ref
+                if wc_forms_sections:
+                    current_ref = add_table_title(word_doc, "Workers Compensation Policy Forms (Last Section)", insert_after=current_ref)
+                    for title, rows in wc_forms_sections.items():
+                        if rows:
+                            current_ref = add_table_title(word_doc, title, insert_after=current_ref)
+                            df_wc_forms = pd.DataFrame(rows, columns=["Number", "Edition", "Description"])
+                            current_ref = add_teal_table(word_doc, "", df_wc_forms, insert_after=current_ref) or current_ref
+    
+    # ---------------------------
+    
+    
+    
+    if texas_found:
+        import fitz
+
+        policy_number = policy_info.get("Policy No.", "") or policy_info.get("Quote No.", "")
+        stamp_fields = {
+            "Applicant/Named Insured:": policy_info.get("Named Insured", ""),
+            "Policy Effective Date:": policy_info.get("Proposed Policy Period", ""),
+            "Policy Number:": policy_number,
+            "Agent:": policy_info.get("Agent Name", ""),
+        }
+
+        x_offset = 6 * 14
+        y_offset = 12 * 5
+
+        positions = {
+            0: {
+                "Applicant/Named Insured:": (100 + x_offset, 150 + y_offset),
+                "Policy Effective Date:": (100 + x_offset, 180 + y_offset),
+                "Policy Number:": (320 + x_offset, 180 + y_offset),
+                "Agent:": (100 + x_offset, 210 + y_offset),
+            },
+            2: {
+                "Applicant/Named Insured:": (100 + x_offset, 150 + y_offset),
+                "Policy Effective Date:": (100 + x_offset, 180 + y_offset),
+                "Policy Number:": (320 + x_offset, 180 + y_offset),
+                "Agent:": (100 + x_offset, 210 + y_offset),
+            }
+        }
+
+        pipform_path = os.path.join(os.path.dirname(__file__), "PIPFORMS.pdf")
+        stamped_path = os.path.join(os.path.dirname(__file__), "PIPFORMS_stamped_final.pdf")
+
+        pdf = fitz.open(pipform_path)
+        for pg, fields in positions.items():
+            page = pdf[pg]
+            for label, pos in fields.items():
+                value = stamp_fields.get(label, "")
+                page.insert_text(pos, value, fontsize=10)
+        pdf.save(stamped_path)
+        pdf.close()
+
+        # Append stamped PDF pages as full-bleed images with 0.25" margins
+        pdf = fitz.open(stamped_path)
+        section = word_doc.sections[-1]
+        section.top_margin = Inches(0.25)
+        section.bottom_margin = Inches(0.25)
+        section.left_margin = Inches(0.25)
+        section.right_margin = Inches(0.25)
+
+        for page in pdf:
+            pix = page.get_pixmap(dpi=300)
+            img_path = os.path.join(tempfile.gettempdir(), f"stamped_page_{page.number+1}.png")
+            pix.save(img_path)
+            para = word_doc.add_paragraph()
+            para.alignment = 1  # center
+            para.add_run().add_picture(img_path, width=Inches(8.0))
+        pdf.close()
+# ---------------------------
+    def detect_texas_in_dataframes(dfs):
+        import pandas as pd
+        for df in dfs:
+            if isinstance(df, pd.DataFrame) and not df.empty:
+                if df.astype(str).apply(lambda col: col.str.contains(r'\b(TX|Tx|Texas)\b', case=False, na=False)).any().any():
+                    return True
+        return False
+
+    texas_found = False
+    try:
+        auto_dfs = [df_auto1, df_auto2, df_auto3, coverage_summary]
+        texas_found = detect_texas_in_dataframes(auto_dfs)
+    except Exception:
+        texas_found = False
+
+    if texas_found:
+        with Profiling.stage("Texas PIP stamping"):
+            import fitz
+        
+            policy_number = policy_info.get("Policy No.", "") or policy_info.get("Quote No.", "")
+            stamp_fields = {
+                "Applicant/Named Insured:": policy_info.get("Named Insured", ""),
+                "Policy Effective Date:": policy_info.get("Proposed Policy Period", ""),
+                "Policy Number:": policy_number,
+                "Agent:": policy_info.get("Agent Name", ""),
+            }
+
+            x_offset = 6 * 14  # 14 spaces right
+            y_offset = 12 * 5  # 5 rows down
+
+            positions = {
+                0: {  # Page 1
+                    "Applicant/Named Insured:": (100 + x_offset, 150 + y_offset),
+                    "Policy Effective Date:": (100 + x_offset, 180 + y_offset),
+                    "Policy Number:": (320 + x_offset, 180 + y_offset),
+                    "Agent:": (100 + x_offset, 210 + y_offset),
+                },
+                2: {  # Page 3
+                    "Applicant/Named Insured:": (100 + x_offset, 150 + y_offset),
+                    "Policy Effective Date:": (100 + x_offset, 180 + y_offset),
+                    "Policy Number:": (320 + x_offset, 180 + y_offset),
+                    "Agent:": (100 + x_offset, 210 + y_offset),
+                }
+            }
+
+            pipform_path = os.path.join(os.path.dirname(__file__), "PIPFORMS_template.pdf")
+            stamped_path = os.path.join(os.path.dirname(__file__), "PIPFORMS_stamped_final.pdf")
+
+            pdf = fitz.open(pipform_path)
+            for pg, fields in positions.items():
+                page = pdf[pg]
+                for label, pos in fields.items():
+                    value = stamp_fields.get(label, "")
+                    page.insert_text(pos, value, fontsize=10)
+            pdf.save(stamped_path)
+            pdf.close()
+
+            # Append stamped form as images to Word export
+            pdf = fitz.open(stamped_path)
+            for page in pdf:
+                pix = page.get_pixmap(dpi=200)
+                img_path = os.path.join(tempfile.gettempdir(), f"stamped_page_{page.number+1}.png")
+                pix.save(img_path)
+                word_doc.add_paragraph().add_run().add_picture(img_path, width=Inches(8.5))
+            pdf.close()
+
+    # ---------------------------
+    # (duplicate texas_vehicle_found block removed)
+
+# DOWNLOAD BUTTON
+    # ---------------------------
+    word_io = BytesIO()
+    skipped = Deadlines.skipped_sections()
+    if skipped:
+        para = word_doc.add_paragraph()
+        para.add_run("Sections skipped: ").bold = True
+        para.add_run("; ".join(f"{section} ({reason})" for section, reason in skipped.items())
+                     + ". Please complete these sections manually.")
+    
+    
+    # ---------------------------
+    # CONDITIONAL TEXAS FORM INSERTION (image stamping version)
+    # ---------------------------
+    word_doc.save(word_io)
+    word_io.seek(0)
+
+    auto_schedule = df_auto3 if processing_main else pd.DataFrame()
+    detected_lobs = [lob for lob in (main_probe or {}).get("lob_pages", {}) if lob != "Forms"]
+    if wc_pdf_bytes is not None:
+        detected_lobs.append("Workers Compensation")
+    shape = {
+        "lobs": detected_lobs,
+        "vehicle_count": len(auto_schedule),
+        "location_count": len(loc_df),
+        "state_count": int(auto_schedule["ST"].nunique()) if "ST" in auto_schedule.columns else 0,
+    }
+    for section, reason in skipped.items():
+        result.section(section).skipped = reason
+    result.meta["shape"] = shape
+    return word_io, shape, result
+
+def record_telemetry(run_record, main_pdf_bytes, wc_pdf_bytes, shape, underwriter, page_count=None):
+    """Telemetry.record_run() for one generated proposal, from the page, batch mode or the job service."""
+    return Telemetry.record_run(
+        run_record,
+        file_size=sum(len(b) for b in (main_pdf_bytes, wc_pdf_bytes) if b),
+        page_count=page_count,
+        lobs=shape["lobs"],
+        vehicle_count=shape["vehicle_count"],
+        location_count=shape["location_count"],
+        state_count=shape["state_count"],
+        underwriter=underwriter,
+    )
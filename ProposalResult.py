@@ -0,0 +1,243 @@
+import json
+from dataclasses import dataclass, field
+
+############################################
+# Compact typed model of one proposal's extracted data
+############################################
+# Tables hold column names and row tuples; DataFrames are only built when a
+# table is displayed or written. The whole result serializes to JSON or to a
+# single Arrow table, so it can be cached, shared between processes or kept
+# in the Streamlit session cheaply.
+FORM_COLUMNS = ("Number", "Edition", "Description")
+RESULT_VERSION = 1
+
+def _cell(value):
+    """Plain JSON-safe cell value: numpy scalars, NaN and None become str/''."""
+    if value is None:
+        return ""
+    if isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return "" if value != value else value
+    item = getattr(value, "item", None)  # numpy scalar
+    if item is not None:
+        try:
+            return _cell(item())
+        except (TypeError, ValueError):
+            pass
+    return str(value)
+
+@dataclass(slots=True, frozen=True)
+class Table:
+    columns: tuple
+    rows: tuple
+
+    @classmethod
+    def from_value(cls, value, columns=None):
+        """Build from a DataFrame, a list of dicts or a list of row sequences."""
+        if value is None:
+            return cls(tuple(columns or ()), ())
+        if hasattr(value, "itertuples"):  # DataFrame
+            return cls(
+                tuple(str(c) for c in value.columns),
+                tuple(tuple(_cell(v) for v in row) for row in value.itertuples(index=False, name=None)),
+            )
+        value = list(value)
+        if value and isinstance(value[0], dict):
+            if columns is None:
+                columns = list(dict.fromkeys(k for row in value for k in row))
+            return cls(tuple(columns), tuple(tuple(_cell(row.get(c, "")) for c in columns) for row in value))
+        if columns is None:
+            columns = range(max((len(row) for row in value), default=0))
+        return cls(tuple(str(c) for c in columns), tuple(tuple(_cell(v) for v in row) for row in value))
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def empty(self) -> bool:
+        return not self.rows
+
+    def records(self) -> list:
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def column(self, name) -> list:
+        i = self.columns.index(name)
+        return [row[i] for row in self.rows]
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        return pd.DataFrame(list(self.rows), columns=list(self.columns))
+
+@dataclass(slots=True)
+class SectionResult:
+    """Tables, scalar fields and forms of one line of business."""
+    tables: dict = field(default_factory=dict)   # name -> Table
+    fields: dict = field(default_factory=dict)   # name -> str
+    forms: dict = field(default_factory=dict)    # coverage title -> Table
+    skipped: str = ""
+
+@dataclass(slots=True)
+class ProposalResult:
+    sections: dict = field(default_factory=dict)  # section -> SectionResult
+    meta: dict = field(default_factory=dict)
+
+    def section(self, name) -> SectionResult:
+        if name not in self.sections:
+            self.sections[name] = SectionResult()
+        return self.sections[name]
+
+    def add_table(self, section, name, value, columns=None):
+        """Store a DataFrame / records / rows as section.name; empty tables are kept too."""
+        table = value if isinstance(value, Table) else Table.from_value(value, columns)
+        self.section(section).tables[name] = table
+        return table
+
+    def add_fields(self, section, mapping):
+        self.section(section).fields.update({str(k): _cell(v) for k, v in (mapping or {}).items()})
+
+    def add_forms(self, section, forms_sections):
+        """{title: rows} as parsed from the forms schedule (rows or DataFrames)."""
+        forms = self.section(section).forms
+        for title, rows in (forms_sections or {}).items():
+            forms[title] = Table.from_value(rows, None if hasattr(rows, "itertuples") else FORM_COLUMNS)
+
+    def table(self, section, name):
+        """The Table, or None when the section or table was not extracted."""
+        found = self.sections.get(section)
+        return found.tables.get(name) if found else None
+
+    def dataframe(self, section, name):
+        import pandas as pd
+
+        table = self.table(section, name)
+        return table.to_dataframe() if table is not None else pd.DataFrame()
+
+    # ---- serialization ----
+    def to_dict(self) -> dict:
+        return {
+            "version": RESULT_VERSION,
+            "meta": self.meta,
+            "sections": {
+                name: {
+                    "tables": {t: {"columns": list(tb.columns), "rows": [list(r) for r in tb.rows]}
+                               for t, tb in sec.tables.items()},
+                    "fields": sec.fields,
+                    "forms": {t: [list(r) for r in tb.rows] for t, tb in sec.forms.items()},
+                    "skipped": sec.skipped,
+                }
+                for name, sec in self.sections.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        result = cls(meta=dict(data.get("meta", {})))
+        for name, sec in data.get("sections", {}).items():
+            result.sections[name] = SectionResult(
+                tables={t: Table(tuple(tb["columns"]), tuple(tuple(r) for r in tb["rows"]))
+                        for t, tb in sec.get("tables", {}).items()},
+                fields=dict(sec.get("fields", {})),
+                forms={t: Table(FORM_COLUMNS, tuple(tuple(r) for r in rows))
+                       for t, rows in sec.get("forms", {}).items()},
+                skipped=sec.get("skipped", ""),
+            )
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def to_arrow(self):
+        """
+        Every cell as one row of a long Arrow table
+        (section, kind, name, row, column, value); meta rides in the schema
+        metadata. Values are stored as strings.
+        """
+        import pyarrow as pa
+
+        cols = {k: [] for k in ("section", "kind", "name", "row", "column", "value")}
+
+        def emit(section, kind, name, table):
+            for r, row in enumerate(table.rows):
+                for column, value in zip(table.columns, row):
+                    for key, item in zip(cols, (section, kind, name, r, column, str(value))):
+                        cols[key].append(item)
+
+        for section, sec in self.sections.items():
+            for name, table in sec.tables.items():
+                emit(section, "table", name, table)
+                if table.empty:  # keep empty tables and their columns
+                    for column in table.columns or ("",):
+                        for key, item in zip(cols, (section, "columns", name, -1, column, "")):
+                            cols[key].append(item)
+            for name, table in sec.forms.items():
+                emit(section, "forms", name, table)
+                if table.empty:
+                    for key, item in zip(cols, (section, "forms", name, -1, "", "")):
+                        cols[key].append(item)
+            for name, value in sec.fields.items():
+                for key, item in zip(cols, (section, "field", name, 0, name, str(value))):
+                    cols[key].append(item)
+            if sec.skipped:
+                for key, item in zip(cols, (section, "skipped", "", 0, "", sec.skipped)):
+                    cols[key].append(item)
+        table = pa.table({
+            "section": pa.array(cols["section"], pa.string()),
+            "kind": pa.array(cols["kind"], pa.string()),
+            "name": pa.array(cols["name"], pa.string()),
+            "row": pa.array(cols["row"], pa.int32()),
+            "column": pa.array(cols["column"], pa.string()),
+            "value": pa.array(cols["value"], pa.string()),
+        })
+        return table.replace_schema_metadata({"proposal_meta": json.dumps(self.meta), "version": str(RESULT_VERSION)})
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Inverse of to_arrow(); cell values come back as strings."""
+        metadata = table.schema.metadata or {}
+        result = cls(meta=json.loads(metadata.get(b"proposal_meta", b"{}")))
+        grouped = {}
+        for section, kind, name, row, column, value in zip(*(table.column(c).to_pylist() for c in
+                                                             ("section", "kind", "name", "row", "column", "value"))):
+            sec = result.section(section)
+            if kind == "field":
+                sec.fields[name] = value
+            elif kind == "skipped":
+                sec.skipped = value
+            else:
+                entry = grouped.setdefault((section, "forms" if kind == "forms" else "table", name), {"columns": [], "rows": {}})
+                if row < 0:
+                    if column:
+                        entry["columns"].append(column)
+                    continue
+                if row == 0:
+                    entry["columns"].append(column)
+                entry["rows"].setdefault(row, []).append(value)
+        for (section, kind, name), entry in grouped.items():
+            rows = tuple(tuple(entry["rows"][r]) for r in sorted(entry["rows"]))
+            if kind == "forms":
+                result.sections[section].forms[name] = Table(FORM_COLUMNS, rows)
+            else:
+                result.sections[section].tables[name] = Table(tuple(entry["columns"]), rows)
+        return result
+
+    def to_arrow_ipc(self) -> bytes:
+        """The Arrow table as IPC stream bytes."""
+        import pyarrow as pa
+
+        sink = pa.BufferOutputStream()
+        table = self.to_arrow()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    @classmethod
+    def from_arrow_ipc(cls, data):
+        import pyarrow as pa
+
+        return cls.from_arrow(pa.ipc.open_stream(data).read_all())
@@ -0,0 +1,259 @@
+import os
+import io
+import json
+import time
+import hashlib
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.ioloop
+import tornado.web
+
+import JobQueue
+import Deadlines
+import PdfProbe
+import Profiling
+import BookOfBusiness
+import Preview
+import ProposalPipeline
+
+############################################
+# HTTP job API for generating proposals without the Streamlit page
+#
+#   POST /jobs                 multipart: main_pdf, wc_pdf, excel files and an
+#                              underwriter field -> 202 {"job_id", ...}
+#   GET  /jobs/<job_id>        status: queued | running | done | failed
+#   GET  /jobs/<job_id>/docx   the finished proposal
+#   GET  /jobs/<job_id>/result the extracted tables (ProposalResult JSON)
+#
+# Run with: python ProposalService.py --port 8600
+#
+# The service admits jobs through its own JobQueue, separate from the
+# Streamlit server's: set PROPOSAL_WORKERS / PROPOSAL_PAGE_BUDGET for each
+# process so that together they fit the machine.
+############################################
+RESULTS_DIR = os.environ.get(
+    "PROPOSAL_RESULTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "proposal_results")
+)
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+# Failed jobs stay in memory this long so clients can read the error;
+# finished jobs are served from RESULTS_DIR and dropped right away
+FAILED_JOB_TTL_SECONDS = float(os.environ.get("PROPOSAL_FAILED_JOB_TTL", 3600))
+
+# Every job holds a thread while it waits in JobQueue, so the executor is
+# sized to the queue: WORKERS running plus MAX_QUEUED waiting.
+_executor = ThreadPoolExecutor(
+    max_workers=JobQueue.WORKERS + JobQueue.MAX_QUEUED, thread_name_prefix="proposal-job"
+)
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def upload_hash(main_pdf, wc_pdf, excel, underwriter) -> str:
+    """Content hash of one submission; identical uploads share one result."""
+    digest = hashlib.sha256()
+    for part in (main_pdf, wc_pdf, excel, (underwriter or "").encode("utf-8")):
+        part = part or b""
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+def _result_paths(job_id):
+    return os.path.join(RESULTS_DIR, f"{job_id}.docx"), os.path.join(RESULTS_DIR, f"{job_id}.json")
+
+def _extraction_path(job_id):
+    return os.path.join(RESULTS_DIR, f"{job_id}.result.json")
+
+def _stored_result(job_id):
+    """Metadata of a finished job saved on disk, or None."""
+    docx_path, meta_path = _result_paths(job_id)
+    if not (os.path.exists(docx_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _update_job(job_id, **fields):
+    with _jobs_lock:
+        _jobs[job_id].update(fields)
+
+def _fail_job(job_id, error):
+    _update_job(job_id, status="failed", error=error, finished=time.time())
+
+def _forget_job(job_id):
+    """Drop a stored job from memory; job_status() reads it back from RESULTS_DIR."""
+    with _jobs_lock:
+        _jobs.pop(job_id, None)
+
+def _prune_jobs(now=None):
+    """Evict failed jobs older than FAILED_JOB_TTL_SECONDS (call with _jobs_lock held)."""
+    cutoff = (now or time.time()) - FAILED_JOB_TTL_SECONDS
+    for job_id in [j for j, job in _jobs.items() if job["status"] == "failed" and job.get("finished", 0) < cutoff]:
+        del _jobs[job_id]
+
+def _probe(pdf_bytes):
+    try:
+        return PdfProbe.probe_pdf(pdf_bytes)
+    except Exception:
+        return None
+
+def run_job(job_id, main_pdf, wc_pdf, excel, underwriter):
+    """Wait for a JobQueue slot, build the proposal and store it under job_id."""
+    ticket = None
+    Preview.mute()  # no page to show previews on
+    try:
+        main_probe = _probe(main_pdf) if main_pdf else None
+        wc_probe = _probe(wc_pdf) if wc_pdf else None
+        pages = sum(p["page_count"] if p else 1 for p, data in ((main_probe, main_pdf), (wc_probe, wc_pdf)) if data)
+
+        def on_wait(position, queue_length, eta_seconds):
+            _update_job(job_id, status="queued", position=position, estimated_wait_s=round(eta_seconds, 1))
+
+        ticket = JobQueue.acquire(pages, on_wait=on_wait)
+        _update_job(job_id, status="running", position=0, estimated_wait_s=0, started=time.time())
+        Deadlines.start_run()
+        Profiling.start_run(True, trace_memory=False, underwriter=underwriter, job_id=job_id)
+        try:
+            word_io, shape, result = ProposalPipeline.generate_proposal(
+                main_pdf, wc_pdf, io.BytesIO(excel) if excel else None,
+                main_probe=main_probe if main_probe and main_probe["kind"] == "main" else None,
+                underwriter=underwriter,
+            )
+        finally:
+            run_record = Profiling.finish_run(write=False)
+        ProposalPipeline.record_telemetry(
+            run_record, main_pdf, wc_pdf, shape, underwriter,
+            page_count=main_probe["page_count"] if main_probe else None,
+        )
+        meta = {
+            "job_id": job_id,
+            "status": "done",
+            "underwriter": underwriter,
+            "pages": pages,
+            "finished": time.time(),
+            "skipped_sections": Deadlines.skipped_sections(),
+            "shape": shape,
+        }
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        docx_path, meta_path = _result_paths(job_id)
+        # The metadata file goes last: its presence marks the job as stored
+        for path, data, mode in ((docx_path, word_io.getvalue(), "wb"),
+                                 (_extraction_path(job_id), result.to_json(), "w"),
+                                 (meta_path, json.dumps(meta, indent=2), "w")):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        BookOfBusiness.record(result)
+        _forget_job(job_id)
+    except JobQueue.QueueFull as e:
+        _fail_job(job_id, f"Server busy: {e}")
+    except Exception as e:
+        traceback.print_exc()
+        _fail_job(job_id, f"{e.__class__.__name__}: {e}")
+    finally:
+        JobQueue.release(ticket)
+
+def submit_job(main_pdf, wc_pdf, excel, underwriter):
+    """
+    Start (or reuse) the job for an upload and return its status dict.
+    Raises ValueError for an underwriter without a template.
+    """
+    if underwriter not in ProposalPipeline.UNDERWRITERS:
+        raise ValueError(f"Unknown underwriter {underwriter!r}")
+    job_id = upload_hash(main_pdf, wc_pdf, excel, underwriter)
+    with _jobs_lock:
+        _prune_jobs()
+        job = _jobs.get(job_id)
+        if job is not None and job["status"] != "failed":
+            return dict(job)
+        stored = _stored_result(job_id)
+        if stored is not None:
+            return stored
+        pending = sum(1 for j in _jobs.values() if j["status"] in ("queued", "running"))
+        if pending >= JobQueue.WORKERS + JobQueue.MAX_QUEUED:
+            raise JobQueue.QueueFull(f"{pending} proposals are already in progress")
+        _jobs[job_id] = {"job_id": job_id, "status": "queued", "submitted": time.time()}
+        job = dict(_jobs[job_id])
+    _executor.submit(run_job, job_id, main_pdf, wc_pdf, excel, underwriter)
+    return job
+
+def job_status(job_id):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            return dict(job)
+    return _stored_result(job_id)
+
+class JobsHandler(tornado.web.RequestHandler):
+    def post(self):
+        files = self.request.files
+
+        def upload(field):
+            return files[field][0]["body"] if field in files else None
+
+        main_pdf, wc_pdf, excel = upload("main_pdf"), upload("wc_pdf"), upload("excel")
+        if not main_pdf and not wc_pdf:
+            raise tornado.web.HTTPError(400, reason="Upload main_pdf and/or wc_pdf")
+        try:
+            job = submit_job(main_pdf, wc_pdf, excel, self.get_body_argument("underwriter", ""))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Unknown underwriter")
+        except JobQueue.QueueFull:
+            self.set_header("Retry-After", "60")
+            raise tornado.web.HTTPError(503, reason="Proposal server at capacity")
+        job_id = job["job_id"]
+        self.set_status(200 if job["status"] == "done" else 202)
+        self.write({**job, "status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/docx"})
+
+class JobStatusHandler(tornado.web.RequestHandler):
+    def get(self, job_id):
+        job = job_status(job_id)
+        if job is None:
+            raise tornado.web.HTTPError(404, reason="Unknown job")
+        self.write(job)
+
+class JobResultHandler(tornado.web.RequestHandler):
+    def get(self, job_id):
+        job = job_status(job_id)
+        if job is None:
+            raise tornado.web.HTTPError(404, reason="Unknown job")
+        if job["status"] != "done":
+            raise tornado.web.HTTPError(409, reason=f"Job is {job['status']}")
+        docx_path, _ = _result_paths(job_id)
+        self.set_header("Content-Type", DOCX_MIME)
+        self.set_header("Content-Disposition", f'attachment; filename="proposal_{job_id[:12]}.docx"')
+        with open(docx_path, "rb") as f:
+            self.write(f.read())
+
+class JobExtractionHandler(tornado.web.RequestHandler):
+    def get(self, job_id):
+        job = job_status(job_id)
+        if job is None:
+            raise tornado.web.HTTPError(404, reason="Unknown job")
+        if job["status"] != "done":
+            raise tornado.web.HTTPError(409, reason=f"Job is {job['status']}")
+        path = _extraction_path(job_id)
+        if not os.path.exists(path):  # stored before results were kept
+            raise tornado.web.HTTPError(404, reason="No extracted tables for this job")
+        self.set_header("Content-Type", "application/json")
+        with open(path, "rb") as f:
+            self.write(f.read())
+
+def make_app():
+    return tornado.web.Application([
+        (r"/jobs", JobsHandler),
+        (r"/jobs/([0-9a-f]{64})", JobStatusHandler),
+        (r"/jobs/([0-9a-f]{64})/docx", JobResultHandler),
+        (r"/jobs/([0-9a-f]{64})/result", JobExtractionHandler),
+    ])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Proposal generation job API")
+    parser.add_argument("--address", default=os.environ.get("PROPOSAL_API_ADDRESS", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PROPOSAL_API_PORT", 8600)))
+    args = parser.parse_args()
+    make_app().listen(args.port, address=args.address, max_body_size=MAX_UPLOAD_BYTES)
+    print(f"Proposal job API listening on http://{args.address}:{args.port}")
+    tornado.ioloop.IOLoop.current().start()
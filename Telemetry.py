@@ -0,0 +1,184 @@
+import os
+import re
+import json
+import sqlite3
+import datetime
+
+############################################
+# Local SQLite store of proposal run performance
+############################################
+DB_PATH = os.environ.get(
+    "PROPOSAL_TELEMETRY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry.db")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    underwriter TEXT,
+    file_size INTEGER,
+    page_count INTEGER,
+    lobs TEXT,
+    vehicle_count INTEGER,
+    location_count INTEGER,
+    state_count INTEGER,
+    total_s REAL
+);
+CREATE TABLE IF NOT EXISTS section_timings (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    section TEXT NOT NULL,
+    wall_s REAL,
+    cpu_s REAL,
+    calls INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs(started_at);
+CREATE INDEX IF NOT EXISTS idx_section_timings_run ON section_timings(run_id);
+"""
+
+# Stage name prefix (module or "Word:") -> proposal section
+STAGE_SECTIONS = {
+    "PdfProbe": "Classify",
+    "Page text": "Page Text",
+    "PolicyForms": "Policy Forms",
+    "Policy": "Policy Information",
+    "Property": "Property",
+    "GL": "General Liability",
+    "Auto": "Auto",
+    "Umbrella": "Umbrella",
+    "Employment": "Employment",
+    "inlandmarine": "Inland Marine",
+    "WC": "Workers Compensation",
+    "Word": "Word Export",
+    "Texas PIP stamping": "Word Export",
+}
+
+# Page-count buckets used as "account size"
+ACCOUNT_SIZES = [(20, "Small (1-20 pages)"), (60, "Medium (21-60 pages)"), (None, "Large (61+ pages)")]
+
+def connect(db_path=None):
+    conn = sqlite3.connect(db_path or DB_PATH)
+    conn.executescript(SCHEMA)
+    return conn
+
+def stage_section(stage_name: str) -> str:
+    if stage_name in STAGE_SECTIONS:
+        return STAGE_SECTIONS[stage_name]
+    return STAGE_SECTIONS.get(re.split(r"[.:]", stage_name, 1)[0], "Other")
+
+def section_durations(record) -> dict:
+    """Sum the top-level stages of a Profiling run record per section."""
+    sections = {}
+    for item in (record or {}).get("stages", []):
+        if item.get("depth"):
+            continue
+        entry = sections.setdefault(stage_section(item["stage"]), {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+        entry["wall_s"] += item.get("wall_s") or 0.0
+        entry["cpu_s"] += item.get("cpu_s") or 0.0
+        entry["calls"] += 1
+    return sections
+
+def record_run(record, file_size=None, page_count=None, lobs=(), vehicle_count=None,
+               location_count=None, state_count=None, underwriter=None, db_path=None):
+    """
+    Store one run and its per-section durations. Returns the run id, or None
+    if the database could not be written; telemetry never fails a proposal.
+    """
+    if not record:
+        return None
+    try:
+        conn = connect(db_path)
+        try:
+            with conn:
+                cur = conn.execute(
+                    "INSERT INTO runs (started_at, underwriter, file_size, page_count, lobs, "
+                    "vehicle_count, location_count, state_count, total_s) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        record.get("started_at") or datetime.datetime.now().isoformat(timespec="seconds"),
+                        underwriter, file_size, page_count, json.dumps(sorted(lobs)),
+                        vehicle_count, location_count, state_count,
+                        record.get("meta", {}).get("total_s", record.get("wall_s")),
+                    ),
+                )
+                run_id = cur.lastrowid
+                conn.executemany(
+                    "INSERT INTO section_timings (run_id, section, wall_s, cpu_s, calls) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (run_id, section, round(v["wall_s"], 4), round(v["cpu_s"], 4), v["calls"])
+                        for section, v in section_durations(record).items()
+                    ],
+                )
+            return run_id
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+def account_size(page_count) -> str:
+    if page_count is None or page_count != page_count:  # None or NaN
+        return "Unknown"
+    for limit, label in ACCOUNT_SIZES:
+        if limit is None or page_count <= limit:
+            return label
+    return "Unknown"
+
+def load_runs(db_path=None, since=None):
+    """Runs as a DataFrame, newest first, optionally only those started on/after since."""
+    import pandas as pd
+
+    conn = connect(db_path)
+    try:
+        query = "SELECT * FROM runs"
+        params = ()
+        if since:
+            query += " WHERE started_at >= ?"
+            params = (str(since),)
+        df = pd.read_sql_query(query + " ORDER BY started_at DESC", conn, params=params)
+    finally:
+        conn.close()
+    df["started_at"] = pd.to_datetime(df["started_at"])
+    df["account_size"] = [account_size(p) for p in df["page_count"]]
+    df["lobs"] = [", ".join(json.loads(v or "[]")) for v in df["lobs"]]
+    return df
+
+def load_section_timings(db_path=None, since=None):
+    """Section durations joined with their run's date and account shape."""
+    import pandas as pd
+
+    conn = connect(db_path)
+    try:
+        query = (
+            "SELECT s.run_id, s.section, s.wall_s, s.cpu_s, s.calls, r.started_at, r.page_count, "
+            "r.vehicle_count, r.location_count, r.state_count, r.lobs "
+            "FROM section_timings s JOIN runs r ON r.id = s.run_id"
+        )
+        params = ()
+        if since:
+            query += " WHERE r.started_at >= ?"
+            params = (str(since),)
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+    df["started_at"] = pd.to_datetime(df["started_at"])
+    df["account_size"] = [account_size(p) for p in df["page_count"]]
+    return df
+
+def latency_percentiles(df, by, value="wall_s"):
+    """p50/p95/p99 and run count of value grouped by the by column(s)."""
+    import pandas as pd
+
+    if df.empty:
+        return pd.DataFrame(columns=["p50", "p95", "p99", "runs"])
+    grouped = df.groupby(by)[value]
+    out = grouped.quantile([0.5, 0.95, 0.99]).unstack()
+    out.columns = ["p50", "p95", "p99"]
+    out["runs"] = grouped.size()
+    return out.round(3).sort_values("p95", ascending=False)
+
+def daily_trend(df, value="wall_s", by=None):
+    """Daily p50/p95 of value, optionally split by a column."""
+    if df.empty:
+        return df
+    keys = [df["started_at"].dt.date.rename("day")] + ([df[by]] if by else [])
+    out = df.groupby(keys)[value].quantile([0.5, 0.95]).unstack()
+    out.columns = ["p50", "p95"]
+    return out.round(3)
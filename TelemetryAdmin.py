@@ -0,0 +1,60 @@
+import datetime
+
+import streamlit as st
+
+import Telemetry
+
+############################################
+# Performance admin page
+# Run with: python -m streamlit run TelemetryAdmin.py
+############################################
+st.set_page_config(page_title="Proposal Performance", layout="wide", page_icon="⏱")
+
+def main():
+    st.title("Proposal Performance")
+    days = st.sidebar.selectbox("Window", [7, 30, 90, 365], index=1, format_func=lambda d: f"Last {d} days")
+    since = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat(timespec="seconds")
+
+    runs = Telemetry.load_runs(since=since)
+    if runs.empty:
+        st.info(f"No proposal runs recorded in {Telemetry.DB_PATH} for this window.")
+        return
+    sections = Telemetry.load_section_timings(since=since)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Runs", len(runs))
+    col2.metric("p50 total", f"{runs['total_s'].quantile(0.5):.1f}s")
+    col3.metric("p95 total", f"{runs['total_s'].quantile(0.95):.1f}s")
+    col4.metric("p99 total", f"{runs['total_s'].quantile(0.99):.1f}s")
+
+    st.subheader("Latency by section (seconds)")
+    st.dataframe(Telemetry.latency_percentiles(sections, "section"), use_container_width=True)
+
+    st.subheader("Total latency by account size (seconds)")
+    st.dataframe(Telemetry.latency_percentiles(runs, "account_size", value="total_s"), use_container_width=True)
+
+    st.subheader("Section latency by account size (p95 seconds)")
+    by_size = Telemetry.latency_percentiles(sections, ["section", "account_size"])
+    if not by_size.empty:
+        st.dataframe(by_size["p95"].unstack("account_size"), use_container_width=True)
+
+    st.subheader("Total latency by lines of business (seconds)")
+    st.dataframe(Telemetry.latency_percentiles(runs, "lobs", value="total_s"), use_container_width=True)
+
+    st.subheader("Daily trend")
+    trend = Telemetry.daily_trend(runs, value="total_s")
+    st.line_chart(trend)
+    section = st.selectbox("Section trend", sorted(sections["section"].unique()))
+    st.line_chart(Telemetry.daily_trend(sections[sections["section"] == section]))
+
+    st.subheader("Slowest runs")
+    st.dataframe(
+        runs.sort_values("total_s", ascending=False).head(25)[
+            ["started_at", "underwriter", "total_s", "page_count", "file_size", "lobs",
+             "vehicle_count", "location_count", "state_count"]
+        ],
+        use_container_width=True, hide_index=True,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import json
+import threading
+from io import BytesIO
+from contextlib import contextmanager
+
+import PageStream
+
+############################################
+# Per-section text backend, tuned by BackendTuner.py
+############################################
+# Only these sections read plain page text and can switch libraries. General
+# Liability, Auto, Inland Marine, Umbrella and Employment parse pdfplumber
+# text positions and table geometry, so they keep their fixed readers and
+# are not tuned.
+BACKENDS = ("pdfplumber", "pymupdf", "pypdf", "pdfminer")
+# What each section used before tuning; also the fallback for bad config entries
+DEFAULT_BACKENDS = {
+    "Policy Information": "pdfminer",
+    "Property": "pdfplumber",
+    "Policy Forms": "pdfplumber",
+    "Workers Compensation": "pdfplumber",
+}
+CONFIG_PATH = os.environ.get(
+    "PROPOSAL_TEXT_BACKENDS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "text_backends.json")
+)
+
+_configured = {}
+_overrides = threading.local()
+
+def load_config(path=None) -> dict:
+    """
+    Read {section: backend} from the tuner's config file (the "backends" key).
+    Unknown sections or backends are ignored; a missing file means defaults.
+    """
+    try:
+        with open(path or CONFIG_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    backends = data.get("backends", {}) if isinstance(data, dict) else {}
+    _configured.clear()
+    _configured.update({
+        section: backend for section, backend in backends.items()
+        if section in DEFAULT_BACKENDS and backend in BACKENDS
+    })
+    return dict(_configured)
+
+def backend_for(section: str) -> str:
+    forced = getattr(_overrides, "backends", {})
+    if section in forced:
+        return forced[section]
+    return _configured.get(section, DEFAULT_BACKENDS[section])
+
+@contextmanager
+def override(section: str, backend: str):
+    """Use backend for section on this thread while the block runs (for the tuner)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown text backend {backend!r}; expected one of {BACKENDS}")
+    forced = getattr(_overrides, "backends", None)
+    if forced is None:
+        forced = _overrides.backends = {}
+    previous = forced.get(section)
+    forced[section] = backend
+    try:
+        yield
+    finally:
+        if previous is None:
+            forced.pop(section, None)
+        else:
+            forced[section] = previous
+
+def _pdfminer_text(pdf_bytes):
+    from pdfminer.high_level import extract_text
+
+    return extract_text(BytesIO(pdf_bytes))
+
+def page_texts(pdf_bytes, backend: str, pages=None) -> list:
+    """
+    Text of each requested page (all by default) read with backend. Text
+    PageStream.prefetch attached is only used for the backend it was read
+    with; any other backend reads the PDF itself.
+    """
+    if backend == "pdfplumber":
+        return PageStream.read_page_texts(pdf_bytes, pages)
+    pdf_bytes = bytes(pdf_bytes)
+    if backend == "pymupdf":
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            indexes = range(doc.page_count) if pages is None else pages
+            return [doc[i].get_text() for i in indexes]
+        finally:
+            doc.close()
+    if backend == "pypdf":
+        from pypdf import PdfReader
+
+        reader = PdfReader(BytesIO(pdf_bytes))
+        indexes = range(len(reader.pages)) if pages is None else pages
+        return [reader.pages[i].extract_text() or "" for i in indexes]
+    if backend == "pdfminer":
+        # pdfminer ends every page with a form feed
+        texts = _pdfminer_text(pdf_bytes).split("\f")
+        if texts and not texts[-1]:
+            texts.pop()
+        return texts if pages is None else [texts[i] if i < len(texts) else "" for i in pages]
+    raise ValueError(f"Unknown text backend {backend!r}; expected one of {BACKENDS}")
+
+def read_text(pdf_bytes, section: str) -> str:
+    """
+    Full text of the PDF with the section's backend. pdfminer returns its own
+    full-document text; the others join the non-empty pages with newlines.
+    """
+    backend = backend_for(section)
+    if backend == "pdfminer":
+        return _pdfminer_text(pdf_bytes)
+    return "".join(t + "\n" for t in page_texts(pdf_bytes, backend) if t)
+
+load_config()
@@ -1,8 +1,10 @@
 import io
 import re
 import pandas as pd
-import pdfplumber
 import streamlit as st  # only needed if you are running this as a standalone app
+import PageStream
+from PdfProbe import UMBRELLA_HEADING_RE, FORMS_HEADING_RE
+from PolicyForms import parse_line_into_columns, parse_policy_forms_for_lob
 
 def ensure_file_like(pdf_file):
     if isinstance(pdf_file, bytes):
@@ -17,81 +19,77 @@ def make_table_cells_editable(html_str: str) -> str:
     replace = r'<td contenteditable="true"\2'
     return re.sub(pattern, replace, html_str, flags=re.IGNORECASE)
 
-def parse_line_into_columns(line: str) -> list:
-    """
-    Splits a single line into [Number, Edition, Description].
-    Looks for a token matching MM-YYYY as 'Edition'. If not found,
-    entire line is 'Number' and Edition/Description are blank.
-    """
-    tokens = line.split()
-    number_parts = []
-    edition = ""
-    description_parts = []
-    edition_pattern = re.compile(r"^\d{2}-\d{4}$")
-    found_edition = False
-    for token in tokens:
-        if not found_edition and edition_pattern.match(token):
-            edition = token
-            found_edition = True
-        else:
-            if not found_edition:
-                number_parts.append(token)
-            else:
-                description_parts.append(token)
-    number = " ".join(number_parts).strip()
-    description = " ".join(description_parts).strip()
-    return [number, edition, description]
 
 def parse_policy_forms_for_umbrella(text: str) -> dict:
     """
     Parse forms starting at "SCHEDULE OF FORMS AND ENDORSEMENTS"
     for "Commercial Umbrella Coverage Part".
     """
-    coverage_titles = ["Commercial Umbrella Coverage Part"]
-    start_phrase = "SCHEDULE OF FORMS AND ENDORSEMENTS"
-    start_index = text.find(start_phrase)
-    if start_index == -1:
-        return {}
-    relevant_lines = text[start_index:].splitlines()
-    sections = {}
-    current_title = None
-    i = 0
-    while i < len(relevant_lines):
-        line = relevant_lines[i].strip()
-        if line in coverage_titles:
-            current_title = line
-            sections[current_title] = []
-            i += 1
-            # Skip header if present
-            if i < len(relevant_lines):
-                possible_header_line = relevant_lines[i].lower().strip()
-                if ("number" in possible_header_line and
-                    "edition" in possible_header_line and
-                    "description" in possible_header_line):
-                    i += 1
-            continue
-        if current_title:
-            # If a new section starts, break out of the current umbrella section
-            if line.startswith("Commercial ") and (line not in coverage_titles):
-                current_title = None
-                i -= 1  # reprocess this line
-            else:
-                row = parse_line_into_columns(line)
-                number, edition, description = row
-                if not edition:
-                    if sections[current_title]:
-                        sections[current_title][-1][2] += " " + " ".join(
-                            part for part in [number, description] if part
-                        )
-                        sections[current_title][-1][2] = sections[current_title][-1][2].strip()
-                    else:
-                        sections[current_title].append(["", "", number + " " + description])
-                else:
-                    sections[current_title].append(row)
-        i += 1
-    return sections
+    return parse_policy_forms_for_lob(text, "Umbrella")
+
+# Starts the section when a packet has no Umbrella quote proposal heading.
+# SCHEDULE OF UNDERLYING INSURANCE and SELF-INSURED RETENTION also appear
+# in other lines' pages, so they are only read inside the range.
+UMBRELLA_PREMIUM_RE = re.compile(r"UMBRELLA\s+OR\s+EXCESS\s+LIABILITY\s+COVERAGES\s+PREMIUM")
+QUOTE_PROPOSAL_RE = re.compile(r"QUOTE\s+PROPOSAL")
+
+def find_umbrella_page_range(page_texts):
+    """
+    Return (start, end) page indexes of the Umbrella proposal, or None.
+    The range starts at the Umbrella quote proposal heading (or, without
+    one, the Umbrella premium page) and ends on the page where the next
+    (non-Umbrella) quote proposal begins.
+    """
+    start = next((i for i, t in enumerate(page_texts) if UMBRELLA_HEADING_RE.search(t)), None)
+    if start is None:
+        start = next((i for i, t in enumerate(page_texts) if UMBRELLA_PREMIUM_RE.search(t)), None)
+    if start is None:
+        return None
+    for i in range(start + 1, len(page_texts)):
+        text = page_texts[i]
+        if QUOTE_PROPOSAL_RE.search(text) and not UMBRELLA_HEADING_RE.search(text):
+            return start, i + 1
+    return start, len(page_texts)
+
+def read_umbrella_pages(pdf_file, include_forms=True, raw_pages=None):
+    """
+    Probe every page with PyMuPDF (unless raw_pages already holds that text),
+    then let pdfplumber read only the Umbrella proposal pages and, if
+    include_forms, the forms schedule pages.
+    Returns (section_lines, forms_text).
+    """
+    if isinstance(pdf_file, bytes):
+        pdf_bytes = pdf_file  # keeps any text PageStream.prefetch attached
+    else:
+        pdf_file.seek(0)
+        pdf_bytes = pdf_file.read()
+    if raw_pages is None:
+        import fitz  # PyMuPDF, only used for the page probe
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            raw_pages = [page.get_text("text") for page in doc]
+        finally:
+            doc.close()
+
+    page_range = find_umbrella_page_range(raw_pages)
+    if page_range is None:
+        return [], ""
+    forms_start = len(raw_pages)
+    if include_forms:
+        forms_start = next((i for i, t in enumerate(raw_pages) if FORMS_HEADING_RE.search(t)), len(raw_pages))
 
-def extract_umbrella_data(pdf_file):
+    section_lines = []
+    forms_pages = []
+    wanted = list(range(*page_range)) + list(range(forms_start, len(raw_pages)))
+    for i, text in PageStream.iter_page_texts(pdf_bytes, wanted):
+        if i < page_range[1]:
+            section_lines.extend(text.splitlines())
+        else:
+            forms_pages.append(text)
+    return section_lines, "\n".join(forms_pages)
+
+def extract_umbrella_data(pdf_file, policy_forms_sections=None, raw_pages=None):
     """
     Extract umbrella-related data from the PDF file.
     Returns a dictionary with the following keys:
@@ -100,33 +98,82 @@ def extract_umbrella_data(pdf_file):
       - "Retention": DataFrame for Self-Insured Retention.
       - "Schedule": List of tuples (header, DataFrame) for Schedule of Underlying Insurance.
       - "PolicyForms": dict of DataFrames for Umbrella Policy Forms.
+    Only the Umbrella proposal pages are read, and all four blocks are
+    collected in a single pass over their lines. Pass policy_forms_sections
+    (title -> rows) when the forms schedule was already parsed, and
+    raw_pages to reuse an earlier PyMuPDF probe.
     """
-    pdf_file = ensure_file_like(pdf_file)
-    # Extract full text from the PDF.
-    full_text = ""
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            full_text += page_text + "\n"
-    # Split the full text into lines.
-    lines = full_text.splitlines()
+    lines, forms_text = read_umbrella_pages(
+        pdf_file, include_forms=policy_forms_sections is None, raw_pages=raw_pages
+    )
 
-    # ---------------------------
-    # Coverage & Premium Extraction
-    # ---------------------------
     cp_start_keyword = "UMBRELLA OR EXCESS LIABILITY COVERAGES PREMIUM"
     cp_stop_keyword = "LIMITS OF INSURANCE"
-    found_cp_start = False
+    # We first look for "COMMERCIAL LIABILITY UMBRELLA QUOTE PROPOSAL",
+    # then from there find "LIMITS OF INSURANCE".
+    umbrella_keyword = "COMMERCIAL LIABILITY UMBRELLA QUOTE PROPOSAL"
+    li_start_keyword = "LIMITS OF INSURANCE"
+    schedule_start_keyword = "SCHEDULE OF UNDERLYING INSURANCE"
+    termination_markers = ["COMMERCIAL INLAND MARINE", "QUOTE PROPOSAL"]
+
+    # Each block keeps its own state: 0 = looking for start, 1 = capturing, 2 = done.
+    # Limits needs an extra step (umbrella keyword, then LIMITS OF INSURANCE).
+    cp_state = 0
+    li_state = 0
+    schedule_state = 0
     cp_lines = []
+    li_lines = []
+    schedule_lines = []
+    retention_line = None
+
     for line in lines:
         stripped = line.strip()
-        if not found_cp_start:
-            if cp_start_keyword in stripped.upper():
-                found_cp_start = True
-        else:
-            if cp_stop_keyword in stripped.upper():
-                break
-            cp_lines.append(stripped)
+        upper = stripped.upper()
+
+        # Coverage & Premium
+        if cp_state == 0:
+            if cp_start_keyword in upper:
+                cp_state = 1
+        elif cp_state == 1:
+            if cp_stop_keyword in upper:
+                cp_state = 2
+            else:
+                cp_lines.append(stripped)
+
+        # Limits of Insurance
+        if li_state == 0:
+            if umbrella_keyword in upper:
+                li_state = 1
+        elif li_state == 1:
+            if li_start_keyword in upper:
+                li_state = 2
+        elif li_state == 2:
+            # Stop at Self-Insured Retention or at a new heading without a dollar sign
+            if "SELF-INSURED RETENTION" in upper or (upper and "$" not in upper):
+                li_state = 3
+            else:
+                li_lines.append(stripped)
+
+        # Self-Insured Retention
+        if retention_line is None and "SELF-INSURED RETENTION:" in upper:
+            retention_line = stripped
+
+        # Schedule of Underlying Insurance
+        if schedule_state == 0:
+            if schedule_start_keyword in upper:
+                schedule_state = 1
+        elif schedule_state == 1:
+            if any(marker in upper for marker in termination_markers):
+                schedule_state = 2
+            else:
+                schedule_lines.append(stripped)
+
+        if cp_state == 2 and li_state == 3 and schedule_state == 2 and retention_line is not None:
+            break
+
+    # ---------------------------
+    # Coverage & Premium
+    # ---------------------------
     cp_rows = []
     for ln in cp_lines:
         if ln.upper().startswith("TOTAL QUOTE PREMIUM") and ln == ln.upper():
@@ -140,41 +187,8 @@ def extract_umbrella_data(pdf_file):
     coverage_premium_data = pd.DataFrame(cp_rows) if cp_rows else pd.DataFrame()
 
     # ---------------------------
-    # Limits of Insurance Extraction
+    # Limits of Insurance
     # ---------------------------
-    # We first look for "COMMERCIAL LIABILITY UMBRELLA QUOTE PROPOSAL",
-    # then from there find "LIMITS OF INSURANCE".
-    umbrella_keyword = "COMMERCIAL LIABILITY UMBRELLA QUOTE PROPOSAL"
-    li_start_keyword = "LIMITS OF INSURANCE"
-    found_umbrella_keyword = False
-    found_li_start = False
-    li_lines = []
-
-    for line in lines:
-        stripped = line.strip().upper()
-
-        if not found_umbrella_keyword:
-            # Search for "COMMERCIAL LIABILITY UMBRELLA QUOTE PROPOSAL"
-            if umbrella_keyword in stripped:
-                found_umbrella_keyword = True
-            continue
-
-        if found_umbrella_keyword and not found_li_start:
-            # Next, we look for "LIMITS OF INSURANCE"
-            if li_start_keyword in stripped:
-                found_li_start = True
-            continue
-
-        # Once both are found, start capturing lines
-        if found_umbrella_keyword and found_li_start:
-            # Stop if we reach Self-Insured Retention
-            if "SELF-INSURED RETENTION" in stripped:
-                break
-            # Also stop if we find an all-caps line (a new heading) without a dollar sign
-            if stripped and stripped == stripped.upper() and "$" not in stripped:
-                break
-            li_lines.append(line.strip())
-
     li_rows = []
     for ln in li_lines:
         if not ln or ln.startswith("("):
@@ -192,13 +206,8 @@ def extract_umbrella_data(pdf_file):
     limits_data = pd.DataFrame(li_rows) if li_rows else pd.DataFrame()
 
     # ---------------------------
-    # Self-Insured Retention Extraction
+    # Self-Insured Retention
     # ---------------------------
-    retention_line = None
-    for line in lines:
-        if "SELF-INSURED RETENTION:" in line.upper():
-            retention_line = line.strip()
-            break
     if retention_line:
         retention_line = re.sub(r"^\d+\.\s*", "", retention_line)
         parts = retention_line.split(":", 1)
@@ -213,27 +222,8 @@ def extract_umbrella_data(pdf_file):
         retention_data = pd.DataFrame()
 
     # ---------------------------
-    # Schedule of Underlying Insurance Extraction
+    # Schedule of Underlying Insurance
     # ---------------------------
-    schedule_start_keyword = "SCHEDULE OF UNDERLYING INSURANCE"
-    termination_markers = ["COMMERCIAL INLAND MARINE", "QUOTE PROPOSAL"]
-    found_schedule = False
-    schedule_lines = []
-    for line in lines:
-        stripped = line.strip()
-        if not found_schedule:
-            if schedule_start_keyword in stripped.upper():
-                found_schedule = True
-        else:
-            term_found = False
-            for marker in termination_markers:
-                if marker in stripped.upper():
-                    term_found = True
-                    break
-            if term_found:
-                break
-            schedule_lines.append(stripped)
-
     groups = []
     current_group = None
     for ln in schedule_lines:
@@ -271,7 +261,8 @@ def extract_umbrella_data(pdf_file):
     # ---------------------------
     # Policy Forms Extraction (Commercial Umbrella)
     # ---------------------------
-    policy_forms_sections = parse_policy_forms_for_umbrella(full_text)
+    if policy_forms_sections is None:
+        policy_forms_sections = parse_policy_forms_for_umbrella(forms_text)
     policy_forms = {}
     for title, rows in policy_forms_sections.items():
         policy_forms[title] = pd.DataFrame(rows, columns=["Number", "Edition", "Description"])
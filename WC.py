@@ -2,6 +2,9 @@ import streamlit as st
 import io
 import re
 import pandas as pd
+import PageStream
+import TextBackends
+from PolicyForms import parse_line_into_columns, parse_policy_forms_for_lob
 
 #########################################
 # 1) Global CSS to center table headers
@@ -63,6 +66,13 @@ def get_pdf_lines(file_bytes):
     lines = fix_split_notice_lines(lines)
     return lines
 
+def get_pdf_text(file_bytes):
+    """
+    Full text of the PDF with the backend configured for Workers
+    Compensation (pdfplumber unless BackendTuner picked another).
+    """
+    return TextBackends.read_text(file_bytes, "Workers Compensation")
+
 #########################################
 # Additional PDF extraction debug functions
 #########################################
@@ -72,25 +82,14 @@ def get_pdf_text_pypdf2(file_bytes):
     """
     import PyPDF2
     reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-    text = ""
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text + "\n"
-    return text
+    texts = (page.extract_text() for page in reader.pages)
+    return "".join(t + "\n" for t in texts if t)
 
 def get_pdf_text_pdfplumber(file_bytes):
     """
     Use pdfplumber to extract text from the PDF.
     """
-    import pdfplumber
-    text = ""
-    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
+    return "".join(t + "\n" for t in PageStream.read_page_texts(file_bytes) if t)
 
 def get_pdf_text_pymupdf(file_bytes):
     """
@@ -98,10 +97,10 @@ def get_pdf_text_pymupdf(file_bytes):
     """
     import fitz  # PyMuPDF
     doc = fitz.open(stream=file_bytes, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text() + "\n"
-    return text
+    try:
+        return "".join(page.get_text() + "\n" for page in doc)
+    finally:
+        doc.close()
 
 #########################################
 # Camelot Stream Debug Function
@@ -363,13 +362,7 @@ def extract_table_3_pdfplumber(file_bytes):
     """
     This is unchanged from your previously perfect version.
     """
-    import pdfplumber
-    text = ""
-    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
+    text = "".join(t + "\n" for t in PageStream.read_page_texts(file_bytes) if t)
     lines = text.splitlines()
     
     premium_idx = None
@@ -670,40 +663,6 @@ def extract_state_segments(lines):
         segments.append(current_segment)
     return segments
 
-#########################################
-# NEW: Helper function to parse a single line into columns
-#########################################
-def parse_line_into_columns(line: str) -> list:
-    """
-    Splits a single line into [Number, Edition, Description].
-    1) Looks for a token matching a MM-YYYY pattern as 'Edition'.
-    2) Everything before that is 'Number'; everything after is 'Description'.
-    3) If no Edition is found, the entire line is treated as Number and Description is empty.
-    """
-    tokens = line.split()
-    number_parts = []
-    edition = ""
-    description_parts = []
-
-    # Pattern for something like 09-2008
-    edition_pattern = re.compile(r"^\d{2}-\d{4}$")
-
-    found_edition = False
-    for token in tokens:
-        if not found_edition and edition_pattern.match(token):
-            edition = token
-            found_edition = True
-        else:
-            if not found_edition:
-                number_parts.append(token)
-            else:
-                description_parts.append(token)
-
-    number = " ".join(number_parts).strip()
-    description = " ".join(description_parts).strip()
-
-    return [number, edition, description]
-
 #########################################
 # NEW: Modified Policy Forms Extraction for Workers Comp
 #########################################
@@ -720,61 +679,7 @@ def parse_policy_forms(text: str) -> dict:
       - "Commercial Common Forms"
       - "Commercial Workers Compensation"
     """
-    coverage_titles = [
-        "Commercial Common Forms",
-        "Commercial Workers Compensation"
-    ]
-
-    start_index = text.find("SCHEDULE OF FORMS AND ENDORSEMENTS")
-    if start_index == -1:
-        return {}
-
-    relevant_lines = text[start_index:].splitlines()
-    sections = {}
-    current_title = None
-    i = 0
-
-    while i < len(relevant_lines):
-        line = relevant_lines[i].strip()
-
-        # If line is one of our coverage titles, start a new section
-        if line in coverage_titles:
-            current_title = line
-            sections[current_title] = []
-            i += 1
-            # If the next line is "Number Edition Description", skip it
-            if i < len(relevant_lines):
-                possible_header_line = relevant_lines[i].lower().strip()
-                if ("number" in possible_header_line and
-                    "edition" in possible_header_line and
-                    "description" in possible_header_line):
-                    i += 1
-            continue
-
-        # If we are currently in a coverage section
-        if current_title:
-            # If a new "Commercial " heading appears that isn't in coverage_titles, end the current section
-            if line.startswith("Commercial ") and (line not in coverage_titles):
-                current_title = None
-                i -= 1  # Reprocess this line next loop
-            else:
-                row = parse_line_into_columns(line)
-                number, edition, description = row
-                # If no edition => treat as a continuation
-                if not edition:
-                    if sections[current_title]:
-                        sections[current_title][-1][2] += " " + " ".join(
-                            part for part in [number, description] if part
-                        )
-                        sections[current_title][-1][2] = sections[current_title][-1][2].strip()
-                    else:
-                        sections[current_title].append(["", "", number + " " + description])
-                else:
-                    sections[current_title].append(row)
-
-        i += 1
-
-    return sections
+    return parse_policy_forms_for_lob(text, "Workers Compensation")
 
 #########################################
 # 8) Streamlit Main
@@ -1,9 +1,8 @@
 import streamlit as st
 import pandas as pd
 import re
-import pdfplumber
 from io import BytesIO
-import fitz  # PyMuPDF (for the Additional Coverages extraction)
+from contextlib import nullcontext
 import docx
 from docx.shared import Pt, RGBColor
 from docx.oxml import parse_xml
@@ -11,6 +10,16 @@ from docx.oxml.ns import nsdecls, qn
 from docx.oxml.shared import OxmlElement
 from docx.enum.section import WD_ORIENT
 from docx.enum.table import WD_TABLE_ALIGNMENT
+import PageStream
+from PdfProbe import IM_HEADING_RE, FORMS_HEADING_RE
+import Preview
+from PolicyForms import (
+    parse_line_into_columns,
+    remove_punctuation_and_spaces,
+    find_coverage_stop_index,
+    truncate_on_all_caps,
+    parse_policy_forms_for_lob
+)
 
 # ------------------------------------------------------------------
 # 1. GLOBAL CSS OVERRIDE
@@ -100,53 +109,121 @@ def format_table(df: pd.DataFrame):
 
     return df_formatted.style.format(fmt_dict)
 
-def extract_claim_id(pdf_file) -> str:
-    pdf_file.seek(0)
-    with pdfplumber.open(pdf_file) as pdf:
-        if pdf.pages:
-            text = pdf.pages[0].extract_text() or ""
-            m = re.search(r"Quote No\.\s*:\s*([A-Z0-9\-]+)", text)
-            if m:
-                return m.group(1).strip()
-    return None
-
-def extract_with_pdfplumber(pdf_file) -> tuple[pd.DataFrame, str]:
-    pdf_file.seek(0)
+def collect_coverage_part_lines(page_texts) -> list[str]:
+    """
+    Collect the lines after "Coverage Parts That Apply to This Policy:"
+    until "Rating Company". Stops pulling pages once the block has ended,
+    so page_texts can be a lazy generator.
+    """
     collected_lines = []
-    debug_details = ""
     found_proposal = False
     processing_section = False
+    section_done = False
+
+    for text in page_texts:
+        if not found_proposal and "COMMERCIAL INLAND MARINE QUOTE PROPOSAL" in text:
+            found_proposal = True
+
+        if found_proposal:
+            lines = text.splitlines()
+            if not processing_section and "Coverage Parts That Apply to This Policy:" in text:
+                processing_section = True
+                start_idx = None
+                for i, line in enumerate(lines):
+                    if "Coverage Parts That Apply to This Policy:" in line:
+                        start_idx = i + 1
+                        break
+                lines = lines[start_idx:] if start_idx is not None else []
+            elif not processing_section:
+                continue
+            for line in lines:
+                if "Rating Company" in line:
+                    processing_section = False
+                    section_done = True
+                    break
+                if line.strip():
+                    collected_lines.append(line.strip())
+        if section_done:
+            break
+
+    return collected_lines
+
+def load_inland_marine_document(pdf_file, include_forms=True, raw_pages=None) -> dict:
+    """
+    Parse the PDF once for the claim ID, coverage parts and policy forms.
+    PyMuPDF locates the Inland Marine proposal and the forms schedule;
+    pdfplumber only reads page 1, the proposal pages up to "Rating Company"
+    and the forms pages. Pass include_forms=False when the forms were already
+    parsed elsewhere, and raw_pages (PyMuPDF text per page) to skip the probe.
+    Passing an already loaded document returns it unchanged.
+    """
+    if isinstance(pdf_file, dict):
+        return pdf_file
+    import pdfplumber
 
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            if not found_proposal and "COMMERCIAL INLAND MARINE QUOTE PROPOSAL" in text:
-                found_proposal = True
-
-            if found_proposal:
-                if not processing_section and "Coverage Parts That Apply to This Policy:" in text:
-                    processing_section = True
-                    lines = text.splitlines()
-                    start_idx = None
-                    for i, line in enumerate(lines):
-                        if "Coverage Parts That Apply to This Policy:" in line:
-                            start_idx = i + 1
-                            break
-                    if start_idx is not None:
-                        for line in lines[start_idx:]:
-                            if "Rating Company" in line:
-                                processing_section = False
-                                break
-                            if line.strip():
-                                collected_lines.append(line.strip())
-                elif processing_section:
-                    lines = text.splitlines()
-                    for line in lines:
-                        if "Rating Company" in line:
-                            processing_section = False
-                            break
-                        if line.strip():
-                            collected_lines.append(line.strip())
+    if isinstance(pdf_file, bytes):
+        pdf_bytes = pdf_file
+    else:
+        pdf_file.seek(0)
+        pdf_bytes = pdf_file.read()
+
+    if raw_pages is None:
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            raw_pages = [page.get_text("text") for page in doc]
+        finally:
+            doc.close()
+    page_count = len(raw_pages)
+    proposal_start = next((i for i, t in enumerate(raw_pages) if IM_HEADING_RE.search(t)), None)
+    forms_start = page_count
+    if include_forms:
+        forms_start = next((i for i, t in enumerate(raw_pages) if FORMS_HEADING_RE.search(t)), page_count)
+
+    prefetched = PageStream.prefetched_texts(pdf_bytes)
+    texts = {i: t for i, t in enumerate(prefetched or ()) if t is not None}
+    fresh = {}
+    complete = prefetched is not None and len(texts) == len(prefetched)
+    with nullcontext() if complete else pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        def page_text(i):
+            if i not in texts:
+                page = pdf.pages[i]
+                texts[i] = fresh[i] = page.extract_text() or ""
+                PageStream.release_page(page)
+                if len(fresh) % PageStream.CHECK_EVERY == 0:
+                    PageStream.check_memory_budget(f"page {i + 1}")
+            return texts[i]
+
+        claim_id = None
+        if page_count:
+            m = re.search(r"Quote No\.\s*:\s*([A-Z0-9\-]+)", page_text(0))
+            if m:
+                claim_id = m.group(1).strip()
+
+        coverage_lines = []
+        if proposal_start is not None:
+            coverage_lines = collect_coverage_part_lines(
+                page_text(i) for i in range(proposal_start, page_count)
+            )
+
+        forms_text = "\n".join(
+            t for t in (page_text(i) for i in range(forms_start, page_count)) if t
+        )
+    PageStream.remember(pdf_bytes, fresh)
+
+    return {
+        "claim_id": claim_id,
+        "coverage_lines": coverage_lines,
+        "forms_text": forms_text,
+    }
+
+def extract_claim_id(pdf_file) -> str:
+    return load_inland_marine_document(pdf_file)["claim_id"]
+
+def extract_with_pdfplumber(pdf_file) -> tuple[pd.DataFrame, str]:
+    collected_lines = load_inland_marine_document(pdf_file)["coverage_lines"]
+    debug_details = ""
 
     debug_details += f"Collected section lines: {collected_lines}\n"
 
@@ -170,9 +247,97 @@ def extract_with_pdfplumber(pdf_file) -> tuple[pd.DataFrame, str]:
 
     return df, debug_details
 
+def _trimmed_width(row) -> int:
+    """Length of a row once trailing empty cells are dropped."""
+    width = len(row)
+    while width and (row[width - 1] is None or row[width - 1] == ""):
+        width -= 1
+    return width
+
+def stream_schedule_sheet(ws):
+    """
+    Stream one read-only worksheet. Row 3 may name the table ("Schedule:"),
+    row 6 is the header and rows 7+ are data; rows 0-2 and 4-5 are only
+    looked at for their width. Returns (schedule_name, header, data_rows,
+    row_count) with trailing empty rows and columns dropped.
+    """
+    ws.reset_dimensions()
+    schedule_name = None
+    header = None
+    data_rows = []
+    row_count = 0
+    width = 0
+    for idx, row in enumerate(ws.iter_rows(min_row=1, min_col=1, values_only=True)):
+        row_width = _trimmed_width(row)
+        if row_width:
+            row_count = idx + 1
+            width = max(width, row_width)
+        if idx == 3:
+            for cell in row:
+                if isinstance(cell, str) and "Schedule:" in cell:
+                    schedule_name = cell.split("Schedule:")[-1].strip()
+                    break
+        elif idx == 6:
+            header = row[:row_width]
+        elif idx > 6:
+            data_rows.append(tuple(None if v == "" else v for v in row[:row_width]))
+    # Drop trailing blank rows, like pandas does
+    del data_rows[max(row_count - 7, 0):]
+    if header is None:
+        return schedule_name, [], [], row_count
+    header = [str(x).strip() if x is not None else "" for x in header]
+    header += [""] * (width - len(header))
+    data_rows = [r + (None,) * (width - len(r)) for r in data_rows]
+    return schedule_name, make_unique(header), data_rows, row_count
+
 def process_excel_file(uploaded_file) -> tuple[list[tuple[str, pd.DataFrame]], str]:
+    """
+    For Excel coverage tables. Streams each sheet with openpyxl in read-only
+    mode so only the header and data rows are kept in memory. Legacy .xls
+    workbooks fall back to pandas.
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        return process_excel_file_pandas(uploaded_file)
+
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    try:
+        wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    except Exception:
+        if hasattr(uploaded_file, "seek"):
+            uploaded_file.seek(0)
+        return process_excel_file_pandas(uploaded_file)
+
+    try:
+        tables = []
+        debug_info = ""
+        for ws in wb.worksheets:
+            sheet_name = ws.title
+            schedule_name, header_row, data_rows, row_count = stream_schedule_sheet(ws)
+            if row_count < 5:
+                debug_info += f"Sheet {sheet_name} has fewer than 5 rows; skipping.\n"
+                continue
+            if row_count < 7:
+                debug_info += f"Sheet {sheet_name} not enough rows after skip; skipping.\n"
+                continue
+            table_name = schedule_name if schedule_name is not None else sheet_name
+            new_df = pd.DataFrame(data_rows, columns=header_row, dtype=object)
+            tables.append((table_name, new_df))
+
+        if not debug_info:
+            debug_info = "Excel file processed successfully."
+        return tables, debug_info
+    except Exception as e:
+        return [], f"Error reading Excel file: {e}"
+    finally:
+        wb.close()
+
+def process_excel_file_pandas(uploaded_file) -> tuple[list[tuple[str, pd.DataFrame]], str]:
     """
     For Excel coverage tables. We'll skip rows & rename columns, etc.
+    Loads every sheet with pandas; used for workbooks openpyxl cannot stream.
     """
     try:
         excel_dict = pd.read_excel(uploaded_file, sheet_name=None, header=None)
@@ -214,163 +379,53 @@ def process_excel_file(uploaded_file) -> tuple[list[tuple[str, pd.DataFrame]], s
     except Exception as e:
         return [], f"Error reading Excel file: {e}"
 
-def parse_line_into_columns(line: str) -> list[str]:
-    tokens = line.split()
-    number_parts = []
-    edition = ""
-    description_parts = []
-    edition_pattern = re.compile(r"^\d{2}-\d{4}$")
-    found_edition = False
-    for token in tokens:
-        if not found_edition and edition_pattern.match(token):
-            edition = token
-            found_edition = True
-        else:
-            if not found_edition:
-                number_parts.append(token)
-            else:
-                description_parts.append(token)
-    number = " ".join(number_parts).strip()
-    description = " ".join(description_parts).strip()
-    return [number, edition, description]
-
-def remove_punctuation_and_spaces(s: str) -> str:
-    return re.sub(r'[^A-Za-z0-9]+', '', s).lower()
-
-def find_coverage_stop_index(description: str, stop_kw: str) -> int:
-    norm_desc = remove_punctuation_and_spaces(description)
-    norm_stop = remove_punctuation_and_spaces(stop_kw)
-    idx = norm_desc.find(norm_stop)
-    if idx == -1:
-        return -1
-    built = []
-    real_idx = 0
-    cur_norm_count = 0
-    while real_idx < len(description) and cur_norm_count < idx:
-        c = description[real_idx]
-        if c.isalnum():
-            cur_norm_count += 1
-        real_idx += 1
-    return real_idx
-
-def truncate_on_all_caps(description: str) -> str:
-    tokens = description.split()
-    truncated = []
-    for token in tokens:
-        clean_token = re.sub(r'[^A-Za-z]', '', token)
-        if len(clean_token) >= 2 and clean_token.isupper():
-            break
-        truncated.append(token)
-    return " ".join(truncated).strip()
+def currency_series(values: pd.Series, blank: str = "") -> pd.Series:
+    """
+    Column-at-a-time currency formatting. Anything numeric once "$" and ","
+    are stripped becomes "$1,234.00"; other text passes through and empty
+    cells become `blank`.
+    """
+    text = values.astype(str).str.strip()
+    nums = pd.to_numeric(text.str.replace(r"[$,]", "", regex=True), errors="coerce")
+    out = text.copy()
+    is_num = nums.notna()
+    out[is_num] = nums[is_num].map("${:,.2f}".format)
+    out[values.isna() | (text == "")] = blank
+    return out
+
+def co_insurance_series(values: pd.Series, blank: str = "", fractions_only: bool = False) -> pd.Series:
+    """
+    Column-at-a-time co-insurance formatting: 0.8 -> "80%". With
+    fractions_only, values above 1 are treated as already being percents.
+    """
+    text = values.astype(str).str.strip()
+    nums = pd.to_numeric(text.str.replace(r"[$,%]", "", regex=True), errors="coerce")
+    if fractions_only:
+        nums = nums.where(nums > 1, nums * 100)
+    else:
+        nums = nums * 100
+    out = text.copy()
+    is_num = nums.notna()
+    out[is_num] = nums[is_num].map("{:.0f}%".format)
+    out[values.isna() | (text == "")] = blank
+    return out
+
+
+
+
 
 def extract_text_for_policy_forms(pdf_file) -> str:
-    pdf_file.seek(0)
-    with pdfplumber.open(pdf_file) as pdf:
-        extracted_text = "\n".join(
-            page.extract_text() for page in pdf.pages if page.extract_text()
-        )
-    return extracted_text
+    return load_inland_marine_document(pdf_file)["forms_text"]
 
 def parse_policy_forms_inland_marine(text: str) -> dict:
-    coverage_titles = [
-        "Inland Marine Coverage Part",
-        "All Commercial Inland Marine Coverages",
-        "Coverages",
-        "Contractors Coverages",
-        "Installation Floater Coverages",
-        "Electronic Data Processing"
-    ]
-    coverage_stop_titles = ["Commercial Property Coverage Part",
-        "Commercial Property Forms",
-        "Commercial General Liability Coverage Part",
-        "Commercial Auto Coverage Part",
-        "Commercial Automobile",
-        "Commercial Umbrella",
-        "Commercial Umbrella Coverage Part",
-        "NOTICE", 'CL PN']
-    start_index = text.find("SCHEDULE OF FORMS AND ENDORSEMENTS")
-    if start_index == -1:
-        return {}
-    relevant_lines = text[start_index:].splitlines()
-    sections = {}
-    current_title = None
-    i = 0
-    while i < len(relevant_lines):
-        line = relevant_lines[i].strip()
-        if line in coverage_titles:
-            current_title = line
-            sections[current_title] = []
-            i += 1
-            if i < len(relevant_lines):
-                possible_header_line = relevant_lines[i].lower().strip()
-                if ("number" in possible_header_line and
-                    "edition" in possible_header_line and
-                    "description" in possible_header_line):
-                    i += 1
-            continue
-        if current_title:
-            line_lower = line.lower()
-            if any(stop_kw.lower() in line_lower for stop_kw in coverage_stop_titles):
-                current_title = None
-                i -= 1
-                i += 1
-                continue
-            if line in coverage_titles and line != current_title:
-                current_title = line
-                sections[current_title] = []
-                i += 1
-                if i < len(relevant_lines):
-                    possible_header_line = relevant_lines[i].lower().strip()
-                    if ("number" in possible_header_line and
-                        "edition" in possible_header_line and
-                        "description" in possible_header_line):
-                        i += 1
-                continue
-            if line:
-                number, edition, description = parse_line_into_columns(line)
-                earliest_idx = None
-                for stop_kw in coverage_stop_titles:
-                    idx = find_coverage_stop_index(description, stop_kw)
-                    if idx != -1:
-                        if earliest_idx is None or idx < earliest_idx:
-                            earliest_idx = idx
-                if earliest_idx is not None:
-                    description = description[:earliest_idx].strip()
-                description = truncate_on_all_caps(description)
-                if not edition:
-                    if sections[current_title]:
-                        sections[current_title][-1][2] += " " + " ".join(
-                            part for part in [number, description] if part
-                        )
-                        sections[current_title][-1][2] = sections[current_title][-1][2].strip()
-                    else:
-                        sections[current_title].append(["", "", (number + " " + description).strip()])
-                else:
-                    sections[current_title].append([number, edition, description])
-        i += 1
-    return sections
+    return parse_policy_forms_for_lob(text, "Inland Marine")
 
 # ------------------------------------------------------------------
 # 7. GENERATE EDITABLE HTML TABLE
 # ------------------------------------------------------------------
 def generate_editable_html_table(df):
-    teal_color = "#2D5D77"
-    html = "<div class='table-container'>"
-    html += "<table style='border-collapse: collapse; width: 100%;'>"
-    # Header row
-    html += f"<thead style='background-color: {teal_color}; color: white;'><tr>"
-    for col in df.columns:
-        html += f"<th style='border: 1px solid #ccc; padding: 8px 12px;'>{col}</th>"
-    html += "</tr></thead>"
-    # Data rows
-    html += "<tbody>"
-    for _, row in df.iterrows():
-        html += "<tr style='background-color: white;'>"
-        for cell in row:
-            html += f"<td contenteditable='true' style='border: 1px solid #ccc; padding: 8px 12px;'>{cell}</td>"
-        html += "</tr>"
-    html += "</tbody></table></div>"
-    return html
+    # Teal editable table, built in one pass and cached by Preview
+    return Preview.table_html(df, teal=True)
 
 # ------------------------------------------------------------------
 # 8. STREAMLIT APP
@@ -391,21 +446,21 @@ if uploaded_file is not None:
         st.session_state.policy_forms_sections = {}
         st.session_state.claim_id = None
 
-        new_claim_id = extract_claim_id(uploaded_file)
+        im_doc = load_inland_marine_document(uploaded_file)
+        new_claim_id = extract_claim_id(im_doc)
         if new_claim_id:
             st.sidebar.info(f"Claim ID: {new_claim_id}")
             st.session_state.claim_id = new_claim_id
         else:
             st.sidebar.warning("Claim ID not found in PDF.")
 
-        df, debug_msg = extract_with_pdfplumber(uploaded_file)
+        df, debug_msg = extract_with_pdfplumber(im_doc)
         st.session_state.coverage_tables.append(df)
 
         st.sidebar.markdown("### PDF Extraction Debug")
         st.sidebar.text(debug_msg)
 
-        uploaded_file.seek(0)
-        policy_text = extract_text_for_policy_forms(uploaded_file)
+        policy_text = extract_text_for_policy_forms(im_doc)
         forms_sections = parse_policy_forms_inland_marine(policy_text)
         st.session_state.policy_forms_sections = forms_sections
 
@@ -450,34 +505,12 @@ if st.session_state.excel_tables:
 
         if n_cols >= 4:
             last_four = df_temp.columns[n_cols-4 : n_cols]
-
-            def currency_fmt(x):
-                if x == '-' or x == '':
-                    return '-'
-                try:
-                    val = float(str(x).replace('$','').replace(',',''))
-                    return f"${val:,.2f}"
-                except:
-                    return str(x)
-
-            def co_insurance_fmt(x):
-                if x == '-' or x == '':
-                    return '-'
-                try:
-                    val = float(str(x).replace('$','').replace(',',''))
-                    # Multiply by 100 => e.g. 0.08 => 8.0 => "8%"
-                    # Round to nearest integer, if you want 2 decimals you can do e.g. 8.12 => "8.12%"
-                    # We'll do no decimals for now
-                    return f"{val*100:.0f}%"
-                except:
-                    return str(x)
-
             for col_name in last_four:
                 norm = normalize_colname_for_co_ins(col_name)
                 if norm == 'coinsurance':
-                    df_temp[col_name] = df_temp[col_name].apply(co_insurance_fmt)
+                    df_temp[col_name] = co_insurance_series(df_temp[col_name], blank='-')
                 else:
-                    df_temp[col_name] = df_temp[col_name].apply(currency_fmt)
+                    df_temp[col_name] = currency_series(df_temp[col_name], blank='-')
 
         html_table = generate_editable_html_table(df_temp)
         st.markdown(html_table, unsafe_allow_html=True)
@@ -564,11 +597,21 @@ def add_dataframe_table_inland(doc, heading, df):
 
     repeat_table_header(table.rows[0])
 
-    for _, row_data in df.iterrows():
+    # Format whole columns up front instead of cell by cell
+    formatted = []
+    for col_name in df.columns:
+        col = df[col_name]
+        if str(col_name).lower() in ["limit", "deductible", "premium"]:
+            formatted.append(currency_series(col).tolist())
+        elif str(col_name).lower() == "co-insurance":
+            formatted.append(co_insurance_series(col).tolist())
+        else:
+            formatted.append([("" if pd.isna(v) else str(v).strip()) for v in col])
+
+    for row_values in zip(*formatted):
         row_cells = table.add_row().cells
-        for idx, col_name in enumerate(df.columns):
-            val = row_data[col_name] if pd.notnull(row_data[col_name]) else ""
-            row_cells[idx].text = format_for_word(col_name, val)
+        for idx, val in enumerate(row_values):
+            row_cells[idx].text = val
 
 def create_word_doc_inland_marine(coverage_tables, excel_tables, forms_sections):
     """
@@ -0,0 +1,57 @@
+import pytest
+
+import BookOfBusiness
+import ProposalResult
+
+def _result(rating_company="Acme Mutual", quote="Q-1001", premium="$1,000", underwriter="Smith"):
+    result = ProposalResult.ProposalResult(meta={"underwriter": underwriter, "created": "2026-10-01T09:00:00"})
+    result.add_fields("Policy Information", {"Rating Company": rating_company, "Quote No.": quote, "Policy No.": ""})
+    result.add_table("Policy Information", "Coverages", [{"Coverage": "Property", "Premium": premium}])
+    return result
+
+def test_revisions_of_a_quote_share_one_proposal_id():
+    first = _result()
+    revised = _result(premium="$1,250", underwriter="Jones")
+    revised.meta["proposal_id"] = "upload-hash"
+    assert BookOfBusiness.proposal_id(first) == BookOfBusiness.proposal_id(revised)
+
+def test_quote_number_spacing_and_case_do_not_matter():
+    assert BookOfBusiness.proposal_id(_result(quote="q-1001 ")) == BookOfBusiness.proposal_id(_result())
+
+def test_other_quotes_and_carriers_get_their_own_id():
+    ids = {BookOfBusiness.proposal_id(r) for r in (
+        _result(), _result(quote="Q-1002"), _result(rating_company="Other Insurance Co"),
+    )}
+    assert len(ids) == 3
+
+def test_policy_number_is_used_without_a_quote_number():
+    result = _result(quote="")
+    result.add_fields("Policy Information", {"Policy No.": "P-55"})
+    assert BookOfBusiness.proposal_id(result) == BookOfBusiness.proposal_id(_result(quote="P-55"))
+
+def test_without_a_number_the_meta_id_is_used():
+    result = _result(quote="")
+    result.meta["proposal_id"] = "job-1"
+    assert BookOfBusiness.proposal_id(result) == "job-1"
+
+def test_remove_proposal_clears_every_partition(tmp_path):
+    pid = BookOfBusiness.proposal_id(_result())
+    paths = [
+        tmp_path / "coverages" / "month=2026-09" / "underwriter=Smith" / f"{pid}-0.parquet",
+        tmp_path / "coverages" / "month=2026-10" / "underwriter=Jones" / f"{pid}-0.parquet",
+        tmp_path / "coverages" / "month=2026-10" / "underwriter=Jones" / "other-0.parquet",
+    ]
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    assert BookOfBusiness.remove_proposal(pid, str(tmp_path / "coverages")) == 2
+    assert [p.exists() for p in paths] == [False, False, True]
+
+def test_appending_a_revision_replaces_the_earlier_rows(tmp_path):
+    pytest.importorskip("pyarrow")
+    BookOfBusiness.append(_result(), str(tmp_path))
+    revised = _result(premium="$1,250", underwriter="Jones")
+    revised.meta["created"] = "2026-11-02T09:00:00"
+    BookOfBusiness.append(revised, str(tmp_path))
+    table = BookOfBusiness.load_table("coverages", book_dir=str(tmp_path))
+    assert table.column("premium").to_pylist() == [1250.0]
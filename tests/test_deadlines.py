@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+import Deadlines
+
+def _describe(data, tag=None):
+    return type(data).__name__, len(data), tag
+
+@pytest.fixture
+def isolated(monkeypatch):
+    monkeypatch.setenv("PROPOSAL_ISOLATE", "1")
+    Deadlines.start_run()
+    yield
+    Deadlines.release_documents()
+    Deadlines.shutdown()
+
+def test_pdf_bytes_are_written_once_per_run(isolated):
+    pdf = b"%PDF" * 1000
+    first = Deadlines.run_with_deadline("Test", "test_deadlines", "_describe", (pdf,))
+    second = Deadlines.run_with_deadline("Test", "test_deadlines", "_describe", (), {"data": pdf, "tag": 2})
+    assert first == ("bytes", 4000, None)
+    assert second == ("bytes", 4000, 2)
+    (_, path), = Deadlines._run.documents.values()
+    assert os.path.exists(path)
+    Deadlines.release_documents()
+    assert not os.path.exists(path)
+
+def test_module_import_is_not_charged_to_the_deadline(isolated, tmp_path, monkeypatch):
+    (tmp_path / "slow_import.py").write_text("import time\ntime.sleep(1.5)\n\ndef ping():\n    return 'pong'\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setitem(Deadlines.SECTION_DEADLINES, "Test", 1.0)
+    assert Deadlines.run_with_deadline("Test", "slow_import", "ping") == "pong"
+    assert Deadlines.skipped_sections() == {}
+    sys.modules.pop("slow_import", None)
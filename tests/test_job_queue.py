@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+import JobQueue
+
+@pytest.fixture(autouse=True)
+def fresh_queue(monkeypatch):
+    monkeypatch.setattr(JobQueue, "WORKERS", 1)
+    monkeypatch.setattr(JobQueue, "PAGE_BUDGET", 100)
+    monkeypatch.setattr(JobQueue, "MAX_QUEUED", 20)
+    JobQueue._waiting.clear()
+    JobQueue._active.clear()
+    yield
+    JobQueue._waiting.clear()
+    JobQueue._active.clear()
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_runs_start_in_arrival_order():
+    holder = JobQueue.acquire(10)
+    started = []
+    lock = threading.Lock()
+
+    def run(name):
+        ticket = JobQueue.acquire(10, poll=0.01)
+        with lock:
+            started.append(name)
+        JobQueue.release(ticket)
+
+    threads = []
+    for name in ("first", "second", "third"):
+        thread = threading.Thread(target=run, args=(name,))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: len(JobQueue._waiting) == len(threads))
+    JobQueue.release(holder)
+    for thread in threads:
+        thread.join(5)
+    assert started == ["first", "second", "third"]
+
+def test_release_frees_the_slot():
+    ticket = JobQueue.acquire(10)
+    assert JobQueue.status()["active"] == 1
+    JobQueue.release(ticket)
+    assert JobQueue.status()["active"] == 0
+    JobQueue.release(JobQueue.acquire(10))
+    assert JobQueue.status()["completed"] >= 2
+
+def test_release_of_no_ticket_is_a_no_op():
+    JobQueue.release(None)
+    assert JobQueue.status()["active"] == 0
+
+def test_slot_of_a_finished_thread_is_reclaimed():
+    def abandon():
+        JobQueue.acquire(10)  # never released
+
+    thread = threading.Thread(target=abandon)
+    thread.start()
+    thread.join()
+    ticket = JobQueue.acquire(10, poll=0.01)
+    assert ticket["id"] in JobQueue._active
+    JobQueue.release(ticket)
+
+def test_page_budget_holds_back_a_second_run(monkeypatch):
+    monkeypatch.setattr(JobQueue, "WORKERS", 2)
+    holder = JobQueue.acquire(80)
+    done = threading.Event()
+
+    def run():
+        JobQueue.release(JobQueue.acquire(40, poll=0.01))
+        done.set()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert not done.wait(0.2)
+    JobQueue.release(holder)
+    assert done.wait(5)
+    thread.join(5)
+
+def test_full_line_raises_queue_full(monkeypatch):
+    monkeypatch.setattr(JobQueue, "MAX_QUEUED", 0)
+    with pytest.raises(JobQueue.QueueFull):
+        JobQueue.acquire(10)
+
+def test_on_wait_runs_outside_the_queue_lock():
+    held, done = threading.Event(), threading.Event()
+
+    def hold():
+        ticket = JobQueue.acquire(10)
+        held.set()
+        done.wait(5)
+        JobQueue.release(ticket)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait(5)
+    seen = []
+
+    def on_wait(position, queue_length, estimate):
+        # Another thread must still get through the queue while this callback runs
+        thread = threading.Thread(target=lambda: seen.append(JobQueue.status()))
+        thread.start()
+        thread.join(2)
+        done.set()
+
+    ticket = JobQueue.acquire(10, on_wait=on_wait, poll=0.01)
+    holder.join()
+    assert seen and seen[0]["waiting"] == 1
+    JobQueue.release(ticket)
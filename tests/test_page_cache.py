@@ -0,0 +1,136 @@
+import time
+import sqlite3
+
+import pytest
+
+import PageCache
+import PageStream
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "page_cache.db")
+    monkeypatch.setattr(PageCache, "DB_PATH", path)
+    monkeypatch.setenv("PROPOSAL_PAGE_CACHE", "1")
+    return path
+
+def test_cache_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("PROPOSAL_PAGE_CACHE", raising=False)
+    assert not PageCache.enabled()
+
+def test_lookup_hits_stored_pages_and_misses_the_rest(db):
+    PageCache.store({"a": "page a", "b": ""})
+    assert PageCache.lookup(["a", "b", "c"]) == {"a": "page a", "b": ""}
+
+def test_pages_expire_after_max_age(db, monkeypatch):
+    PageCache.store({"old": "text"})
+    monkeypatch.setattr(PageCache, "MAX_AGE_DAYS", 1)
+    monkeypatch.setattr(time, "time", lambda real=time.time: real() + 2 * 86400)
+    assert PageCache.lookup(["old"]) == {}
+
+def test_cache_trims_to_max_pages(db, monkeypatch):
+    monkeypatch.setattr(PageCache, "MAX_PAGES", 2)
+    now = time.time()
+    for n, key in enumerate(("a", "b", "c")):
+        monkeypatch.setattr(time, "time", lambda t=now + n: t)
+        PageCache.store({key: key})
+    monkeypatch.undo()
+    monkeypatch.setattr(PageCache, "DB_PATH", db)
+    assert PageCache.lookup(["a", "b", "c"]) == {"b": "b", "c": "c"}
+
+def test_cached_texts_marks_misses_as_none(db, monkeypatch):
+    monkeypatch.setattr(PageCache, "page_hashes", lambda pdf_bytes: ["h0", "h1", "h2"])
+    PageCache.store({"h1": "cached"})
+    assert PageCache.cached_texts(b"%PDF") == (["h0", "h1", "h2"], [None, "cached", None])
+
+def test_unreadable_packet_raises_cache_unavailable(db, monkeypatch):
+    def broken(pdf_bytes):
+        raise ValueError("not a pdf")
+
+    monkeypatch.setattr(PageCache, "page_hashes", broken)
+    with pytest.raises(PageCache.CacheUnavailable):
+        PageCache.cached_texts(b"junk")
+
+class _Page:
+    def __init__(self, text, opened):
+        self.text = text
+        self.opened = opened
+
+    def extract_text(self, **kwargs):
+        self.opened.append(self.text)
+        return self.text
+
+class _Pdf:
+    def __init__(self, texts, opened):
+        self.pages = [_Page(t, opened) for t in texts]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+def test_only_missing_pages_are_parsed_and_stored(db, monkeypatch):
+    parsed = []
+    monkeypatch.setattr(PageStream, "_open", lambda source: _Pdf(["p0", "p1", "p2"], parsed))
+    pdf = PageStream.PrefetchedPdf(b"%PDF", [None, "cached p1", None], ["h0", "h1", "h2"])
+
+    assert PageStream.read_page_texts(pdf, [1, 2]) == ["cached p1", "p2"]
+    assert parsed == ["p2"]
+    assert pdf.page_texts == [None, "cached p1", "p2"]
+    assert PageCache.lookup(["h0", "h2"]) == {"h2": "p2"}
+
+def test_prefetch_leaves_small_packets_unparsed(db, monkeypatch):
+    monkeypatch.setattr(PageCache, "page_hashes", lambda pdf_bytes: ["h0", "h1"])
+    monkeypatch.setattr(PageStream, "read_pages_parallel", lambda *a, **k: pytest.fail("parsed up front"))
+    pdf = PageStream.prefetch(b"%PDF", 2)
+    assert pdf.page_texts == [None, None]
+    assert pdf.page_hashes == ["h0", "h1"]
+
+def test_prefetch_falls_back_when_over_memory_budget(db, monkeypatch):
+    def over_budget(*args, **kwargs):
+        raise PageStream.MemoryBudgetExceeded("over")
+
+    monkeypatch.setattr(PageCache, "page_hashes", lambda pdf_bytes: [f"h{i}" for i in range(80)])
+    monkeypatch.setattr(PageStream, "PAGE_WORKERS", 4)
+    monkeypatch.setattr(PageStream, "read_pages_parallel", over_budget)
+    pdf = PageStream.prefetch(b"%PDF", 80)
+    assert pdf.page_texts == [None] * 80
+
+def test_prefetch_returns_plain_bytes_with_cache_off(monkeypatch):
+    monkeypatch.setenv("PROPOSAL_PAGE_CACHE", "0")
+    monkeypatch.setattr(PageStream, "PAGE_WORKERS", 1)
+    data = b"%PDF"
+    assert PageStream.prefetch(data, 100) is data
+
+def test_prefetched_text_is_only_reused_for_its_backend():
+    pdf = PageStream.PrefetchedPdf(b"%PDF", ["plumber text"])
+    assert PageStream.prefetched_texts(pdf) == ["plumber text"]
+    assert PageStream.prefetched_texts(pdf, "pymupdf") is None
+
+def test_parallel_reads_share_one_pool():
+    try:
+        assert PageStream._shared_pool(2) is PageStream._shared_pool(2)
+    finally:
+        PageStream.shutdown()
+    assert PageStream._pools == {}
+
+def test_chunks_of_a_timed_out_call_are_dropped(monkeypatch):
+    monkeypatch.setattr(PageStream, "_open", lambda source: pytest.fail("opened after the deadline"))
+    with pytest.raises(PageStream.multiprocessing.TimeoutError):
+        PageStream._extract_chunk("packet.pdf", [0, 1], {}, time.time() - 1)
+
+def test_schema_is_migrated_once_and_keeps_pages(db):
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE pages (hash TEXT)")
+    conn.commit()
+    conn.close()
+    PageCache.store({"a": "page a"})
+    conn = sqlite3.connect(db)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == PageCache.SCHEMA_VERSION
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'pages'").fetchall() == []
+    conn.close()
+    # Later connections leave the current schema and its rows alone
+    assert PageCache.lookup(["a"]) == {"a": "page a"}
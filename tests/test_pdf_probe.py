@@ -0,0 +1,17 @@
+import PdfProbe
+
+def test_lob_pages_use_the_extractors_headings():
+    pages = [
+        "COMMON POLICY DECLARATIONS\nPolicy Number: CPP1234567",
+        "PROPERTY COVERAGES\nBuilding $500,000",
+        "COMMERCIAL GENERAL LIABILITY\nEach Occurrence $1,000,000",
+        "EMPLOYMENT-RELATED PRACTICES LIABILITY\nQUOTE PROPOSAL",
+        "SCHEDULE OF COVERED AUTOS YOU OWN\n1\n2019",
+        "SCHEDULE OF FORMS AND ENDORSEMENTS",
+    ]
+    assert PdfProbe.find_lob_pages(pages) == {
+        "Property": 1, "General Liability": 2, "Employment": 3, "Auto": 4, "Forms": 5,
+    }
+
+def test_a_packet_without_headings_holds_no_lines():
+    assert PdfProbe.find_lob_pages(["QUOTE PROPOSAL", ""]) == {}
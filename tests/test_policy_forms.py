@@ -0,0 +1,124 @@
+import PolicyForms
+
+# Golden outputs, checked against the per-module parsers parse_all_policy_forms replaced
+FULL_SCHEDULE = """SCHEDULE OF FORMS AND ENDORSEMENTS
+Commercial Common Forms
+Number Edition Description
+IL 00 17 11-1998 Common Policy Conditions
+IL 00 21 09-2008 Nuclear Energy Liability Exclusion Endorsement
+Commercial Property Coverage Part
+Number Edition Description
+CP 00 10 10-2012 Building And Personal Property Coverage Form
+CP 00 90 07-1988 Commercial Property Conditions
+Commercial General Liability Coverage Part
+Number Edition Description
+CG 00 01 04-2013 Commercial General Liability Coverage Form
+CG 21 47 12-2007 Employment-Related Practices Exclusion
+Commercial Auto Coverage Part
+Number Edition Description
+CA 00 01 10-2013 Business Auto Coverage Form
+CA 01 95 11-2016 Texas Changes
+Amendment Of Cancellation Provisions
+Commercial Umbrella Coverage Part
+Number Edition Description
+CU 00 01 04-2013 Commercial Liability Umbrella Coverage Form
+Policy Number: CPP1234567"""
+
+INLAND_MARINE = """SCHEDULE OF FORMS AND ENDORSEMENTS
+Inland Marine Coverage Part
+Number Edition Description
+CM 00 01 09-2004 Commercial Inland Marine Conditions
+IM 7000 04-2013 Contractors Equipment Floater NOTICE - TEXAS
+CL PN 01 01 Notice To Policyholders
+Commercial Property Coverage Part
+CP 00 10 10-2012 Building And Personal Property Coverage Form"""
+
+AUTO_STOPS = """SCHEDULE OF FORMS AND ENDORSEMENTS
+Commercial Auto Coverage Part
+Number Edition Description
+CA 00 01 10-2013 Business Auto Coverage Form
+CA 99 03 10-2013 Auto Medical Payments Coverage
+CA 00 01 10-2013 Business Auto Coverage Form
+CA 23 84 10-2013 Exclusion Of Terrorism
+Commercial Auto
+NUMBER EDITION DESCRIPTION
+CA 02 76 11-2016 Texas Changes Cancellation
+Applicant: Acme LLC
+CA 04 44 10-2013 Waiver Of Transfer Of Rights"""
+
+def _found(text):
+    return {lob: forms for lob, forms in PolicyForms.parse_all_policy_forms(text).items() if forms}
+
+def test_every_line_of_business_reads_its_own_sections():
+    # A wrapped description joins the row above it, running on to the next
+    # row; the last row of a section runs on to the next title
+    assert _found(FULL_SCHEDULE) == {
+        "Workers Compensation": {"Commercial Common Forms": [
+            ["IL 00 17", "11-1998", "Common Policy Conditions"],
+            ["IL 00 21", "09-2008", "Nuclear Energy Liability Exclusion Endorsement"],
+        ]},
+        "Property": {"Commercial Property Coverage Part": [
+            ["CP 00 10", "10-2012", "Building And Personal Property Coverage Form"],
+            ["CP 00 90", "07-1988", "Commercial Property Conditions"],
+        ]},
+        "General Liability": {"Commercial General Liability Coverage Part": [
+            ["CG 00 01", "04-2013", "Commercial General Liability Coverage Form"],
+            ["CG 21 47", "12-2007", "Employment-Related Practices Exclusion"],
+        ]},
+        "Auto": {"Commercial Auto Coverage Part": [
+            ["CA 00 01", "10-2013", "Business Auto Coverage Form"],
+            ["CA 01 95", "11-2016", "Texas Changes Amendment Of Cancellation Provisions Commercial "
+                                    "Umbrella Coverage Part Number Edition Description"],
+            ["CU 00 01", "04-2013", "Commercial Liability Umbrella Coverage Form"],
+        ]},
+        "Umbrella": {"Commercial Umbrella Coverage Part": [
+            ["CU 00 01", "04-2013", "Commercial Liability Umbrella Coverage Form Policy Number: CPP1234567"],
+        ]},
+    }
+
+def test_inland_marine_stops_at_notices():
+    assert _found(INLAND_MARINE) == {
+        "Inland Marine": {"Inland Marine Coverage Part": [
+            ["CM 00 01", "09-2004", "Commercial Inland Marine Conditions"],
+        ]},
+        "Property": {"Commercial Property Coverage Part": [
+            ["CP 00 10", "10-2012", "Building And Personal Property Coverage Form"],
+        ]},
+    }
+
+def test_auto_stops_at_repeated_rows_and_narrative():
+    assert _found(AUTO_STOPS) == {
+        "Auto": {
+            "Commercial Auto Coverage Part": [
+                ["CA 00 01", "10-2013", "Business Auto Coverage Form"],
+                ["CA 99 03", "10-2013", "Auto Medical Payments Coverage"],
+            ],
+            "Commercial Auto": [["CA 02 76", "11-2016", "Texas Changes Cancellation"]],
+        },
+    }
+
+def test_auto_title_before_the_heading_is_ignored():
+    # The old Auto parser read the whole document and would open this table
+    text = (
+        "Commercial Auto Coverage Part\nPremium $1,250\nSCHEDULE OF FORMS AND ENDORSEMENTS\n"
+        "Number Edition Description\nCA 00 01 10-2013 Business Auto Coverage Form"
+    )
+    assert _found(text) == {}
+
+def test_without_the_heading_only_auto_reads():
+    text = (
+        "Commercial Auto Coverage Part\nNumber Edition Description\n"
+        "CA 00 01 10-2013 Business Auto Coverage Form\n"
+        "Commercial General Liability Coverage Part\nNumber Edition Description\n"
+        "CG 00 01 04-2013 Commercial General Liability Coverage Form"
+    )
+    assert _found(text) == {
+        "Auto": {"Commercial Auto Coverage Part": [
+            ["CA 00 01", "10-2013", "Business Auto Coverage Form Commercial General Liability "
+                                    "Coverage Part Number Edition Description"],
+            ["CG 00 01", "04-2013", "Commercial General Liability Coverage Form"],
+        ]},
+    }
+
+def test_every_line_of_business_is_returned():
+    assert set(PolicyForms.parse_all_policy_forms("")) == set(PolicyForms.LOB_FORM_TITLES)
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+import Deadlines
+import Profiling
+
+@pytest.fixture(autouse=True)
+def no_run():
+    Profiling.finish_run(write=False)
+    yield
+    Profiling.finish_run(write=False)
+
+def _busy(seconds):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+    return "done"
+
+def test_worker_usage_is_charged_to_the_open_stage():
+    Profiling.start_run(trace_memory=False)
+    with Profiling.stage("outer"):
+        with Profiling.stage("isolated call"):
+            Profiling.add_worker_usage({"cpu_s": 2.0, "peak_kb": 512.0})
+    record = Profiling.finish_run(write=False)
+    inner, outer = record["stages"]
+    assert inner["cpu_s"] >= 2.0 and inner["peak_kb"] == 512.0
+    assert outer["cpu_s"] >= 2.0 and outer["peak_kb"] == 512.0
+    assert record["cpu_s"] >= 2.0
+
+def test_stage_cpu_is_this_threads_own():
+    other = threading.Thread(target=_busy, args=(0.3,))
+    Profiling.start_run(trace_memory=False)
+    with Profiling.stage("idle"):
+        other.start()
+        other.join()
+    record = Profiling.finish_run(write=False)
+    assert record["stages"][0]["cpu_s"] < 0.1
+
+def test_memory_peak_is_dropped_while_another_run_is_active():
+    started, stop = threading.Event(), threading.Event()
+
+    def other_run():
+        Profiling.start_run(trace_memory=True)
+        started.set()
+        stop.wait(5)
+        Profiling.finish_run(write=False)
+
+    Profiling.start_run(trace_memory=True)
+    with Profiling.stage("alone"):
+        data = bytearray(256 * 1024)
+    thread = threading.Thread(target=other_run)
+    thread.start()
+    started.wait(5)
+    with Profiling.stage("overlapping"):
+        data = bytearray(256 * 1024)
+    stop.set()
+    thread.join()
+    record = Profiling.finish_run(write=False)
+    alone, overlapping = record["stages"]
+    assert alone["peak_kb"] >= 256
+    assert overlapping["peak_kb"] is None
+    del data
+
+def test_isolated_call_is_measured_in_the_worker(monkeypatch):
+    monkeypatch.setenv("PROPOSAL_ISOLATE", "1")
+    Deadlines.start_run()
+    Profiling.start_run(trace_memory=True)
+    try:
+        with Profiling.stage("test_profiling._busy"):
+            result = Deadlines.run_with_deadline("Test", "test_profiling", "_busy", (0.3,))
+    finally:
+        record = Profiling.finish_run(write=False)
+        Deadlines.shutdown()
+    assert result == "done"
+    stage = record["stages"][0]
+    assert stage["cpu_s"] >= 0.3
+    assert stage["peak_kb"] is not None
@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("streamlit")
+
+import Umbrella
+
+def test_range_starts_at_the_umbrella_heading_not_earlier_retention_pages():
+    pages = [
+        "GENERAL LIABILITY QUOTE PROPOSAL",
+        "SELF-INSURED RETENTION $10,000",
+        "COMMERCIAL LIABILITY UMBRELLA QUOTE PROPOSAL",
+        "SCHEDULE OF UNDERLYING INSURANCE",
+        "COMMERCIAL AUTO QUOTE PROPOSAL",
+    ]
+    assert Umbrella.find_umbrella_page_range(pages) == (2, 5)
+
+def test_generic_markers_alone_are_not_an_umbrella_section():
+    pages = ["GENERAL LIABILITY QUOTE PROPOSAL", "SCHEDULE OF UNDERLYING INSURANCE"]
+    assert Umbrella.find_umbrella_page_range(pages) is None